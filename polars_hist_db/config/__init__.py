@@ -7,7 +7,11 @@ from .table import (
     TableConfigs,
 )
 from .transform_fn_registry import TransformFnRegistry, TransformFnSignature
-from .input.ingest_fn_registry import IngestFnRegistry, IngestFnSignature
+from .input.ingest_fn_registry import (
+    IngestBatchFnSignature,
+    IngestFnRegistry,
+    IngestFnSignature,
+)
 
 
 __all__ = [
@@ -24,4 +28,5 @@ __all__ = [
     "TransformFnSignature",
     "IngestFnRegistry",
     "IngestFnSignature",
+    "IngestBatchFnSignature",
 ]
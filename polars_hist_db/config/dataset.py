@@ -10,13 +10,58 @@ from .input.input_source import InputConfig
 
 LOGGER = logging.getLogger(__name__)
 
+InsertMethod = Literal["pandas", "executemany", "multirow", "load_data"]
+PartitionLoad = Literal["per_partition", "bucketed"]
+ChangeDetection = Literal["intersect", "row_hash"]
+ValidationAction = Literal["disabled", "log", "reject", "raise"]
+
 
 @dataclass
 class DeltaConfig:
     drop_unchanged_rows: bool = False
+
+    # how drop_unchanged_rows finds the unchanged rows of the main table
+    # intersect: every compared column of the target table is intersected
+    #            with the delta table
+    # row_hash: a hash of the compared columns, computed in polars, is stored
+    #           with each target row and matched by primary key against the
+    #           hash of the delta rows
+    change_detection: ChangeDetection = "intersect"
+
     on_duplicate_key: Literal["error", "take_last", "take_first"] = "error"
     prefill_nulls_with_default: bool = False
 
+    # how dataframes are written into the delta table
+    # pandas: DataFrame.to_pandas().to_sql(), in chunks of 1000 rows
+    # executemany: rows are sent straight to the driver's executemany, in batches
+    # multirow: multi-row INSERT ... VALUES statements, sized by a byte budget
+    # load_data: LOAD DATA LOCAL INFILE from a temporary file in insert_tmp_dir
+    #            (the engine must be created with local_infile enabled)
+    insert_method: InsertMethod = "pandas"
+    insert_batch_rows: int = 50_000
+    insert_batch_bytes: int = 4 * 1024 * 1024
+    insert_tmp_dir: Optional[str] = None
+
+    # how the time partitions of a transaction reach the delta table
+    # per_partition: each partition is inserted into the delta table in turn
+    # bucketed: all partitions are inserted at once into a staging table,
+    #           tagged by bucket, and each bucket is copied into the delta
+    #           table on the server with INSERT ... SELECT
+    partition_load: PartitionLoad = "per_partition"
+
+    # updates from a dataframe of at least this many rows are staged in a
+    # temporary table and applied with one joined statement, smaller
+    # dataframes are applied row by row with executemany
+    staging_min_rows: int = 1000
+
+    # what happens to rows that would overflow or violate the target column
+    # types (varchar length, not null, decimal precision/scale, integer range)
+    # disabled: no validation
+    # log: violations are logged, rows are inserted as-is
+    # reject: violations are logged, offending rows are dropped
+    # raise: violations fail the transaction without retries
+    validation_action: ValidationAction = "log"
+
     # tracks the finality of rows in the target (temporal) table
     # disabled: no tracking, rows are not deleted from the target table
     # dropout: rows are deleted from the target table if they are not present in the source table
@@ -29,6 +74,9 @@ class DeltaConfig:
     def tmp_table_name(self, table_name: str) -> str:
         return f"__{table_name}_tmp"
 
+    def bucket_table_name(self, table_name: str) -> str:
+        return f"__{table_name}_buckets"
+
 
 @dataclass
 class Pipeline:
@@ -8,6 +8,7 @@ from io import StringIO
 import csv
 
 from .input_source import InputConfig
+from .types import CrawlerFileFormat
 
 LOGGER = logging.getLogger(__name__)
 
@@ -18,6 +19,31 @@ class DsvCrawlerInputConfig(InputConfig):
     payload: Optional[str] = None
     payload_time: Optional[datetime] = None
 
+    # parquet and ipc files only read the columns used by the pipeline
+    file_format: CrawlerFileFormat = "auto"
+
+    # files larger than this are streamed in chunks of about this size, each
+    # chunk is upserted in its own transaction and the file is audited once
+    # its last chunk commits. None loads each file in one go.
+    # time partitions are spilled to chunk_spill_dir (default: the system
+    # temporary directory), and each partition must fit in memory.
+    # duplicate keys are only found within a chunk: a key repeated in a later
+    # chunk overwrites the earlier row, even with on_duplicate_key=error
+    max_chunk_bytes: Optional[int] = None
+    chunk_spill_dir: Optional[str] = None
+
+    # number of files parsed ahead in background threads, while the current
+    # file is upserted. files are still committed and audited in order.
+    # each prefetched file is held in memory, 0 disables prefetching
+    prefetch_files: int = 0
+
+    # consecutive files are upserted in one transaction, until the batch
+    # reaches batch_max_rows rows or batch_max_bytes bytes on disk. each file
+    # keeps its own time partitions and audit entries. None for either limit
+    # leaves it unbounded, and with neither set each file is committed alone
+    batch_max_rows: Optional[int] = None
+    batch_max_bytes: Optional[int] = None
+
     @staticmethod
     def clean_dsv_string(data: str) -> str:
         input_io = StringIO(data.strip())
@@ -43,9 +69,10 @@ class DsvCrawlerInputConfig(InputConfig):
     def __post_init__(self):
         if self.search_paths and not isinstance(self.search_paths, pl.DataFrame):
             for search_path in self.search_paths:
-                if "root_path" in search_path:
-                    path = search_path["root_path"]
-                    if not os.path.isabs(path):
+                # manifest_path optionally persists directory listings, see find_files
+                for key in ("root_path", "manifest_path"):
+                    path = search_path.get(key)
+                    if path is not None and not os.path.isabs(path):
                         if self.config_file_path is None:
                             LOGGER.warning(
                                 "No config_file_path provided, using current working directory as base for relative path"
@@ -56,6 +83,6 @@ class DsvCrawlerInputConfig(InputConfig):
                                 os.path.abspath(self.config_file_path)
                             )
                         abs_path = os.path.normpath(os.path.join(base_path, path))
-                        search_path["root_path"] = abs_path
+                        search_path[key] = abs_path
 
             self.search_paths = pl.from_records(self.search_paths)
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+import polars as pl
+import pyarrow as pa
+
+# index of the message each row was decoded from, used by the caller to
+# attribute rows to the audit id of their message
+MSG_INDEX_COL = "__msg_idx"
+
+
+def load_ndjson_batch(
+    payloads: Sequence[bytes], ts: datetime, args: Dict[str, Any]
+) -> pl.DataFrame:
+    """Decodes messages of newline-delimited json records with a single read_ndjson."""
+    # blank lines are not records, they are dropped so that the record count
+    # of each message matches the rows read_ndjson returns for it
+    msg_records = [
+        [line for line in p.splitlines() if len(line.strip()) > 0] for p in payloads
+    ]
+    records_per_msg = [len(records) for records in msg_records]
+    if sum(records_per_msg) == 0:
+        return pl.DataFrame(schema={MSG_INDEX_COL: pl.UInt32})
+
+    df = pl.read_ndjson(b"\n".join(r for records in msg_records for r in records))
+    if len(df) != sum(records_per_msg):
+        raise ValueError(
+            f"read {len(df)} rows from {sum(records_per_msg)} ndjson records"
+        )
+
+    return df.with_columns(_msg_index(records_per_msg))
+
+
+def load_arrow_ipc_batch(
+    payloads: Sequence[bytes], ts: datetime, args: Dict[str, Any]
+) -> pl.DataFrame:
+    """Decodes messages of arrow ipc streams into one table, without copying the buffers.
+
+    Messages with differing schemas are decoded one by one, and concatenated
+    with their columns unified.
+    """
+    msg_tables: List[pa.Table] = []
+    for payload in payloads:
+        reader = pa.ipc.open_stream(pa.py_buffer(payload))
+        msg_tables.append(pa.Table.from_batches(list(reader), schema=reader.schema))
+
+    if len(msg_tables) == 0:
+        return pl.DataFrame(schema={MSG_INDEX_COL: pl.UInt32})
+
+    rows_per_msg = [t.num_rows for t in msg_tables]
+    schema = msg_tables[0].schema
+    if all(t.schema.equals(schema) for t in msg_tables):
+        df = pl.from_arrow(pa.concat_tables(msg_tables), rechunk=False)
+    else:
+        df = pl.concat(
+            [pl.DataFrame(t) for t in msg_tables],
+            how="diagonal_relaxed",
+        )
+    assert isinstance(df, pl.DataFrame)
+
+    return df.with_columns(_msg_index(rows_per_msg))
+
+
+def _msg_index(rows_per_msg: List[int]) -> pl.Series:
+    # row r belongs to the first message whose cumulative row count exceeds r
+    ends = pl.Series(rows_per_msg, dtype=pl.UInt32).cum_sum()
+    rows = pl.int_range(sum(rows_per_msg), dtype=pl.UInt32, eager=True)
+    return ends.search_sorted(rows, side="right").cast(pl.UInt32).alias(MSG_INDEX_COL)
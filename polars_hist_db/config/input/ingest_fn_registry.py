@@ -1,16 +1,24 @@
 from datetime import datetime
 import logging
-from typing import Any, Callable, List, Dict
+from typing import Any, Callable, List, Dict, Sequence
 import polars as pl
 
+from .ingest_fn_builtins import load_arrow_ipc_batch, load_ndjson_batch
+
 LOGGER = logging.getLogger(__name__)
 
 IngestFnSignature = Callable[[Any, datetime, Dict[str, Any]], pl.DataFrame]
 IngestRegistryStore = Dict[str, IngestFnSignature]
 
+# decodes the raw payloads of a whole fetch into one dataframe
+IngestBatchFnSignature = Callable[
+    [Sequence[bytes], datetime, Dict[str, Any]], pl.DataFrame
+]
+IngestBatchRegistryStore = Dict[str, IngestBatchFnSignature]
+
 
 class IngestFnRegistry:
-    _borg: Dict[str, Any] = {"_registry": None}
+    _borg: Dict[str, Any] = {"_registry": None, "_batch_registry": None}
 
     def __init__(self) -> None:
         self.__dict__ = self._borg
@@ -19,24 +27,45 @@ class IngestFnRegistry:
     def _one_time_init(self) -> IngestRegistryStore:
         if self._registry is None:
             self._registry = dict()
+            self._batch_registry: IngestBatchRegistryStore = dict()
+            self.register_batch_function("ndjson", load_ndjson_batch)
+            self.register_batch_function("arrow_ipc", load_arrow_ipc_batch)
 
         return self._registry
 
     def delete_function(self, name: str) -> None:
         if name in self._registry:
             del self._registry[name]
+        if name in self._batch_registry:
+            del self._batch_registry[name]
 
-    def register_function(
-        self, name: str, fn: IngestFnSignature, allow_overwrite: bool = False
-    ) -> None:
-        if name in self._registry and not allow_overwrite:
+    def _check_name(self, name: str, allow_overwrite: bool) -> None:
+        if allow_overwrite:
+            self.delete_function(name)
+        elif name in self._registry or name in self._batch_registry:
             raise ValueError(
                 f"An ingest function with the name '{name}' is already registered."
             )
 
+    def register_function(
+        self, name: str, fn: IngestFnSignature, allow_overwrite: bool = False
+    ) -> None:
+        self._check_name(name, allow_overwrite)
+
         LOGGER.debug("added ingest function %s to registry", name)
         self._registry[name] = fn
 
+    def register_batch_function(
+        self, name: str, fn: IngestBatchFnSignature, allow_overwrite: bool = False
+    ) -> None:
+        self._check_name(name, allow_overwrite)
+
+        LOGGER.debug("added batch ingest function %s to registry", name)
+        self._batch_registry[name] = fn
+
+    def is_batch_function(self, name: str) -> bool:
+        return name in self._batch_registry
+
     def call_function(
         self,
         payload: Any,
@@ -56,5 +85,26 @@ class IngestFnRegistry:
 
         return result_df
 
+    def call_batch_function(
+        self,
+        payloads: Sequence[bytes],
+        ts: datetime,
+        name: str,
+        args: Dict[str, Any],
+    ) -> pl.DataFrame:
+        if name not in self._batch_registry:
+            raise ValueError(
+                f"No batch ingest function registered with the name '{name}'."
+            )
+
+        LOGGER.debug("applying batch ingest fn %s to %d payloads", name, len(payloads))
+        fn = self._batch_registry[name]
+        result_df = fn(payloads, ts, args)
+
+        if result_df is None:
+            raise ValueError(f"batch ingest function {name} returned None")
+
+        return result_df
+
     def list_functions(self) -> List[str]:
-        return list(self._registry.keys())
+        return list(self._registry.keys()) + list(self._batch_registry.keys())
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Any, Dict, Optional
 import logging
 
-from .types import InputDataSourceType
+from .types import AuditFilterMethod, InputDataSourceType
 
 LOGGER = logging.getLogger(__name__)
 
@@ -13,11 +13,13 @@ class InputConfig(ABC):
     type: InputDataSourceType
     config_file_path: str
     filter_past_events: Optional[bool]
+    audit_filter_method: AuditFilterMethod
 
     @staticmethod
     def from_dict(config: Dict[str, Any]) -> "InputConfig":
         input_type = config["type"]
         config.setdefault("filter_past_events", False)
+        config.setdefault("audit_filter_method", "polars")
 
         if input_type == "dsv":
             from .dsv_crawler import DsvCrawlerInputConfig
@@ -1,3 +1,12 @@
 from typing import Literal
 
 InputDataSourceType = Literal["dsv", "nats-jetstream", "nats-subject"]
+
+# how already-audited data sources are filtered out of the candidates
+# polars: the audit history of the target table is loaded and filtered in polars
+# sql: candidates are staged in a temporary table and anti-joined in the database
+AuditFilterMethod = Literal["polars", "sql"]
+
+# format of the files found by a dsv crawler
+# auto: detected from the file extension, unknown extensions are read as dsv
+CrawlerFileFormat = Literal["auto", "dsv", "parquet", "ipc", "ndjson"]
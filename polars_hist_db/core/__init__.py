@@ -3,17 +3,21 @@ from .audit_log_tracker import AuditLogTracker
 from .dataframe import DataframeOps
 from .db import DbOps
 from .delta_table import DeltaTableOps
+from .statement_cache import CompiledStatementCache
 from .table import TableOps
 from .table_config import TableConfigOps
+from .table_metadata_cache import TableMetadataCache
 from .timehint import TimeHint
 
 __all__ = [
     "AuditOps",
     "AuditLogTracker",
+    "CompiledStatementCache",
     "DataframeOps",
     "DbOps",
     "DeltaTableOps",
     "TableConfigOps",
+    "TableMetadataCache",
     "TableOps",
     "TimeHint",
 ]
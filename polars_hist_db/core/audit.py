@@ -1,11 +1,25 @@
 from datetime import datetime, timezone
 import logging
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+from uuid import uuid4
 
 import polars as pl
-from sqlalchemy import and_, Connection, delete, select, Table
-
-from ..config.input.types import InputDataSourceType
+from sqlalchemy import (
+    and_,
+    case,
+    Connection,
+    delete,
+    exists,
+    func,
+    Index,
+    literal,
+    select,
+    Select,
+    Table,
+)
+from sqlalchemy.schema import CreateIndex
+
+from ..config.input.types import AuditFilterMethod, InputDataSourceType
 from ..config.table import TableColumnConfig, TableConfig
 from .dataframe import DataframeOps
 from .db import DbOps
@@ -81,17 +95,66 @@ class AuditOps:
         return table_config
 
     def create(self, connection: Connection) -> Table:
+        """Returns the audit table, creating it with its indexes if it is missing.
+
+        An existing table is only reflected, so no DDL runs (and no implicit
+        commit happens) once the table is set up. Audit tables of earlier
+        versions get their indexes from create_indexes.
+        """
         audit_table_name = str(self._table_name)
         tbo = TableOps(self.schema, audit_table_name, connection)
 
         if tbo.table_exists():
-            tbl = tbo.get_table_metadata()
-            return tbl
+            return tbo.get_table_metadata()
 
         table_config = self._table_config()
         tbl = TableConfigOps(connection).create(table_config)
         assert tbl is not None
-        return tbl
+
+        return self._create_indexes(tbl, connection)
+
+    def create_indexes(self, connection: Connection) -> Table:
+        """Creates the audit table, and any of its indexes that are missing.
+
+        This runs DDL, so call it outside of a pipeline transaction.
+        """
+        tbl = self.create(connection)
+        return self._create_indexes(tbl, connection)
+
+    def _index_columns(self) -> Dict[str, List[str]]:
+        return {
+            "ix_audit_table_data_source": ["table_name", "data_source"],
+            "ix_audit_table_data_source_ts": ["table_name", "data_source_ts"],
+        }
+
+    def _create_indexes(self, tbl: Table, connection: Connection) -> Table:
+        existing_indexes = {ix.name for ix in tbl.indexes}
+        missing_indexes = {
+            name: cols
+            for name, cols in self._index_columns().items()
+            if name not in existing_indexes
+        }
+
+        if not missing_indexes:
+            return tbl
+
+        for name, cols in missing_indexes.items():
+            # data_source is too wide for a full-length key, a prefix is selective enough
+            prefix_lengths = {"data_source": 255}
+            ix = Index(
+                name,
+                *[tbl.c[c] for c in cols],
+                mysql_length=prefix_lengths,
+                mariadb_length=prefix_lengths,
+            )
+            DbOps(connection).execute_sqlalchemy(
+                "sql.audit.create_index", CreateIndex(ix), table=self.fqtn()
+            )
+            LOGGER.info("created index %s on %s", name, self.fqtn())
+
+        tbo = TableOps(self.schema, self._table_name, connection)
+        tbo.invalidate_metadata()
+        return tbo.get_table_metadata()
 
     def purge(self, target_table_name: str, connection: Connection) -> int:
         LOGGER.debug("clearing audit for %s.%s", self.schema, target_table_name)
@@ -168,9 +231,20 @@ class AuditOps:
         data_source_ts_col_name: str,
         target_table_name: str,
         connection: Connection,
+        method: AuditFilterMethod = "polars",
     ) -> pl.DataFrame:
         audit_tbl = self.create(connection)
 
+        if method == "sql":
+            return self._filter_items_sql(
+                audit_tbl,
+                data_source_items,
+                data_source_col_name,
+                data_source_ts_col_name,
+                target_table_name,
+                connection,
+            )
+
         # get the set of datasource items already processed
         target_table_logs_sql = (
             select(audit_tbl.c["data_source"], audit_tbl.c["data_source_ts"])
@@ -190,22 +264,116 @@ class AuditOps:
         if existing_tbl_entries.is_empty():
             return data_source_items
 
+        existing_datasources = (
+            existing_tbl_entries.get_column("data_source")
+            .unique(maintain_order=True)
+            .to_list()
+        )
+
         data_source_items = self._filter_unprocessed_items(
-            data_source_items, existing_tbl_entries, data_source_col_name
+            data_source_items, existing_datasources, data_source_col_name
         )
+        most_recently_processed_ts: datetime = existing_tbl_entries.select(
+            pl.max("data_source_ts")
+        ).item()
         data_source_items = self._filter_historic_items(
-            data_source_items, existing_tbl_entries, data_source_ts_col_name
+            data_source_items, most_recently_processed_ts, data_source_ts_col_name
         )
 
         return data_source_items
 
+    def _filter_items_sql(
+        self,
+        audit_tbl: Table,
+        data_source_items: pl.DataFrame,
+        data_source_col_name: str,
+        data_source_ts_col_name: str,
+        target_table_name: str,
+        connection: Connection,
+    ) -> pl.DataFrame:
+        latest_ts_sql = select(func.max(audit_tbl.c["data_source_ts"])).where(
+            audit_tbl.c["table_name"] == target_table_name
+        )
+        most_recently_processed_ts: Optional[datetime] = (
+            DbOps(connection)
+            .execute_sqlalchemy("sql.audit.filter_items.latest_ts", latest_ts_sql)
+            .scalar()
+        )
+
+        if most_recently_processed_ts is None:
+            return data_source_items
+
+        # only the candidates travel to the database, the audit history stays there
+        candidates = data_source_items.select(
+            pl.col(data_source_col_name).cast(pl.Utf8).alias("data_source")
+        ).unique()
+
+        dfo = DataframeOps(connection)
+        staging_table_name = f"tmp_{uuid4().hex}"
+        dfo.table_create(
+            self.schema,
+            staging_table_name,
+            candidates,
+            [],
+            tbl_for_types=audit_tbl,
+            is_temporary_table=True,
+        )
+        staging_tbl = TableOps(
+            self.schema, staging_table_name, connection
+        ).get_table_metadata()
+
+        try:
+            dfo.table_insert(
+                candidates,
+                self.schema,
+                staging_table_name,
+                ["data_source"],
+                prefill_nulls_with_default=False,
+            )
+
+            already_processed = exists().where(
+                and_(
+                    audit_tbl.c["table_name"] == target_table_name,
+                    audit_tbl.c["data_source"] == staging_tbl.c["data_source"],
+                )
+            )
+            unprocessed_sql = select(staging_tbl.c["data_source"]).where(
+                ~already_processed
+            )
+
+            unprocessed_datasources = (
+                DbOps(connection)
+                .execute_sqlalchemy("sql.audit.filter_items.anti_join", unprocessed_sql)
+                .scalars()
+                .all()
+            )
+        finally:
+            dfo.drop_staging_table(staging_tbl)
+
+        unprocessed_items = data_source_items.filter(
+            pl.col(data_source_col_name)
+            .cast(pl.Utf8)
+            .is_in(list(unprocessed_datasources))
+        ).unique(maintain_order=True)
+
+        LOGGER.debug(
+            "found %d (of %d) unprocessed data source items",
+            len(unprocessed_items),
+            len(data_source_items),
+        )
+
+        return self._filter_historic_items(
+            unprocessed_items,
+            most_recently_processed_ts.replace(tzinfo=timezone.utc),
+            data_source_ts_col_name,
+        )
+
     def _filter_historic_items(
         self,
         candidate_items: pl.DataFrame,
-        existing_entries: pl.DataFrame,
+        most_recently_processed_ts: datetime,
         data_source_ts_col_name: str,
     ) -> pl.DataFrame:
-        most_recently_processed_ts = existing_entries["data_source_ts"].max()
         new_items_only = candidate_items.filter(
             pl.col(data_source_ts_col_name) >= most_recently_processed_ts
         )
@@ -214,15 +382,9 @@ class AuditOps:
     def _filter_unprocessed_items(
         self,
         candidate_items: pl.DataFrame,
-        existing_entries: pl.DataFrame,
+        existing_datasources: List[str],
         data_source_col_name: str,
     ) -> pl.DataFrame:
-        existing_datasources = (
-            existing_entries.get_column("data_source")
-            .unique(maintain_order=True)
-            .to_list()
-        )
-
         # remove items that are already processed (in the audit table)
         already_processed = pl.col(data_source_col_name).is_in(existing_datasources)
         unprocessed_items = candidate_items.filter(already_processed.not_()).unique(
@@ -245,28 +407,55 @@ class AuditOps:
         connection: Connection,
         data_source_timestamp: datetime,
     ) -> bool:
-        if data_source_timestamp.tzinfo is None:
-            raise Exception(
-                "Developer Error: data_source_timestamp must be timezone aware"
-            )
+        num_inserted = self.add_entries(
+            data_source_type,
+            [(data_source, data_source_timestamp)],
+            [target_table_name],
+            connection,
+        )
 
-        self.create(connection)
+        did_insert = num_inserted == 1
+        return did_insert
 
-        new_item = {
-            "table_name": f"{target_table_name}",
-            "data_source_type": data_source_type,
-            "data_source": data_source,
-            "data_source_ts": data_source_timestamp,
-            "upload_ts": datetime.now(timezone.utc),
-        }
+    def add_entries(
+        self,
+        data_source_type: InputDataSourceType,
+        data_sources: Sequence[Tuple[str, datetime]],
+        target_table_names: Sequence[str],
+        connection: Connection,
+    ) -> int:
+        # one audit row per (data_source, target_table), written in a single statement
+        if len(data_sources) == 0 or len(target_table_names) == 0:
+            return 0
 
-        tbo = TableOps(self.schema, self._table_name, connection)
-        tbl = tbo.get_table_metadata()
-        insert_stmt = tbl.insert().values(new_item)
+        for _data_source, data_source_timestamp in data_sources:
+            if data_source_timestamp.tzinfo is None:
+                raise Exception(
+                    "Developer Error: data_source_timestamp must be timezone aware"
+                )
+
+        tbl = self.create(connection)
+
+        upload_ts = datetime.now(timezone.utc)
+        new_items = [
+            {
+                "table_name": f"{target_table_name}",
+                "data_source_type": data_source_type,
+                "data_source": data_source,
+                "data_source_ts": data_source_timestamp,
+                "upload_ts": upload_ts,
+            }
+            for target_table_name in target_table_names
+            for data_source, data_source_timestamp in data_sources
+        ]
+
+        insert_stmt = tbl.insert().values(new_items)
         result = DbOps(connection).execute_sqlalchemy("sql.audit.insert", insert_stmt)
 
-        did_insert = result.rowcount == 1
-        return did_insert
+        LOGGER.debug("added %d audit entries to %s", result.rowcount, self.fqtn())
+
+        num_inserted: int = result.rowcount
+        return num_inserted
 
     def get_latest_entry(
         self,
@@ -303,3 +492,35 @@ class AuditOps:
         )
 
         return latest_log
+
+    def latest_entries_since_sql(
+        self,
+        connection: Connection,
+        after_audit_id: int,
+        asof_timestamp: datetime,
+    ) -> Select:
+        # per table: the latest data_source_ts up to asof_timestamp, the highest
+        # audit_id seen, and the lowest audit_id still in the future of asof_timestamp
+        if asof_timestamp.tzinfo is None:
+            raise ValueError("asof_timestamp must be timezone aware")
+
+        tbl = self.create(connection)
+        is_visible = tbl.c["data_source_ts"] <= asof_timestamp
+
+        latest_entries_sql = (
+            select(
+                literal(self.schema).label("table_schema"),
+                tbl.c["table_name"],
+                func.max(case((is_visible, tbl.c["data_source_ts"]))).label(
+                    "data_source_ts"
+                ),
+                func.max(tbl.c["audit_id"]).label("max_audit_id"),
+                func.min(case((~is_visible, tbl.c["audit_id"]))).label(
+                    "min_pending_audit_id"
+                ),
+            )
+            .where(tbl.c["audit_id"] > after_audit_id)
+            .group_by(tbl.c["table_name"])
+        )
+
+        return latest_entries_sql
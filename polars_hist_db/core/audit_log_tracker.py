@@ -1,26 +1,44 @@
+from collections import deque
 from datetime import datetime
 import logging
-from typing import Dict, Any, Callable, Awaitable, Optional, List
+import time
+from typing import Deque, Dict, Any, Callable, Awaitable, Optional, List, Tuple
 import pytz
+from sqlalchemy import union_all
 from sqlalchemy.engine import Connection
 
 from .audit import AuditOps
+from .db import DbOps
 
 LOGGER = logging.getLogger(__name__)
 
 TableUpdateCallback = Callable[[str, str, datetime], Awaitable[None]]
 
+# audit_ids are assigned on insert, so a transaction can commit a lower id
+# after a higher one was read. ids are re-read until they are this old.
+DEFAULT_COMMIT_WINDOW_SECONDS = 60.0
+
 
 class AuditLogTracker:
     _borg: Dict[str, Any] = {}
 
     last_known_updates: Dict[str, datetime]
+    last_audit_ids: Dict[str, int]
+    # (monotonic time, max audit_id) of the polls still inside the commit window
+    seen_audit_ids: Dict[str, Deque[Tuple[float, int]]]
+    commit_window_seconds: float
     table_update_callback: Optional[TableUpdateCallback]
 
     def __init__(self):
         self.__dict__ = self._borg
         if "last_known_updates" not in self._borg:
             self._borg["last_known_updates"] = dict()
+        if "last_audit_ids" not in self._borg:
+            self._borg["last_audit_ids"] = dict()
+        if "seen_audit_ids" not in self._borg:
+            self._borg["seen_audit_ids"] = dict()
+        if "commit_window_seconds" not in self._borg:
+            self._borg["commit_window_seconds"] = DEFAULT_COMMIT_WINDOW_SECONDS
         if "table_update_callback" not in self._borg:
             self._borg["table_update_callback"] = None
 
@@ -30,8 +48,36 @@ class AuditLogTracker:
     def set_table_update_callback(self, cb: TableUpdateCallback):
         self.table_update_callback = cb
 
+    def set_commit_window(self, seconds: float):
+        self.commit_window_seconds = seconds
+
     def clear_updates(self):
         self.last_known_updates.clear()
+        self.last_audit_ids.clear()
+        self.seen_audit_ids.clear()
+
+    def _advance_watermark(
+        self,
+        schema: str,
+        max_audit_id: int,
+        min_pending_audit_id: Optional[int],
+        now: float,
+    ):
+        # the watermark only passes ids that were read a commit window ago,
+        # transactions holding lower ids have committed by then
+        seen = self.seen_audit_ids.setdefault(schema, deque())
+        seen.append((now, max_audit_id))
+
+        watermark = self.last_audit_ids.get(schema, 0)
+        while len(seen) > 0 and seen[0][0] <= now - self.commit_window_seconds:
+            watermark = max(watermark, seen.popleft()[1])
+
+        # rows dated after asof_timestamp are revisited on later polls,
+        # so the watermark stops just short of the earliest of them
+        if min_pending_audit_id is not None:
+            watermark = min(watermark, min_pending_audit_id - 1)
+
+        self.last_audit_ids[schema] = watermark
 
     async def check_for_updates(
         self, epoch_ms: int, schemas: List[str], connection: Connection
@@ -49,43 +95,70 @@ class AuditLogTracker:
         if self.table_update_callback is None:
             raise ValueError("Developer Error: table_update_callback is not set")
 
-        audit_ops = [AuditOps(schema) for schema in schemas]
+        # each poll only reads audit rows written since the previous poll (by audit_id),
+        # all schemas are queried in a single round trip
+        if len(schemas) == 0:
+            return
+
         asof_timestamp = datetime.fromtimestamp(epoch_ms / 1000, tz=pytz.utc)
 
-        for aops in audit_ops:
-            last_updated_map = aops.get_latest_entry(
-                connection, asof_timestamp=asof_timestamp
-            ).select("table_name", "data_source_ts")
-
-            # Check for updates and invoke callback
-            if not last_updated_map.is_empty():
-                for row in last_updated_map.iter_rows():
-                    table_name = row[0]
-                    new_timestamp = row[1]
-
-                    # Check if this table has been updated
-                    table_key = f"{aops.schema}.{table_name}"
-                    last_known = self.last_known_updates.get(table_key)
-
-                    if last_known is None or new_timestamp > last_known:
-                        # Table has been updated, invoke callback
-                        try:
-                            await self.table_update_callback(
-                                aops.schema, table_name, new_timestamp
-                            )
-                            LOGGER.debug(
-                                "Callback invoked for table %s.%s at %s",
-                                aops.schema,
-                                table_name,
-                                new_timestamp,
-                            )
-                        except Exception as e:
-                            LOGGER.error(
-                                "Error in table update callback for %s.%s: %s",
-                                aops.schema,
-                                table_name,
-                                e,
-                            )
-
-                        # Update the last known timestamp
-                        self.update_last_known_update(table_key, new_timestamp)
+        latest_entries_sql = union_all(
+            *[
+                AuditOps(schema).latest_entries_since_sql(
+                    connection, self.last_audit_ids.get(schema, 0), asof_timestamp
+                )
+                for schema in schemas
+            ]
+        )
+
+        rows = (
+            DbOps(connection)
+            .execute_sqlalchemy("sql.audit.check_for_updates", latest_entries_sql)
+            .fetchall()
+        )
+
+        max_audit_ids: Dict[str, int] = dict()
+        min_pending_audit_ids: Dict[str, int] = dict()
+        for schema, table_name, ts, max_audit_id, min_pending_audit_id in rows:
+            max_audit_ids[schema] = max(max_audit_ids.get(schema, 0), max_audit_id)
+            if min_pending_audit_id is not None:
+                min_pending_audit_ids[schema] = min(
+                    min_pending_audit_ids.get(schema, min_pending_audit_id),
+                    min_pending_audit_id,
+                )
+
+            if ts is None:
+                continue
+
+            new_timestamp = pytz.utc.localize(ts)
+
+            # Check if this table has been updated
+            table_key = f"{schema}.{table_name}"
+            last_known = self.last_known_updates.get(table_key)
+
+            if last_known is None or new_timestamp > last_known:
+                # Table has been updated, invoke callback
+                try:
+                    await self.table_update_callback(schema, table_name, new_timestamp)
+                    LOGGER.debug(
+                        "Callback invoked for table %s.%s at %s",
+                        schema,
+                        table_name,
+                        new_timestamp,
+                    )
+                except Exception as e:
+                    LOGGER.error(
+                        "Error in table update callback for %s.%s: %s",
+                        schema,
+                        table_name,
+                        e,
+                    )
+
+                # Update the last known timestamp
+                self.update_last_known_update(table_key, new_timestamp)
+
+        now = time.monotonic()
+        for schema, max_audit_id in max_audit_ids.items():
+            self._advance_watermark(
+                schema, max_audit_id, min_pending_audit_ids.get(schema), now
+            )
@@ -0,0 +1,191 @@
+import logging
+import os
+import tempfile
+from typing import Iterator, List, Optional
+
+import polars as pl
+from sqlalchemy import Connection, Table
+from sqlalchemy.dialects import mysql
+
+from .db import DbOps
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def insert_with_pandas(
+    df: pl.DataFrame, tbl: Table, connection: Connection, chunksize: int = 1000
+) -> int:
+    num_rows_changed = df.to_pandas().to_sql(
+        name=str(tbl.name),
+        con=connection,
+        schema=tbl.schema,
+        if_exists="append",
+        index=False,
+        chunksize=chunksize,
+    )
+
+    return num_rows_changed or 0
+
+
+def insert_with_executemany(
+    df: pl.DataFrame, tbl: Table, connection: Connection, batch_rows: int
+) -> int:
+    # rows go straight from the polars buffers to the DBAPI cursor, the driver
+    # is left to pack each batch into as few statements as it can
+    insert_sql = _insert_statement(tbl, df.columns, 1, connection)
+
+    num_rows_changed = 0
+    for batch in df.iter_slices(n_rows=batch_rows):
+        result = DbOps(connection).execute_driver_sql(
+            "sql.dataframe.insert.executemany",
+            insert_sql,
+            batch.rows(),
+            table=tbl.fullname,
+        )
+        num_rows_changed += max(result.rowcount, 0)
+
+    return num_rows_changed
+
+
+def insert_with_multirow_values(
+    df: pl.DataFrame,
+    tbl: Table,
+    connection: Connection,
+    batch_rows: int,
+    batch_bytes: int,
+) -> int:
+    rows_per_statement = _rows_per_statement(df, batch_rows, batch_bytes)
+
+    LOGGER.debug(
+        "multirow insert into %s: %d rows/statement", tbl.fullname, rows_per_statement
+    )
+
+    num_rows_changed = 0
+    insert_sql = _insert_statement(tbl, df.columns, rows_per_statement, connection)
+    for batch in df.iter_slices(n_rows=rows_per_statement):
+        if len(batch) != rows_per_statement:
+            insert_sql = _insert_statement(tbl, df.columns, len(batch), connection)
+
+        result = DbOps(connection).execute_driver_sql(
+            "sql.dataframe.insert.multirow",
+            insert_sql,
+            tuple(_flatten_rows(batch)),
+            table=tbl.fullname,
+        )
+        num_rows_changed += max(result.rowcount, 0)
+
+    return num_rows_changed
+
+
+def insert_with_load_data(
+    df: pl.DataFrame, tbl: Table, connection: Connection, tmp_dir: Optional[str]
+) -> int:
+    # requires local_infile on both the server and the client, e.g.
+    # create_engine(..., connect_args={"local_infile": True}) for pymysql
+    fd, tmp_path = tempfile.mkstemp(prefix="phdb_", suffix=".tsv", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            _encode_for_load_data(df).write_csv(
+                fp,
+                separator="\t",
+                line_terminator="\n",
+                include_header=False,
+                quote_style="never",
+                null_value="\\N",
+                datetime_format="%Y-%m-%d %H:%M:%S%.6f",
+                date_format="%Y-%m-%d",
+                time_format="%H:%M:%S%.6f",
+            )
+
+        load_sql = _load_data_statement(tbl, df.columns, tmp_path, connection)
+        result = DbOps(connection).execute_driver_sql(
+            "sql.dataframe.insert.load_data", load_sql, table=tbl.fullname
+        )
+    finally:
+        os.remove(tmp_path)
+
+    return max(result.rowcount, 0)
+
+
+def _encode_for_load_data(df: pl.DataFrame) -> pl.DataFrame:
+    # text columns use the mariadb escape sequences for LOAD DATA (ESCAPED BY '\\'),
+    # booleans are written as 0/1; every other type is written by polars as-is
+    special_chars = ["\\", "\t", "\n", "\r", "\0"]
+    escaped_chars = ["\\\\", "\\t", "\\n", "\\r", "\\0"]
+
+    exprs = []
+    for col_name, dtype in df.schema.items():
+        if dtype == pl.Boolean:
+            exprs.append(pl.col(col_name).cast(pl.UInt8))
+        elif dtype in (pl.Utf8, pl.Categorical) or isinstance(dtype, pl.Enum):
+            exprs.append(
+                pl.col(col_name)
+                .cast(pl.Utf8)
+                .str.replace_many(special_chars, escaped_chars)
+            )
+        else:
+            exprs.append(pl.col(col_name))
+
+    return df.select(exprs)
+
+
+def _load_data_statement(
+    tbl: Table, columns: List[str], path: str, connection: Connection
+) -> str:
+    preparer = connection.dialect.identifier_preparer
+
+    # BIT columns would otherwise take the raw bytes of the text field,
+    # so they are read into a user variable and converted. the variable is
+    # named by position, column names need not be valid variable names.
+    targets = []
+    assignments = []
+    for i, c in enumerate(columns):
+        if isinstance(tbl.c[c].type, mysql.BIT):
+            targets.append(f"@v{i}")
+            assignments.append(f"{preparer.quote(c)} = CAST(@v{i} AS UNSIGNED)")
+        else:
+            targets.append(preparer.quote(c))
+
+    escaped_path = path.replace("\\", "\\\\").replace("'", "\\'")
+    load_sql = (
+        f"LOAD DATA LOCAL INFILE '{escaped_path}' "
+        f"INTO TABLE {preparer.format_table(tbl)} "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+        "LINES TERMINATED BY '\\n' "
+        f"({', '.join(targets)})"
+    )
+
+    if assignments:
+        load_sql += f" SET {', '.join(assignments)}"
+
+    return load_sql
+
+
+def _rows_per_statement(df: pl.DataFrame, batch_rows: int, batch_bytes: int) -> int:
+    # literal values are wider than their in-memory representation
+    # (quoting, escaping, datetimes as text) so over-estimate each row
+    bytes_per_row = 2 * df.estimated_size() / max(len(df), 1)
+    rows = int(batch_bytes // max(bytes_per_row, 1))
+    return max(1, min(rows, batch_rows))
+
+
+def _flatten_rows(df: pl.DataFrame) -> Iterator:
+    for row in df.iter_rows():
+        yield from row
+
+
+def _insert_statement(
+    tbl: Table, columns: List[str], num_rows: int, connection: Connection
+) -> str:
+    preparer = connection.dialect.identifier_preparer
+    placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+
+    column_list = ", ".join(preparer.quote(c) for c in columns)
+    row_values = "(" + ", ".join([placeholder] * len(columns)) + ")"
+    all_values = ", ".join([row_values] * num_rows)
+
+    return (
+        f"INSERT INTO {preparer.format_table(tbl)} ({column_list}) VALUES {all_values}"
+    )
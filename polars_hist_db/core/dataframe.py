@@ -1,7 +1,17 @@
 from datetime import datetime, time
 import logging
 from types import MappingProxyType
-from typing import Dict, Iterable, List, Literal, Mapping, Optional, Union
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
 from uuid import uuid4
 
 import polars as pl
@@ -17,24 +27,30 @@ from sqlalchemy import (
     Selectable,
     Subquery,
     Table,
+    text,
     TextClause,
 )
 
 
+from .bulk_insert import (
+    insert_with_executemany,
+    insert_with_load_data,
+    insert_with_multirow_values,
+    insert_with_pandas,
+)
 from .db import DbOps
-from .delta_table import DeltaTableOps
+from .delta_table import BUCKET_COL, BUCKET_ROW_COL, DeltaTableOps
 from .table import TableOps
 from .table_config import TableConfigOps
 from .timehint import TimeHint
+from .validation import validate_dataframe
 
 from ..config import DeltaConfig, TableConfig
+from ..config.dataset import InsertMethod, ValidationAction
 
 from ..types import SQLType, PolarsType
 
-from ..utils.db_utils import (
-    is_text_col,
-    strip_outer_quotes,
-)
+from ..utils.db_utils import strip_outer_quotes
 
 
 LOGGER = logging.getLogger(__name__)
@@ -52,7 +68,9 @@ class DataframeOps:
     ) -> pl.DataFrame:
         tbo = TableOps(table_schema, table_name, self.connection)
         tbl = tbo.get_table_metadata()
-        select_sql = select(tbl)
+        select_sql = select(
+            *[c for c in tbl.columns if c.name not in TableOps.row_hash_column()]
+        )
         dtypes = PolarsType.get_dataframe_schema_from_selectable(select_sql)
 
         if time_hint:
@@ -205,6 +223,11 @@ class DataframeOps:
         uniqueness_col_set: Iterable[str],
         prefill_nulls_with_default: bool,
         clear_table_first: bool = False,
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
+        validation_action: ValidationAction = "log",
     ) -> int:
         tbo = TableOps(table_schema, table_name, self.connection)
         tbl = tbo.get_table_metadata()
@@ -244,39 +267,91 @@ class DataframeOps:
                     )
 
         df = _remove_duplicate_rows(df, uniqueness_col_set)
-        _prevalidate_insert_from_dataframe(df, tbl, disable_check=False)
+        df = validate_dataframe(df, tbl, validation_action)
 
         LOGGER.debug(
             "inserting dataframe %s into %s.%s", df.shape, table_schema, table_name
         )
 
-        cols_to_upload = {c.name for c in tbl.columns}.intersection(df.columns)
-        num_rows_changed: int = (
-            df.select(cols_to_upload)
-            .to_pandas()
-            .to_sql(
-                name=table_name,
-                con=self.connection,
-                schema=table_schema,
-                if_exists="append",
-                index=False,
-                chunksize=1000,
-            )
-        )
+        cols_to_upload = [c.name for c in tbl.columns if c.name in df.columns]
+        df = df.select(cols_to_upload)
 
-        if num_rows_changed is None:
-            num_rows_changed = 0
+        match insert_method:
+            case "pandas":
+                num_rows_changed = insert_with_pandas(df, tbl, self.connection)
+            case "executemany":
+                num_rows_changed = insert_with_executemany(
+                    df, tbl, self.connection, insert_batch_rows
+                )
+            case "multirow":
+                num_rows_changed = insert_with_multirow_values(
+                    df, tbl, self.connection, insert_batch_rows, insert_batch_bytes
+                )
+            case "load_data":
+                num_rows_changed = insert_with_load_data(
+                    df, tbl, self.connection, insert_tmp_dir
+                )
+            case _:
+                raise ValueError(f"invalid insert_method: {insert_method}")
 
         LOGGER.debug("insert dataframe affected %d/%d rows", num_rows_changed, len(df))
 
         return num_rows_changed
 
+    def table_insert_buckets(
+        self,
+        dfs: Sequence[pl.DataFrame],
+        table_schema: str,
+        table_name: str,
+        uniqueness_col_set: Iterable[str],
+        prefill_nulls_with_default: bool,
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
+        validation_action: ValidationAction = "log",
+    ) -> int:
+        """Replaces the rows of a bucket table with dataframes, one bucket each.
+
+        Rows are deduplicated within their bucket, and numbered so that the
+        table can be keyed by (BUCKET_COL, BUCKET_ROW_COL).
+        """
+        uniqueness_col_set = list(uniqueness_col_set)
+        bucket_dfs = [
+            _remove_duplicate_rows(df, uniqueness_col_set).with_columns(
+                pl.lit(i, dtype=pl.Int32).alias(BUCKET_COL)
+            )
+            for i, df in enumerate(dfs)
+        ]
+        df = pl.concat(bucket_dfs, how="diagonal_relaxed").with_row_index(
+            BUCKET_ROW_COL
+        )
+
+        return self.table_insert(
+            df.with_columns(pl.col(BUCKET_ROW_COL).cast(pl.Int64)),
+            table_schema,
+            table_name,
+            uniqueness_col_set=[BUCKET_COL, BUCKET_ROW_COL],
+            prefill_nulls_with_default=prefill_nulls_with_default,
+            clear_table_first=True,
+            insert_method=insert_method,
+            insert_batch_rows=insert_batch_rows,
+            insert_batch_bytes=insert_batch_bytes,
+            insert_tmp_dir=insert_tmp_dir,
+            validation_action=validation_action,
+        )
+
     def table_update(
         self,
         df: pl.DataFrame,
         table_schema: str,
         table_name: str,
         primary_keys_override: Optional[List[str]] = None,
+        staging_min_rows: int = 1000,
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
     ):
         if df.is_empty():
             return
@@ -294,6 +369,37 @@ class DataframeOps:
         df = _remove_duplicate_rows(df, primary_keys)
         common_cols = set(df.columns).intersection([c.name for c in tbl.columns])
 
+        if len(df) < staging_min_rows:
+            num_updates = self._table_update_executemany(
+                df, tbl, primary_keys, common_cols
+            )
+        else:
+            num_updates = self._table_update_staged(
+                df,
+                tbl,
+                primary_keys,
+                common_cols,
+                insert_method,
+                insert_batch_rows,
+                insert_batch_bytes,
+                insert_tmp_dir,
+            )
+
+        LOGGER.info(
+            "updated from dataframe %d/%d rows in %s.%s",
+            num_updates,
+            len(df),
+            table_schema,
+            table_name,
+        )
+
+    def _table_update_executemany(
+        self,
+        df: pl.DataFrame,
+        tbl: Table,
+        primary_keys: List[str],
+        common_cols: Set[str],
+    ) -> int:
         update_sql = (
             tbl.update()
             .values(
@@ -313,18 +419,116 @@ class DataframeOps:
         )
 
         result = DbOps(self.connection).execute_sqlalchemy(
-            f"sql.dataframe.update.{len(update_data)}",
+            "sql.dataframe.update.executemany",
             update_sql,
             update_data,
         )
 
-        LOGGER.info(
-            "updated from dataframe %d/%d rows in %s.%s",
-            result.rowcount,
-            len(df),
+        return result.rowcount
+
+    def _table_update_staged(
+        self,
+        df: pl.DataFrame,
+        tbl: Table,
+        primary_keys: List[str],
+        common_cols: Set[str],
+        insert_method: InsertMethod,
+        insert_batch_rows: int,
+        insert_batch_bytes: int,
+        insert_tmp_dir: Optional[str],
+    ) -> int:
+        staging_cols = [c.name for c in tbl.columns if c.name in common_cols]
+        staging_tbl = self.create_staging_table(
+            df.select(staging_cols),
+            tbl,
+            primary_keys,
+            insert_method,
+            insert_batch_rows,
+            insert_batch_bytes,
+            insert_tmp_dir,
+        )
+
+        try:
+            update_sql = (
+                tbl.update()
+                .values(
+                    {
+                        col: staging_tbl.c[col]
+                        for col in staging_cols
+                        if col not in primary_keys
+                    }
+                )
+                .where(and_(*[tbl.c[k] == staging_tbl.c[k] for k in primary_keys]))
+            )
+
+            result = DbOps(self.connection).execute_sqlalchemy(
+                "sql.dataframe.update.staged", update_sql
+            )
+        finally:
+            self.drop_staging_table(staging_tbl)
+
+        return result.rowcount
+
+    def create_staging_table(
+        self,
+        df: pl.DataFrame,
+        tbl_for_types: Table,
+        key_cols: List[str],
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
+    ) -> Table:
+        """Creates a temporary table keyed on key_cols, typed like tbl_for_types,
+        and loads df into it. Drop it with drop_staging_table.
+        """
+        # the key columns form the primary key of the staging table, so
+        # rows with a null key can never match and are dropped up front
+        assert tbl_for_types.schema is not None
+        table_schema = tbl_for_types.schema
+        staging_table_name = f"tmp_{uuid4().hex}"
+        df = df.drop_nulls(key_cols)
+
+        self.table_create(
             table_schema,
-            table_name,
+            staging_table_name,
+            df,
+            key_cols,
+            tbl_for_types=tbl_for_types,
+            is_temporary_table=True,
+        )
+
+        self.table_insert(
+            df,
+            table_schema,
+            staging_table_name,
+            key_cols,
+            prefill_nulls_with_default=False,
+            insert_method=insert_method,
+            insert_batch_rows=insert_batch_rows,
+            insert_batch_bytes=insert_batch_bytes,
+            insert_tmp_dir=insert_tmp_dir,
+        )
+
+        staging_tbl = TableOps(
+            table_schema, staging_table_name, self.connection
+        ).get_table_metadata()
+
+        return staging_tbl
+
+    def drop_staging_table(self, staging_tbl: Table):
+        """Drops a temporary table, without committing the open transaction."""
+        # unlike DROP TABLE, DROP TEMPORARY does not commit implicitly
+        fq_staging_table = self.connection.dialect.identifier_preparer.format_table(
+            staging_tbl
+        )
+        drop_sql = text(f"DROP TEMPORARY TABLE IF EXISTS {fq_staging_table}")
+        DbOps(self.connection).execute_sqlalchemy(
+            "sql.dataframe.drop_staging_table", drop_sql
         )
+        TableOps(
+            str(staging_tbl.schema), staging_tbl.name, self.connection
+        ).invalidate_metadata()
 
     def table_upsert_temporal(
         self,
@@ -362,6 +566,10 @@ class DataframeOps:
             tmp_table_config.primary_keys,
             clear_table_first=True,
             prefill_nulls_with_default=delta_config.prefill_nulls_with_default,
+            insert_method=delta_config.insert_method,
+            insert_batch_rows=delta_config.insert_batch_rows,
+            insert_batch_bytes=delta_config.insert_batch_bytes,
+            insert_tmp_dir=delta_config.insert_tmp_dir,
         )
 
         DeltaTableOps(
@@ -380,19 +588,41 @@ class DataframeOps:
         table_schema: str,
         table_name: str,
         update_time: Optional[datetime] = None,
+        staging_min_rows: int = 1000,
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
     ) -> int:
         DbOps(self.connection).set_system_versioning_time(update_time)
 
         num_deletions = 0
         if not df.is_empty():
-            num_deletions = self.table_delete_rows(df, table_schema, table_name)
+            num_deletions = self.table_delete_rows(
+                df,
+                table_schema,
+                table_name,
+                staging_min_rows=staging_min_rows,
+                insert_method=insert_method,
+                insert_batch_rows=insert_batch_rows,
+                insert_batch_bytes=insert_batch_bytes,
+                insert_tmp_dir=insert_tmp_dir,
+            )
 
         DbOps(self.connection).set_system_versioning_time(None)
 
         return num_deletions
 
     def table_delete_rows(
-        self, df: pl.DataFrame, table_schema: str, table_name: str
+        self,
+        df: pl.DataFrame,
+        table_schema: str,
+        table_name: str,
+        staging_min_rows: int = 1000,
+        insert_method: InsertMethod = "pandas",
+        insert_batch_rows: int = 50_000,
+        insert_batch_bytes: int = 4 * 1024 * 1024,
+        insert_tmp_dir: Optional[str] = None,
     ) -> int:
         if df.is_empty():
             return 0
@@ -411,6 +641,25 @@ class DataframeOps:
         if len(set(df.columns).difference(primary_keys)) > 0:
             raise ValueError("missing primary keys in dataframe: %s", primary_keys)
 
+        if len(df) < staging_min_rows:
+            num_deleted_rows = self._table_delete_rows_executemany(df, tbl)
+        else:
+            num_deleted_rows = self._table_delete_rows_staged(
+                df,
+                tbl,
+                insert_method,
+                insert_batch_rows,
+                insert_batch_bytes,
+                insert_tmp_dir,
+            )
+
+        LOGGER.debug(
+            "deleted %d rows from %s.%s", num_deleted_rows, table_schema, table_name
+        )
+
+        return num_deleted_rows
+
+    def _table_delete_rows_executemany(self, df: pl.DataFrame, tbl: Table) -> int:
         delete_sql = delete(tbl).where(
             and_(*[tbl.c[col] == bindparam(f"_{col}") for col in df.columns])
         )
@@ -421,21 +670,45 @@ class DataframeOps:
             .to_dict(orient="records")
         )
 
-        count_before = tbo.row_count()
-        _result = DbOps(self.connection).execute_sqlalchemy(
-            f"sql.dataframe.delete.{len(delete_data)}",
+        result = DbOps(self.connection).execute_sqlalchemy(
+            "sql.dataframe.delete.executemany",
             delete_sql,
             delete_data,
         )
 
-        count_after = tbo.row_count()
+        return result.rowcount
 
-        num_deleted_rows = count_after - count_before
-        LOGGER.debug(
-            "deleted %d rows from %s.%s", num_deleted_rows, table_schema, table_name
+    def _table_delete_rows_staged(
+        self,
+        df: pl.DataFrame,
+        tbl: Table,
+        insert_method: InsertMethod,
+        insert_batch_rows: int,
+        insert_batch_bytes: int,
+        insert_tmp_dir: Optional[str],
+    ) -> int:
+        staging_tbl = self.create_staging_table(
+            df,
+            tbl,
+            df.columns,
+            insert_method,
+            insert_batch_rows,
+            insert_batch_bytes,
+            insert_tmp_dir,
         )
 
-        return num_deleted_rows
+        try:
+            delete_sql = delete(tbl).where(
+                and_(*[tbl.c[col] == staging_tbl.c[col] for col in df.columns])
+            )
+
+            result = DbOps(self.connection).execute_sqlalchemy(
+                "sql.dataframe.delete.staged", delete_sql
+            )
+        finally:
+            self.drop_staging_table(staging_tbl)
+
+        return result.rowcount
 
 
 def _remove_duplicate_rows(
@@ -456,41 +729,3 @@ def _remove_duplicate_rows(
         LOGGER.debug("removed %s duplicate rows", rows_removed)
 
     return df
-
-
-def _prevalidate_insert_from_dataframe(
-    df: pl.DataFrame, tbl: Table, disable_check: bool
-):
-    if disable_check:
-        return
-
-    for col in tbl.columns:
-        if col not in df.columns:
-            continue
-
-        if is_text_col(str(col.type)):
-            df_col = df.select(col.name).drop_nulls()
-            if df_col.is_empty():
-                continue
-
-        try:
-            max_col_len = col.type.length  # type: ignore[attr-defined]
-            truncated_data = (
-                df_col.select(
-                    col.name,
-                    length=(
-                        pl.col(col.name)
-                        .cast(pl.Utf8)
-                        .map_elements(len, skip_nulls=True)
-                    ),
-                )
-                .sort(pl.col("length"), descending=True)
-                .filter(pl.col("length") >= pl.lit(max_col_len))
-            )
-
-            if not truncated_data.is_empty():
-                LOGGER.error("data truncation in column %s", col.name)
-                LOGGER.error(truncated_data)
-
-        except Exception as e:
-            LOGGER.error("failed to check column %s", col, exc_info=e)
@@ -8,11 +8,16 @@ from sqlalchemy import (
     Connection,
     CursorResult,
     Executable,
+    Table,
     text,
 )
-from sqlalchemy.engine.interfaces import _CoreAnyExecuteParams
+from sqlalchemy.engine.interfaces import (
+    _CoreAnyExecuteParams,
+    _DBAPIAnyExecuteParams,
+)
 
 from ..utils.clock import Clock
+from ..utils.metrics import current_dataset, sql_statement_seconds, table_label
 
 
 LOGGER = logging.getLogger(__name__)
@@ -29,7 +34,7 @@ class DbOps:
         COLLATE utf8mb4_unicode_ci
         """
         _result = self.execute_sqlalchemy(
-            f"sql.base.create_db.{table_schema}", text(sql)
+            "sql.base.create_db", text(sql), table=table_schema
         )
 
     @staticmethod
@@ -43,6 +48,7 @@ class DbOps:
         parameters: Optional[_CoreAnyExecuteParams] = None,
         disable_foreign_key_checks: bool = False,
         disable_keys: Optional[str] = None,
+        table: Optional[str] = None,
     ) -> CursorResult[Any]:
         timings = Clock()
         try:
@@ -67,8 +73,35 @@ class DbOps:
 
         sql_time = time.perf_counter() - start_time
         timings.add_timing(description, sql_time)
+        self._observe(description, sql_time, table or _statement_table(statement))
         return result
 
+    def execute_driver_sql(
+        self,
+        description: str,
+        statement: str,
+        parameters: Optional[_DBAPIAnyExecuteParams] = None,
+        table: Optional[str] = None,
+    ) -> CursorResult[Any]:
+        # bypasses SQLAlchemy statement compilation, parameters are passed
+        # to the DBAPI cursor as-is (a list of tuples runs as executemany)
+        timings = Clock()
+        start_time = time.perf_counter()
+        result = self.connection.exec_driver_sql(statement, parameters)
+        sql_time = time.perf_counter() - start_time
+        timings.add_timing(description, sql_time)
+        self._observe(description, sql_time, table or "")
+        return result
+
+    @staticmethod
+    def _observe(description: str, sql_time: float, table: str):
+        sql_statement_seconds().observe(
+            sql_time,
+            dataset=current_dataset(),
+            statement=description,
+            table=table_label(table),
+        )
+
     def get_all_variables(self, filter: Optional[str] = None) -> pl.DataFrame:
         if filter is None:
             sql = text("SHOW variables;")
@@ -94,3 +127,12 @@ class DbOps:
         _result = self.execute_sqlalchemy("sql.op.set_system_versioning_time", sql)
 
         LOGGER.debug("System versioning time set to: %s", arg)
+
+
+def _statement_table(statement: Executable) -> str:
+    # the target of INSERT/UPDATE/DELETE statements, other statements are unlabelled
+    table = getattr(statement, "table", None)
+    if isinstance(table, Table):
+        return table.fullname
+
+    return ""
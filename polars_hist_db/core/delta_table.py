@@ -1,32 +1,130 @@
 from datetime import datetime
 import logging
 from types import MappingProxyType
-from typing import List, Literal, Mapping, Optional, Tuple
+from typing import List, Literal, Mapping, Optional, Sequence, Tuple
 
+import polars as pl
+import pyarrow as pa
 from sqlalchemy import (
     and_,
     ColumnElement,
     Connection,
     DefaultClause,
     delete,
+    Delete,
     exists,
     func,
     not_,
+    null,
+    Insert,
     select,
     Table,
+    Update,
 )
 from sqlalchemy.future import select as future_select
 from sqlalchemy.sql.functions import coalesce
+import xxhash
 
 from .db import DbOps
+from .statement_cache import CompiledStatementCache
 from .table import TableOps
 
 from ..config import DeltaConfig, TableConfig, TableColumnConfig
 from ..utils.db_utils import is_text_col
+from ..utils.metrics import add_stage_rows, timed_stage
 
 
 LOGGER = logging.getLogger(__name__)
 
+# columns of a bucket table, which holds all time partitions of a transaction
+BUCKET_COL = "__bucket"
+BUCKET_ROW_COL = "__row"
+
+# column of a delta table holding the hash of the compared columns of a row
+(ROW_HASH_COL,) = TableOps.row_hash_column()
+
+
+def _encode_value(value: pl.Expr, dtype: pl.DataType) -> pl.Expr:
+    # an encoding that does not depend on how polars formats or hashes values
+    if dtype.is_float():
+        # the bits of the double, with -0.0 normalised to 0.0
+        return (
+            value.cast(pl.Float64)
+            .add(0.0)
+            .map_batches(
+                lambda s: pl.Series(s.fill_null(0.0).to_arrow().view(pa.int64())),
+                return_dtype=pl.Int64,
+            )
+        )
+    if isinstance(dtype, pl.Datetime):
+        return value.dt.epoch("us")
+    if dtype.is_temporal():
+        return value.to_physical()
+    if isinstance(dtype, pl.Binary):
+        return value.bin.encode("hex")
+    return value
+
+
+def _encode_field(col_name: str, dtype: pl.DataType) -> pl.Expr:
+    raw_value = pl.col(col_name)
+    value = raw_value.cast(dtype, strict=False)
+    encoded = _encode_value(value, dtype).cast(pl.Utf8)
+
+    # values that do not cast are hashed as they are, rather than as null
+    uncast = raw_value.cast(pl.Utf8)
+
+    def length_prefixed(tag: str, s: pl.Expr) -> pl.Expr:
+        return pl.concat_str(
+            pl.lit(tag), s.str.len_bytes().cast(pl.Utf8), pl.lit(":"), s
+        )
+
+    return (
+        pl.when(raw_value.is_null())
+        .then(pl.lit("n"))
+        .when(value.is_null())
+        .then(length_prefixed("r", uncast))
+        .otherwise(length_prefixed("v", encoded))
+    )
+
+
+def _xxh3_64(encoded: pl.Series) -> pl.Series:
+    return pl.Series(
+        [xxhash.xxh3_64_intdigest(row.encode()) for row in encoded],
+        dtype=pl.UInt64,
+    ).reinterpret(signed=True)
+
+
+def with_row_hash(
+    df: pl.DataFrame,
+    columns: Sequence[str],
+    schema: Mapping[str, pl.DataType] = MappingProxyType({}),
+) -> pl.DataFrame:
+    """Adds ROW_HASH_COL, a signed 64-bit hash of the columns of each row.
+
+    The columns are hashed in name order, cast to the dtypes of schema so a
+    row hashes the same whatever dtypes were inferred for the partition.
+    Categoricals are hashed by value rather than by their physical codes.
+    The hash is the xxh3 of a canonical encoding of the row, so it is stable
+    across polars versions.
+    """
+
+    def hash_dtype(col_name: str) -> pl.DataType:
+        dtype = schema.get(col_name, df.schema[col_name])
+        if isinstance(dtype, (pl.Categorical, pl.Enum)):
+            return pl.Utf8()
+
+        return dtype
+
+    hash_cols = sorted(set(c for c in columns if c in df.columns))
+    if len(hash_cols) == 0:
+        raise ValueError(f"no columns to hash in {df.columns}")
+
+    return df.with_columns(
+        pl.concat_str([_encode_field(c, hash_dtype(c)) for c in hash_cols])
+        .map_batches(_xxh3_64, return_dtype=pl.Int64)
+        .alias(ROW_HASH_COL)
+    )
+
 
 class DeltaTableOps:
     def __init__(
@@ -44,6 +142,45 @@ class DeltaTableOps:
     def table_config(self, column_definitions: List[TableColumnConfig]) -> TableConfig:
         return TableConfig(self.table_name, self.table_schema, column_definitions)
 
+    def load_bucket(self, bucket_table: str, bucket: int) -> int:
+        """Replaces the rows of the delta table with one bucket of a bucket table.
+
+        The rows are copied on the server, the bucket table is keyed by
+        (BUCKET_COL, BUCKET_ROW_COL) so only the bucket's rows are read.
+        """
+        delta_tbl = TableOps(
+            self.table_schema, self.table_name, self.connection
+        ).get_table_metadata()
+        bucket_tbl = TableOps(
+            self.table_schema, bucket_table, self.connection
+        ).get_table_metadata()
+
+        columns = [c.name for c in delta_tbl.columns if c.name in bucket_tbl.c]
+
+        DbOps(self.connection).execute_sqlalchemy(
+            "sql.delta.load_bucket.clear", delta_tbl.delete()
+        )
+        result = DbOps(self.connection).execute_sqlalchemy(
+            "sql.delta.load_bucket.insert",
+            delta_tbl.insert().from_select(
+                columns,
+                select(*[bucket_tbl.c[c] for c in columns]).where(
+                    bucket_tbl.c[BUCKET_COL] == bucket
+                ),
+            ),
+            table=f"{self.table_schema}.{self.table_name}",
+        )
+
+        LOGGER.debug(
+            "loaded %d rows of bucket %d into %s.%s",
+            result.rowcount,
+            bucket,
+            self.table_schema,
+            self.table_name,
+        )
+
+        return result.rowcount
+
     def upsert(
         self,
         target_table: str,
@@ -55,11 +192,13 @@ class DeltaTableOps:
         DbOps(self.connection).set_system_versioning_time(update_time)
 
         tgt_to_src_map = {v: k for k, v in src_tgt_colname_map.items()}
+        fq_target_table = f"{self.table_schema}.{target_table}"
 
         if self.delta_config.row_finality == "dropout":
-            deleted_keys = self._drop_missing_rows(
-                self.table_schema, target_table, self.table_name, tgt_to_src_map
-            )
+            with timed_stage("upsert.drop_missing_rows", fq_target_table):
+                deleted_keys = self._drop_missing_rows(
+                    self.table_schema, target_table, self.table_name, tgt_to_src_map
+                )
             num_deletions = len(deleted_keys)
         else:
             num_deletions = 0
@@ -69,27 +208,57 @@ class DeltaTableOps:
             source_tbl = tbo.get_table_metadata()
             source_columns = [c.name for c in source_tbl.columns]
 
+        use_row_hash = (
+            is_main_table and self.delta_config.change_detection == "row_hash"
+        )
+        if use_row_hash and ROW_HASH_COL not in source_columns:
+            source_columns = [*source_columns, ROW_HASH_COL]
+
+        # a hash left by a row_hash writer would be stale after any other update
+        null_columns: List[str] = []
+        if not use_row_hash and TableOps(
+            self.table_schema, target_table, self.connection
+        ).has_all_columns([ROW_HASH_COL]):
+            null_columns.append(ROW_HASH_COL)
+
         if is_main_table and self.delta_config.drop_unchanged_rows:
-            ref_columns = [src_tgt_colname_map.get(c, c) for c in source_columns]
-            num_deletions += self._drop_unchanged_rows(
+            with timed_stage("upsert.drop_unchanged_rows", fq_target_table):
+                if use_row_hash:
+                    num_deletions += self._drop_unchanged_rows_by_hash(
+                        self.table_schema,
+                        target_table=self.table_name,
+                        ref_table=target_table,
+                        ref_tgt_colname_map=tgt_to_src_map,
+                    )
+                else:
+                    ref_columns = [
+                        src_tgt_colname_map.get(c, c) for c in source_columns
+                    ]
+                    num_deletions += self._drop_unchanged_rows(
+                        self.table_schema,
+                        target_table=self.table_name,
+                        ref_table=target_table,
+                        ref_cmp_columns=ref_columns,
+                        ref_tgt_colname_map=tgt_to_src_map,
+                    )
+
+        with timed_stage("upsert.apply", fq_target_table):
+            num_inserts, num_updates = self._table_upsert_nontemporal(
                 self.table_schema,
-                target_table=self.table_name,
-                ref_table=target_table,
-                ref_cmp_columns=ref_columns,
-                ref_tgt_colname_map=tgt_to_src_map,
+                self.table_name,
+                target_table,
+                source_columns,
+                src_tgt_colname_map,
+                on_duplicate_key=self.delta_config.on_duplicate_key,
+                null_columns=null_columns,
             )
 
-        num_inserts, num_updates = self._table_upsert_nontemporal(
-            self.table_schema,
-            self.table_name,
-            target_table,
-            source_columns,
-            src_tgt_colname_map,
-            on_duplicate_key=self.delta_config.on_duplicate_key,
-        )
-
         DbOps(self.connection).set_system_versioning_time(None)
 
+        add_stage_rows("upsert.insert", num_inserts, fq_target_table)
+        add_stage_rows("upsert.update", num_updates, fq_target_table)
+        add_stage_rows("upsert.delete", num_deletions, fq_target_table)
+
         return num_inserts, num_updates, num_deletions
 
     def _table_upsert_nontemporal(
@@ -100,6 +269,7 @@ class DeltaTableOps:
         source_columns: Optional[List[str]] = None,
         src_tgt_colname_map: Mapping[str, str] = MappingProxyType({}),
         on_duplicate_key: Literal["error", "take_last", "take_first"] = "error",
+        null_columns: Sequence[str] = (),
     ) -> Tuple[int, int]:
         target_tbo = TableOps(table_schema, target_table, self.connection)
         target_tbl = target_tbo.get_table_metadata()
@@ -109,6 +279,76 @@ class DeltaTableOps:
         if source_columns is None:
             source_columns = [c.name for c in src_tbl.columns]
 
+        cache_key = (
+            "upsert",
+            table_schema,
+            src_table,
+            target_table,
+            tuple(source_columns),
+            tuple(sorted(src_tgt_colname_map.items())),
+            on_duplicate_key,
+            tuple(null_columns),
+        )
+
+        update_sql, insert_sql = CompiledStatementCache().get_or_compile(
+            self.connection,
+            cache_key,
+            (src_tbl, target_tbl),
+            lambda: self._build_upsert_statements(
+                src_tbl,
+                target_tbl,
+                target_tbo,
+                source_columns,
+                src_tgt_colname_map,
+                on_duplicate_key,
+                null_columns,
+            ),
+        )
+
+        if update_sql is None:
+            num_updates = 0
+        else:
+            result = DbOps(self.connection).execute_driver_sql(
+                "sql.base.upsert.update",
+                update_sql,
+                table=f"{table_schema}.{target_table}",
+            )
+
+            num_updates = result.rowcount
+
+        assert insert_sql is not None
+        try:
+            result = DbOps(self.connection).execute_driver_sql(
+                "sql.base.upsert.insert",
+                insert_sql,
+                table=f"{table_schema}.{target_table}",
+            )
+        except Exception as e:
+            LOGGER.error(e)
+            raise e
+        num_inserts = result.rowcount
+
+        if num_inserts > 0 or num_updates > 0:
+            LOGGER.debug(
+                "Table[%s.%s]: inserted %d, updated %d",
+                table_schema,
+                target_table,
+                num_inserts,
+                num_updates,
+            )
+
+        return num_inserts, num_updates
+
+    def _build_upsert_statements(
+        self,
+        src_tbl: Table,
+        target_tbl: Table,
+        target_tbo: TableOps,
+        source_columns: List[str],
+        src_tgt_colname_map: Mapping[str, str],
+        on_duplicate_key: Literal["error", "take_last", "take_first"],
+        null_columns: Sequence[str] = (),
+    ) -> Tuple[Optional[Update], Insert]:
         _prevalidate_upsert_from_table(
             src_tbl,
             target_tbl,
@@ -136,9 +376,12 @@ class DeltaTableOps:
             for sc_name in source_columns
             if src_tgt_colname_map.get(sc_name, sc_name) != tgt_id_col
         }
+        if len(update_set) > 0:
+            update_set.update({tc_name: null() for tc_name in null_columns})
 
+        update_existing_keys: Optional[Update]
         if len(update_set) == 0:
-            num_updates = 0
+            update_existing_keys = None
         else:
             update_existing_keys = (
                 target_tbl.update()
@@ -153,12 +396,6 @@ class DeltaTableOps:
                 )
             )
 
-            result = DbOps(self.connection).execute_sqlalchemy(
-                "sql.base.upsert.update", update_existing_keys
-            )
-
-            num_updates = result.rowcount
-
         primary_key_matches = (
             tk == src_tbl.c[tgt_to_src_map.get(tk.name, tk.name)] for tk in tgt_pk
         )
@@ -171,6 +408,7 @@ class DeltaTableOps:
             src_tbl.c[tgt_to_src_map.get(tk.name, tk.name)].isnot(None) for tk in tgt_pk
         ]
 
+        insert_new_keys: Insert
         if on_duplicate_key == "error":
             insert_new_keys = target_tbl.insert().from_select(
                 [src_tgt_colname_map.get(sc, sc) for sc in source_columns],
@@ -236,30 +474,7 @@ class DeltaTableOps:
                 future_select(unique_items),
             )
 
-        # debug_result = pl.read_database(f"select * from {table_schema}.{src_table}", connection)
-
-        try:
-            result = DbOps(self.connection).execute_sqlalchemy(
-                "sql.base.upsert.insert",
-                insert_new_keys,
-                # disable_foreign_key_checks=True,
-                # disable_keys=f"{table_schema}.{target_table}",
-            )
-        except Exception as e:
-            LOGGER.error(e)
-            raise e
-        num_inserts = result.rowcount
-
-        if num_inserts > 0 or num_updates > 0:
-            LOGGER.debug(
-                "Table[%s.%s]: inserted %d, updated %d",
-                table_schema,
-                target_table,
-                num_inserts,
-                num_updates,
-            )
-
-        return num_inserts, num_updates
+        return update_existing_keys, insert_new_keys
 
     def _coalesce_if_nullable(
         self, src_tbl: Table, target_tbl: Table, src_col_name: str, target_col_name: str
@@ -303,6 +518,51 @@ class DeltaTableOps:
             ref_cols = {c.name for c in ref_tbl.columns}
             ref_cmp_columns = sorted(target_cols.intersection(ref_cols))
 
+        cache_key = (
+            "drop_unchanged_rows",
+            table_schema,
+            target_table,
+            ref_table,
+            tuple(ref_cmp_columns),
+            tuple(sorted(ref_tgt_colname_map.items())),
+        )
+
+        (delete_sql,) = CompiledStatementCache().get_or_compile(
+            self.connection,
+            cache_key,
+            (target_tbl, ref_tbl),
+            lambda: [
+                self._build_drop_unchanged_rows_statement(
+                    target_tbl, ref_tbl, ref_cmp_columns, ref_tgt_colname_map
+                )
+            ],
+        )
+
+        assert delete_sql is not None
+        result = DbOps(self.connection).execute_driver_sql(
+            "sql.delta.drop_unchanged_rows",
+            delete_sql,
+            table=f"{table_schema}.{target_table}",
+        )
+
+        num_deletes = result.rowcount
+
+        LOGGER.debug(
+            "removed %d unchanged rows from %s.%s",
+            num_deletes,
+            table_schema,
+            target_table,
+        )
+
+        return num_deletes
+
+    def _build_drop_unchanged_rows_statement(
+        self,
+        target_tbl: Table,
+        ref_tbl: Table,
+        ref_cmp_columns: List[str],
+        ref_tgt_colname_map: Mapping[str, str],
+    ) -> Delete:
         identical_rows = (
             select(
                 *[
@@ -331,21 +591,63 @@ class DeltaTableOps:
 
         if not tgt_primary_keys:
             raise ValueError(
-                f"no target primary key found in intersect({target_table}, {ref_table})"
+                f"no target primary key found in intersect({target_tbl.name}, {ref_tbl.name})"
             )
 
-        delete_sql = delete(target_tbl).where(
+        return delete(target_tbl).where(
             and_(*[target_tbl.c[k] == identical_rows.c[k] for k in tgt_primary_keys])
         )
 
-        result = DbOps(self.connection).execute_sqlalchemy(
-            "sql.delta.drop_unchanged_rows", delete_sql
+    def _drop_unchanged_rows_by_hash(
+        self,
+        table_schema: str,
+        target_table: str,
+        ref_table: str,
+        ref_tgt_colname_map: Mapping[str, str] = MappingProxyType({}),
+    ) -> int:
+        """Removes the rows of target_table whose ROW_HASH_COL equals the hash
+        stored with the ref_table row of the same primary key.
+
+        Only the primary keys of target_table are looked up in ref_table.
+        """
+        target_tbo = TableOps(table_schema, target_table, self.connection)
+        ref_tbo = TableOps(table_schema, ref_table, self.connection)
+        target_tbl = target_tbo.get_table_metadata()
+        ref_tbl = ref_tbo.get_table_metadata()
+
+        cache_key = (
+            "drop_unchanged_rows_by_hash",
+            table_schema,
+            target_table,
+            ref_table,
+            tuple(sorted(ref_tgt_colname_map.items())),
+        )
+
+        (delete_sql,) = CompiledStatementCache().get_or_compile(
+            self.connection,
+            cache_key,
+            (target_tbl, ref_tbl),
+            lambda: [
+                self._build_drop_unchanged_rows_by_hash_statement(
+                    target_tbl,
+                    ref_tbl,
+                    ref_tbo.get_primary_keys(ref_tbl),
+                    ref_tgt_colname_map,
+                )
+            ],
+        )
+
+        assert delete_sql is not None
+        result = DbOps(self.connection).execute_driver_sql(
+            "sql.delta.drop_unchanged_rows_by_hash",
+            delete_sql,
+            table=f"{table_schema}.{target_table}",
         )
 
         num_deletes = result.rowcount
 
         LOGGER.debug(
-            "removed %d unchanged rows from %s.%s",
+            "removed %d unchanged rows by hash from %s.%s",
             num_deletes,
             table_schema,
             target_table,
@@ -353,6 +655,33 @@ class DeltaTableOps:
 
         return num_deletes
 
+    def _build_drop_unchanged_rows_by_hash_statement(
+        self,
+        target_tbl: Table,
+        ref_tbl: Table,
+        ref_primary_keys: Sequence[ColumnElement],
+        ref_tgt_colname_map: Mapping[str, str],
+    ) -> Delete:
+        if ROW_HASH_COL not in target_tbl.c or ROW_HASH_COL not in ref_tbl.c:
+            raise ValueError(
+                f"missing {ROW_HASH_COL} in {target_tbl.name} or {ref_tbl.name}"
+            )
+
+        if not ref_primary_keys:
+            raise ValueError(f"no primary key found in {ref_tbl.name}")
+
+        # a null hash never compares equal, so such rows are kept as changed
+        same_row = and_(
+            *[
+                ref_tbl.c[k.name]
+                == target_tbl.c[ref_tgt_colname_map.get(k.name, k.name)]
+                for k in ref_primary_keys
+            ],
+            ref_tbl.c[ROW_HASH_COL] == target_tbl.c[ROW_HASH_COL],
+        )
+
+        return delete(target_tbl).where(exists().where(same_row))
+
     def _drop_missing_rows(
         self,
         table_schema: str,
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from sqlalchemy import Connection, Executable, Table
+from sqlalchemy.sql import ClauseElement
+
+
+LOGGER = logging.getLogger(__name__)
+
+CompiledStatements = Tuple[Optional[str], ...]
+
+
+class CompiledStatementCache:
+    """SQL text of generated statements, shared across the process.
+
+    Entries are only reused for the exact Table objects they were built from.
+    Reflected tables are cached by TableMetadataCache, so any DDL that
+    invalidates a table's metadata also retires the statements built on it.
+    """
+
+    _borg: Dict[str, Any] = {}
+
+    max_entries: int = 256
+
+    _statements: "OrderedDict[Hashable, Tuple[Sequence[Table], CompiledStatements]]"
+    _lock: threading.Lock
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.__dict__ = self._borg
+        if "_statements" not in self._borg:
+            self._borg["_statements"] = OrderedDict()
+            self._borg["_lock"] = threading.Lock()
+            self._borg["hits"] = 0
+            self._borg["misses"] = 0
+
+    def get_or_compile(
+        self,
+        connection: Connection,
+        key: Hashable,
+        tables: Sequence[Table],
+        build_fn: Callable[[], Sequence[Optional[Executable]]],
+    ) -> CompiledStatements:
+        full_key = (connection.dialect.name, key, tuple(id(t) for t in tables))
+
+        with self._lock:
+            entry = self._statements.get(full_key)
+            if entry is not None and all(
+                a is b for a, b in zip(entry[0], tables, strict=True)
+            ):
+                self.hits += 1
+                self._statements.move_to_end(full_key)
+                return entry[1]
+
+            self.misses += 1
+
+        compiled = tuple(
+            None if stmt is None else self._compile(connection, stmt)
+            for stmt in build_fn()
+        )
+
+        with self._lock:
+            self._statements[full_key] = (tuple(tables), compiled)
+            while len(self._statements) > self.max_entries:
+                self._statements.popitem(last=False)
+
+        LOGGER.debug("compiled statements for %s", key)
+
+        return compiled
+
+    @staticmethod
+    def _compile(connection: Connection, stmt: Executable) -> str:
+        # values are inlined so the text can be sent to the driver without parameters
+        assert isinstance(stmt, ClauseElement)
+        compiled = stmt.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+        return str(compiled)
+
+    def clear(self):
+        with self._lock:
+            self._statements.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._statements),
+            }
@@ -1,4 +1,5 @@
 import logging
+import time
 from types import MappingProxyType
 from typing import Mapping, Optional, Sequence
 import warnings
@@ -17,6 +18,8 @@ from sqlalchemy import (
 from sqlalchemy.exc import SAWarning
 
 from .db import DbOps
+from .table_metadata_cache import TableMetadataCache
+from ..utils.clock import Clock
 
 
 LOGGER = logging.getLogger(__name__)
@@ -46,6 +49,7 @@ class TableOps:
         result = DbOps(self.connection).execute_sqlalchemy(
             "sql.op.enable_system_versioning", text(sql)
         )
+        self.invalidate_metadata()
         LOGGER.debug("enabled system versioning %s", result)
 
     def get_table_metadata(
@@ -56,6 +60,12 @@ class TableOps:
         if not autoload_metadata:
             return Table(self.table_name, metadata)
 
+        cache = TableMetadataCache()
+        cached_tbl = cache.get(self.connection, self.table_schema, self.table_name)
+        if cached_tbl is not None:
+            return cached_tbl
+
+        start_time = time.perf_counter()
         with warnings.catch_warnings():
             # skip this annoying SQLAlchemy warning:
             # SAWarning: Unknown schema content: '  PERIOD FOR SYSTEM_TIME (`__valid_from`, `__valid_to`),'
@@ -64,8 +74,16 @@ class TableOps:
 
             tbl = Table(self.table_name, metadata, autoload_with=self.connection)
 
+        Clock().add_timing("sql.op.reflect_table", time.perf_counter() - start_time)
+        cache.put(self.connection, self.table_schema, self.table_name, tbl)
+
         return tbl
 
+    def invalidate_metadata(self):
+        TableMetadataCache().invalidate(
+            self.connection, self.table_schema, self.table_name
+        )
+
     def row_count(self) -> int:
         tbl = self.get_table_metadata()
         count_sql = select(func.count().label("nrow")).select_from(tbl)
@@ -136,7 +154,64 @@ class TableOps:
     def finality_column() -> Sequence[str]:
         return ["__finality"]
 
+    @staticmethod
+    def row_hash_column() -> Sequence[str]:
+        return ["__row_hash"]
+
+    def add_row_hash_column(self) -> bool:
+        """Adds the row hash column to the table, if it is missing.
+
+        Rows that existed before have a null hash, so they are compared as
+        changed once. ALTER TABLE commits implicitly, so this must not run
+        inside a pipeline transaction.
+        """
+        (row_hash_col,) = self.row_hash_column()
+        if row_hash_col in self.get_table_metadata().columns:
+            return False
+
+        db_ops = DbOps(self.connection)
+        alter_history = None
+        if self.is_temporal_table():
+            alter_history = db_ops.execute_sqlalchemy(
+                "sql.table.alter_history",
+                text("SELECT @@system_versioning_alter_history;"),
+            ).scalar_one()
+            db_ops.execute_sqlalchemy(
+                "sql.table.alter_history",
+                text("SET @@system_versioning_alter_history = KEEP;"),
+            )
+
+        try:
+            db_ops.execute_sqlalchemy(
+                "sql.table.add_row_hash_column",
+                text(
+                    f"ALTER TABLE {self.table_schema}.{self.table_name} "
+                    f"ADD COLUMN IF NOT EXISTS {row_hash_col} BIGINT NULL"
+                ),
+                table=f"{self.table_schema}.{self.table_name}",
+            )
+        finally:
+            if alter_history is not None:
+                db_ops.execute_sqlalchemy(
+                    "sql.table.alter_history",
+                    text("SET @@system_versioning_alter_history = :value;"),
+                    {"value": alter_history},
+                )
+        self.invalidate_metadata()
+
+        LOGGER.info(
+            "added %s to %s.%s", row_hash_col, self.table_schema, self.table_name
+        )
+
+        return True
+
     def table_exists(self) -> bool:
+        # cached tables were reflected (or created) through this library
+        if TableMetadataCache().contains(
+            self.connection, self.table_schema, self.table_name
+        ):
+            return True
+
         inspector = inspect(self.connection, raiseerr=True)
         result = inspector.has_table(self.table_name, schema=self.table_schema)
 
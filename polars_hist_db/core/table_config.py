@@ -7,7 +7,6 @@ from sqlalchemy import (
     Connection,
     DefaultClause,
     ForeignKeyConstraint,
-    inspect,
     MetaData,
     Table,
     text,
@@ -17,6 +16,7 @@ from sqlalchemy.schema import CreateTable
 
 from .db import DbOps
 from .table import TableOps
+from .table_metadata_cache import TableMetadataCache
 
 from ..config.table import TableConfig, TableConfigs, TableColumnConfig
 from ..types import SQLAlchemyType
@@ -44,7 +44,6 @@ class TableConfigOps:
         is_delta_table: bool = False,
         is_temporary_table: bool = False,
     ) -> Table:
-        inspector = inspect(self.connection, raiseerr=False)
         table_schema = table_config.schema
 
         if table_config.is_temporal:
@@ -60,7 +59,7 @@ class TableConfigOps:
                 is_temporary_table=is_temporary_table,
             )
 
-        assert inspector.has_table(table_config.name, schema=table_schema)
+        assert TableOps(table_schema, table_config.name, self.connection).table_exists()
         return tbl
 
     def from_table(self, table_schema: str, table_name: str) -> TableConfig:
@@ -75,6 +74,9 @@ class TableConfigOps:
             if col.name in TableOps.system_versioning_columns():
                 continue
 
+            if col.name in TableOps.row_hash_column():
+                continue
+
             col_name = col.name
             col_names.append(col_name)
             if col.primary_key:
@@ -138,6 +140,7 @@ class TableConfigOps:
         if tbo.table_exists():
             tbl = tbo.get_table_metadata()
             tbl.drop(self.connection, checkfirst=True)
+            tbo.invalidate_metadata()
             LOGGER.info("dropped table %s", table_name)
 
     def _create_temporal(
@@ -223,9 +226,15 @@ class TableConfigOps:
         create_stmt = text(str(CreateTable(tbl).compile(self.connection)))
         # LOGGER.debug("table_create.sql: %s", str(create_stmt))
         DbOps(self.connection).execute_sqlalchemy(
-            f"sql.base.table_create.{table_name}", create_stmt
+            "sql.base.table_create", create_stmt, table=tbl.fullname
         )
 
+        tbo.invalidate_metadata()
+        if is_temporary_table:
+            TableMetadataCache().mark_temporary(
+                self.connection, tbo.table_schema, tbo.table_name
+            )
+
         LOGGER.debug("created table %s.%s", tbo.table_schema, tbo.table_name)
 
         tbl = tbo.get_table_metadata()
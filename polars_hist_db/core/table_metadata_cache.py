@@ -0,0 +1,119 @@
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Connection, Table
+
+
+LOGGER = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+# connection.info key for tables local to the database session
+_SESSION_TABLES_KEY = "polars_hist_db.temporary_tables"
+
+
+class TableMetadataCache:
+    """Reflected table metadata, shared across the process.
+
+    Entries are keyed by (engine url, schema, table). TEMPORARY tables only
+    exist for the lifetime of the database session, so they are kept in the
+    info dictionary of the DBAPI connection instead of the shared cache.
+
+    Only DDL issued through TableConfigOps and TableOps invalidates entries,
+    tables altered by other means must be invalidated by the caller.
+    """
+
+    _borg: Dict[str, Any] = {}
+
+    _tables: Dict[CacheKey, Table]
+    _lock: threading.Lock
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.__dict__ = self._borg
+        if "_tables" not in self._borg:
+            self._borg["_tables"] = dict()
+            self._borg["_lock"] = threading.Lock()
+            self._borg["hits"] = 0
+            self._borg["misses"] = 0
+
+    @staticmethod
+    def _key(connection: Connection, table_schema: str, table_name: str) -> CacheKey:
+        url = connection.engine.url.render_as_string(hide_password=True)
+        return (url, table_schema, table_name)
+
+    @staticmethod
+    def _session_tables(
+        connection: Connection,
+    ) -> Dict[Tuple[str, str], Optional[Table]]:
+        session_tables: Dict[Tuple[str, str], Optional[Table]] = (
+            connection.info.setdefault(_SESSION_TABLES_KEY, dict())
+        )
+        return session_tables
+
+    def get(
+        self, connection: Connection, table_schema: str, table_name: str
+    ) -> Optional[Table]:
+        session_tables = self._session_tables(connection)
+        with self._lock:
+            if (table_schema, table_name) in session_tables:
+                tbl = session_tables[(table_schema, table_name)]
+            else:
+                tbl = self._tables.get(self._key(connection, table_schema, table_name))
+
+            if tbl is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return tbl
+
+    def put(
+        self, connection: Connection, table_schema: str, table_name: str, tbl: Table
+    ):
+        session_tables = self._session_tables(connection)
+        with self._lock:
+            if (table_schema, table_name) in session_tables:
+                session_tables[(table_schema, table_name)] = tbl
+            else:
+                self._tables[self._key(connection, table_schema, table_name)] = tbl
+
+    def contains(
+        self, connection: Connection, table_schema: str, table_name: str
+    ) -> bool:
+        session_tables = self._session_tables(connection)
+        with self._lock:
+            return (table_schema, table_name) in session_tables or self._key(
+                connection, table_schema, table_name
+            ) in self._tables
+
+    def mark_temporary(
+        self, connection: Connection, table_schema: str, table_name: str
+    ):
+        session_tables = self._session_tables(connection)
+        with self._lock:
+            session_tables[(table_schema, table_name)] = None
+
+    def invalidate(self, connection: Connection, table_schema: str, table_name: str):
+        session_tables = self._session_tables(connection)
+        with self._lock:
+            session_tables.pop((table_schema, table_name), None)
+            self._tables.pop(self._key(connection, table_schema, table_name), None)
+
+        LOGGER.debug("invalidated metadata for %s.%s", table_schema, table_name)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._tables),
+            }
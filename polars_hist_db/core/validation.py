@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+import logging
+import time
+from typing import List, Mapping
+
+import polars as pl
+from sqlalchemy import Column, Float, Integer, Numeric, String, Table
+
+from ..config.dataset import ValidationAction
+from ..utils.exceptions import DataValidationException
+from ..utils.metrics import (
+    MetricsRegistry,
+    current_dataset,
+    table_label,
+    timed_stage,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+# (min, max) of signed and unsigned integer columns
+_INTEGER_RANGES: Mapping[str, tuple[tuple[int, int], tuple[int, int]]] = {
+    "TINYINT": ((-(2**7), 2**7 - 1), (0, 2**8 - 1)),
+    "SMALLINT": ((-(2**15), 2**15 - 1), (0, 2**16 - 1)),
+    "MEDIUMINT": ((-(2**23), 2**23 - 1), (0, 2**24 - 1)),
+    "INTEGER": ((-(2**31), 2**31 - 1), (0, 2**32 - 1)),
+    "INT": ((-(2**31), 2**31 - 1), (0, 2**32 - 1)),
+}
+
+# tolerance when checking the scale of floating point values, absolute near
+# zero and relative to the value's magnitude otherwise, since a float64 only
+# holds about 15 significant digits
+_SCALE_EPSILON = 1e-6
+_SCALE_RELATIVE_EPSILON = 1e-14
+
+_SAMPLE_ROWS = 5
+
+
+@dataclass
+class ValidationCheck:
+    name: str
+    column: str
+    # true for rows that violate the check, nulls are treated as valid
+    violation: pl.Expr
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.column}"
+
+
+def build_validation_checks(
+    tbl: Table, df_schema: Mapping[str, pl.DataType]
+) -> List[ValidationCheck]:
+    checks: List[ValidationCheck] = []
+    for col in tbl.columns:
+        if col.name not in df_schema:
+            continue
+
+        if _requires_value(col):
+            checks.append(
+                ValidationCheck("not_null", col.name, pl.col(col.name).is_null())
+            )
+
+        dtype = df_schema[col.name]
+        if dtype == pl.Null:
+            continue
+
+        col_type = col.type
+        if isinstance(col_type, String) and col_type.length is not None:
+            length = pl.col(col.name).cast(pl.Utf8).str.len_chars()
+            checks.append(
+                ValidationCheck("varchar_overflow", col.name, length > col_type.length)
+            )
+
+        elif isinstance(col_type, Integer) and dtype.is_numeric():
+            ranges = _INTEGER_RANGES.get(col_type.__visit_name__.upper())
+            if ranges is None:
+                continue
+
+            lo, hi = ranges[1] if getattr(col_type, "unsigned", False) else ranges[0]
+            checks.append(
+                ValidationCheck(
+                    "integer_range",
+                    col.name,
+                    ~pl.col(col.name).is_between(lo, hi),
+                )
+            )
+
+        elif (
+            isinstance(col_type, Numeric)
+            and not isinstance(col_type, Float)
+            and col_type.precision is not None
+            and dtype.is_numeric()
+        ):
+            checks.extend(_decimal_checks(col.name, dtype, col_type))
+
+    return checks
+
+
+def _decimal_checks(
+    col_name: str, dtype: pl.DataType, col_type: Numeric
+) -> List[ValidationCheck]:
+    assert col_type.precision is not None
+    scale = col_type.scale or 0
+    max_integer_digits = col_type.precision - scale
+    checks = []
+
+    if isinstance(dtype, pl.Decimal):
+        # decimals are compared exactly, and only when their dtype can
+        # hold values that do not fit the column
+        value = pl.col(col_name)
+        dtype_scale = dtype.scale or 0
+        dtype_precision = dtype.precision or 38
+        if dtype_precision - dtype_scale > max_integer_digits:
+            checks.append(
+                ValidationCheck(
+                    "decimal_precision",
+                    col_name,
+                    value.abs() >= 10**max_integer_digits,
+                )
+            )
+
+        if dtype_scale > scale:
+            checks.append(
+                ValidationCheck("decimal_scale", col_name, value.round(scale) != value)
+            )
+
+        return checks
+
+    value = pl.col(col_name).cast(pl.Float64)
+    checks.append(
+        ValidationCheck(
+            "decimal_precision",
+            col_name,
+            value.abs() >= 10**max_integer_digits,
+        )
+    )
+
+    if not dtype.is_integer():
+        shifted = value * 10**scale
+        tolerance = pl.max_horizontal(
+            pl.lit(_SCALE_EPSILON), shifted.abs() * _SCALE_RELATIVE_EPSILON
+        )
+        checks.append(
+            ValidationCheck(
+                "decimal_scale",
+                col_name,
+                (shifted - shifted.round(0)).abs() > tolerance,
+            )
+        )
+
+    return checks
+
+
+def _requires_value(col: Column) -> bool:
+    return (
+        not col.nullable
+        and col.server_default is None
+        and col.default is None
+        and col.autoincrement is not True
+    )
+
+
+def validate_dataframe(
+    df: pl.DataFrame, tbl: Table, action: ValidationAction = "log"
+) -> pl.DataFrame:
+    """Checks a dataframe against the column types of the table it is inserted into.
+
+    All checks are compiled into a single lazy query, which yields one
+    violation mask per check. Depending on the action, violations are logged,
+    the offending rows are removed, or DataValidationException is raised.
+    """
+    if action == "disabled" or df.is_empty():
+        return df
+
+    checks = build_validation_checks(tbl, df.schema)
+    if not checks:
+        return df
+
+    with timed_stage("validation", tbl.fullname):
+        start_time = time.perf_counter()
+        masks = (
+            df.lazy()
+            .select(
+                *[c.violation.fill_null(False).alias(c.key) for c in checks],
+            )
+            .collect()
+        )
+        counts = masks.sum().row(0, named=True)
+
+        LOGGER.debug(
+            "validated %d rows of %s with %d checks in %f seconds",
+            len(df),
+            tbl.fullname,
+            len(checks),
+            time.perf_counter() - start_time,
+        )
+
+    failed_checks = [c for c in checks if counts[c.key] > 0]
+    if not failed_checks:
+        return df
+
+    violations = MetricsRegistry().counter(
+        "polars_hist_db_validation_violations_total",
+        "Rows that failed each pre-insert validation check.",
+        ["dataset", "table", "check"],
+    )
+
+    for c in failed_checks:
+        violations.inc(
+            counts[c.key],
+            dataset=current_dataset(),
+            table=table_label(tbl.fullname),
+            check=c.name,
+        )
+        LOGGER.error(
+            "%s: %d rows failed %s check on column %s, e.g. %s",
+            tbl.fullname,
+            counts[c.key],
+            c.name,
+            c.column,
+            df.filter(masks[c.key]).get_column(c.column).head(_SAMPLE_ROWS).to_list(),
+        )
+
+    match action:
+        case "log":
+            return df
+        case "reject":
+            is_rejected = masks.select(
+                pl.any_horizontal(c.key for c in failed_checks)
+            ).to_series()
+            LOGGER.warning(
+                "%s: rejected %d/%d rows", tbl.fullname, is_rejected.sum(), len(df)
+            )
+            return df.filter(~is_rejected)
+        case "raise":
+            raise DataValidationException(
+                f"{tbl.fullname} failed validation: "
+                + ", ".join(f"{c.key}={counts[c.key]}" for c in failed_checks)
+            )
+        case _:
+            raise ValueError(f"invalid validation action: {action}")
@@ -1,7 +1,9 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 import time
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from nats.js.client import JetStreamContext
 import polars as pl
@@ -9,10 +11,31 @@ from sqlalchemy import Engine
 
 from ..loaders.input_source_factory import InputSourceFactory
 from ..utils.clock import Clock
-
-from ..config import PolarsHistDbConfig, DatasetConfig, TableConfig, TableConfigs
+from ..utils.metrics import MetricsRegistry, dataset_scope, timed_stage
+
+from ..config import (
+    PolarsHistDbConfig,
+    DatasetConfig,
+    TableColumnConfig,
+    TableConfig,
+    TableConfigs,
+)
 from ..config.input.input_source import InputConfig
-from ..core import TableConfigOps
+from ..core import (
+    AuditOps,
+    CompiledStatementCache,
+    TableConfigOps,
+    TableMetadataCache,
+    TableOps,
+)
+from ..core.delta_table import ROW_HASH_COL
+from .schedule import (
+    DatasetRun,
+    dataset_dependencies,
+    dataset_sorter,
+    default_concurrency,
+    log_summary,
+)
 from .scrape import try_run_pipeline_as_transaction
 
 LOGGER = logging.getLogger(__name__)
@@ -24,29 +47,104 @@ async def run_datasets(
     dataset_name: Optional[str] = None,
     debug_capture_output: Optional[List[Tuple[datetime, pl.DataFrame]]] = None,
     js: Optional[JetStreamContext] = None,
+    metrics_textfile: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
 ):
-    num_datasets_processed = 0
-    for dataset in config.datasets.datasets:
-        if dataset_name is None or dataset.name == dataset_name:
-            num_datasets_processed += 1
+    datasets = {
+        ds.name: ds
+        for ds in config.datasets.datasets
+        if dataset_name is None or ds.name == dataset_name
+    }
+    if len(datasets) == 0:
+        LOGGER.error("no datasets processed for %s", dataset_name)
+        return
+
+    _create_config_tables(engine, config.tables, list(datasets.values()))
+
+    # independent datasets run concurrently, a dataset starts once the
+    # datasets writing the foreign key parents of its tables have finished
+    sorter = dataset_sorter(
+        dataset_dependencies(list(datasets.values()), config.tables)
+    )
+    if max_concurrency is None:
+        max_concurrency = default_concurrency(engine)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(dataset: DatasetConfig) -> DatasetRun:
+        async with semaphore:
             LOGGER.info("scraping dataset %s", dataset.name)
-            await _run_dataset(
-                dataset.input_config,
-                dataset,
-                config.tables,
-                engine,
-                debug_capture_output,
-                js=js,
-            )
+            with dataset_scope(dataset.name):
+                result = await _run_dataset(
+                    dataset.input_config,
+                    dataset,
+                    config.tables,
+                    engine,
+                    debug_capture_output,
+                    js=js,
+                )
+
+            if metrics_textfile is not None:
+                MetricsRegistry().write_textfile(metrics_textfile)
+
+        return result
+
+    LOGGER.info("scraping %d datasets, %d at a time", len(datasets), max_concurrency)
+    start_time = time.perf_counter()
+    runs: List[DatasetRun] = []
+    running: Dict[asyncio.Future, str] = dict()
+    try:
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                running[asyncio.ensure_future(run(datasets[name]))] = name
+
+            # the dependents of a failed dataset never become ready
+            if len(running) == 0:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                dataset_run = task.result()
+                runs.append(dataset_run)
+                if dataset_run.error is None:
+                    sorter.done(name)
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
 
-    if num_datasets_processed == 0:
-        LOGGER.error("no datasets processed for %s", dataset_name)
+    finished = {r.name for r in runs}
+    skipped = [name for name in datasets if name not in finished]
+    log_summary(runs, time.perf_counter() - start_time, skipped)
+
+    failed = [r for r in runs if r.error is not None]
+    if len(failed) > 0:
+        raise RuntimeError(
+            f"datasets failed: {', '.join(r.name for r in failed)}"
+            + (f", skipped: {', '.join(skipped)}" if skipped else "")
+        ) from failed[0].error
 
 
-def _create_config_tables(engine: Engine, tables: TableConfigs):
-    """Create permanent config tables (idempotent)."""
+def _create_config_tables(
+    engine: Engine, tables: TableConfigs, datasets: List[DatasetConfig]
+):
+    """Create permanent config tables and their audit tables (idempotent).
+
+    The audit tables and indexes, and the row hash columns of the main tables
+    of row_hash datasets, are created here, because DDL inside a pipeline
+    transaction would commit it implicitly.
+    """
     with engine.begin() as connection:
         TableConfigOps(connection).create_all(tables)
+        for table_schema in tables.schemas():
+            AuditOps(table_schema).create_indexes(connection)
+
+        for dataset in datasets:
+            if dataset.delta_config.change_detection == "row_hash":
+                main_table_config = tables[dataset.pipeline.get_main_table_name()[1]]
+                TableOps(
+                    main_table_config.schema, main_table_config.name, connection
+                ).add_row_hash_column()
 
 
 def _build_delta_table_config(
@@ -60,6 +158,9 @@ def _build_delta_table_config(
     to the same session that uses them.
     """
     col_defs = dataset.pipeline.build_delta_table_column_configs(tables, dataset.name)
+    if dataset.delta_config.change_detection == "row_hash":
+        col_defs.append(TableColumnConfig(dataset.name, ROW_HASH_COL, "BIGINT"))
+
     return TableConfig(dataset.name, dataset.delta_table_schema, col_defs)
 
 
@@ -70,10 +171,9 @@ async def _run_dataset(
     engine: Engine,
     debug_capture_output: Optional[List[Tuple[datetime, pl.DataFrame]]],
     js: Optional[JetStreamContext] = None,
-):
+) -> DatasetRun:
     LOGGER.info("starting %s ingest for %s", input_config.type, dataset.name)
 
-    _create_config_tables(engine, tables)
     delta_table_config = _build_delta_table_config(tables, dataset)
 
     start_time = time.perf_counter()
@@ -81,11 +181,15 @@ async def _run_dataset(
     input_source = InputSourceFactory.create_input_source(
         tables, dataset, input_config, js=js
     )
-    try:
-        async for partitions, commit_fn in await input_source.next_df(engine):
-            if debug_capture_output is not None:
-                debug_capture_output.extend(partitions)
 
+    # transactions run one at a time on a dedicated thread, the next batch is
+    # fetched and prepared on the event loop while the previous one commits
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phdb-transaction")
+    pending: Optional[asyncio.Future] = None
+    result = DatasetRun(dataset.name)
+
+    async def run_transaction(partitions, commit_fn):
+        with timed_stage("transaction"):
             await try_run_pipeline_as_transaction(
                 partitions,
                 dataset,
@@ -93,13 +197,39 @@ async def _run_dataset(
                 engine,
                 commit_fn,
                 delta_table_config=delta_table_config,
+                executor=executor,
             )
 
+        result.num_batches += 1
+        result.num_rows += sum(len(df) for _, df in partitions)
+
+    try:
+        async for partitions, commit_fn in await input_source.next_df(engine):
+            if debug_capture_output is not None:
+                debug_capture_output.extend(partitions)
+
+            if pending is not None:
+                await pending
+
+            pending = asyncio.ensure_future(run_transaction(partitions, commit_fn))
+
+        if pending is not None:
+            await pending
+
     except Exception as e:
         LOGGER.error("error while processing InputSource: %s", e, exc_info=e)
+        result.error = e
     finally:
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        executor.shutdown(wait=True)
         await input_source.cleanup()
 
-    Clock().add_timing("dataset", time.perf_counter() - start_time)
+    result.seconds = time.perf_counter() - start_time
+    Clock().add_timing("dataset", result.seconds)
 
+    LOGGER.debug("table metadata cache: %s", TableMetadataCache().stats())
+    LOGGER.debug("compiled statement cache: %s", CompiledStatementCache().stats())
     LOGGER.info("stopped scrape - %s", dataset.name)
+
+    return result
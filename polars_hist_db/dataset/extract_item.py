@@ -56,6 +56,7 @@ def scrape_extract_item(
         target_table_config,
         col_info,
         connection,
+        dataset.delta_config,
     )
 
     found_source_cols = [
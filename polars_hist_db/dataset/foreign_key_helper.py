@@ -5,7 +5,7 @@ from sqlalchemy import ColumnElement, and_, Column, Connection, select
 from sqlalchemy.sql.functions import coalesce
 
 from ..core import DataframeOps, TableOps
-from ..config import TableConfig
+from ..config import DeltaConfig, TableConfig
 
 LOGGER = logging.getLogger(__name__)
 
@@ -95,6 +95,7 @@ def deduce_foreign_keys(
     parent_table_config: TableConfig,
     col_info: pl.DataFrame,
     connection: Connection,
+    delta_config: DeltaConfig,
 ):
     src_implied_col_names = _get_foreign_key_columns(col_info)
     if not src_implied_col_names:
@@ -143,6 +144,10 @@ def deduce_foreign_keys(
             parent_table_config.name,
             prefill_nulls_with_default=False,
             uniqueness_col_set=(),
+            insert_method=delta_config.insert_method,
+            insert_batch_rows=delta_config.insert_batch_rows,
+            insert_batch_bytes=delta_config.insert_batch_bytes,
+            insert_tmp_dir=delta_config.insert_tmp_dir,
         )
 
     implied_df = _prepare_population_set(
@@ -170,4 +175,9 @@ def deduce_foreign_keys(
             src_table_schema,
             src_table_name,
             primary_keys_override=new_items_columns,
+            staging_min_rows=delta_config.staging_min_rows,
+            insert_method=delta_config.insert_method,
+            insert_batch_rows=delta_config.insert_batch_rows,
+            insert_batch_bytes=delta_config.insert_batch_bytes,
+            insert_tmp_dir=delta_config.insert_tmp_dir,
         )
@@ -26,6 +26,18 @@ def scrape_primary_item(
     selected_columns = upload_items["source"].to_list()
 
     TableConfigOps(connection).create(main_table_config)
+    if dataset.delta_config.change_detection == "row_hash":
+        (row_hash_col,) = TableOps.row_hash_column()
+        main_tbo = TableOps(
+            main_table_config.schema, main_table_config.name, connection
+        )
+        if not main_tbo.has_all_columns([row_hash_col]):
+            # adding it here would commit the pipeline transaction
+            raise ValueError(
+                f"missing {row_hash_col} in {main_table_config.name}, "
+                "add it with TableOps.add_row_hash_column before the pipeline runs"
+            )
+
     tbo = TableOps(delta_table_schema, delta_table_name, connection)
     common_columns = [c.name for c in tbo.get_column_intersection(selected_columns)]
 
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from graphlib import CycleError, TopologicalSorter
+import logging
+from typing import Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import Engine
+
+from ..config import DatasetConfig, TableConfigs
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DatasetRun:
+    name: str
+    seconds: float = 0.0
+    num_batches: int = 0
+    num_rows: int = 0
+    error: Optional[BaseException] = None
+
+
+def default_concurrency(engine: Engine) -> int:
+    """Number of datasets that can run at once without exhausting the pool.
+
+    A running dataset holds up to two connections, one for its transaction and
+    one to prepare the next batch while the transaction commits. Only the
+    pool's size counts, its overflow is left for other users of the engine.
+    """
+    size_fn = getattr(engine.pool, "size", None)
+    if size_fn is None:
+        return 1
+
+    return max(1, size_fn() // 2)
+
+
+def dataset_dependencies(
+    datasets: Sequence[DatasetConfig], tables: TableConfigs
+) -> Dict[str, Set[str]]:
+    """Maps each dataset to the datasets that must finish before it starts.
+
+    A dataset waits for the datasets that write the foreign key parents of its
+    tables. Datasets writing a common table run in configuration order, unless
+    a foreign key orders them the other way.
+    """
+    writes = {ds.name: set(ds.pipeline.get_table_names()) for ds in datasets}
+    parents = {
+        ds.name: {
+            parent
+            for table in writes[ds.name]
+            for parent in tables[table].table_dependencies()
+            if parent != table
+        }
+        for ds in datasets
+    }
+
+    def is_parent(lhs: str, rhs: str) -> bool:
+        return len(writes[lhs] & parents[rhs]) > 0
+
+    dependencies: Dict[str, Set[str]] = {ds.name: set() for ds in datasets}
+    for i, ds in enumerate(datasets):
+        for j, other in enumerate(datasets):
+            if i == j:
+                continue
+
+            if is_parent(other.name, ds.name):
+                dependencies[ds.name].add(other.name)
+            elif (
+                j < i
+                and len(writes[ds.name] & writes[other.name]) > 0
+                and not is_parent(ds.name, other.name)
+            ):
+                dependencies[ds.name].add(other.name)
+
+    return dependencies
+
+
+def dataset_sorter(dependencies: Dict[str, Set[str]]) -> TopologicalSorter:
+    sorter: TopologicalSorter = TopologicalSorter(dependencies)
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        raise ValueError(f"cyclic foreign keys between datasets: {e.args[1]}") from e
+
+    return sorter
+
+
+def log_summary(
+    runs: List[DatasetRun], seconds: float, skipped: Sequence[str] = ()
+) -> None:
+    num_rows = sum(r.num_rows for r in runs)
+    LOGGER.info(
+        "ran %d datasets in %.1fs, %d rows, %.0f rows/s",
+        len(runs),
+        seconds,
+        num_rows,
+        num_rows / seconds if seconds > 0 else 0.0,
+    )
+
+    for r in sorted(runs, key=lambda r: r.seconds, reverse=True):
+        LOGGER.log(
+            logging.INFO if r.error is None else logging.ERROR,
+            "-- %s: %s%.1fs, %d batches, %d rows, %.0f rows/s",
+            r.name,
+            "" if r.error is None else f"FAILED ({r.error!r}), ",
+            r.seconds,
+            r.num_batches,
+            r.num_rows,
+            r.num_rows / r.seconds if r.seconds > 0 else 0.0,
+        )
+
+    for name in skipped:
+        LOGGER.error("-- %s: skipped, a dataset it depends on failed", name)
@@ -1,14 +1,20 @@
+import asyncio
+from concurrent.futures import Executor
+import contextvars
 from datetime import datetime
+import inspect
 import logging
-from time import sleep
-from typing import Awaitable, Callable, List, Optional, Set, Tuple
+import random
+from typing import Awaitable, Callable, List, Optional, Set, Tuple, Union
 
 import polars as pl
 from sqlalchemy import Connection, Engine
 
-from ..config import TableConfig, TableConfigs, DatasetConfig
-from ..core import DataframeOps, TableConfigOps, TableOps
+from ..config import TableColumnConfig, TableConfig, TableConfigs, DatasetConfig
+from ..core import DataframeOps, DeltaTableOps, TableConfigOps, TableOps
+from ..core.delta_table import BUCKET_COL, BUCKET_ROW_COL, with_row_hash
 from ..utils import NonRetryableException
+from ..utils.metrics import timed_stage
 
 from .extract_item import scrape_extract_item
 from .primary_item import scrape_primary_item
@@ -58,86 +64,264 @@ def _ensure_delta_table(
         )
 
 
-async def try_run_pipeline_as_transaction(
+def _ensure_bucket_table(
+    connection: Connection,
+    dataset: DatasetConfig,
+    delta_table_config: Optional[TableConfig],
+) -> str:
+    """Ensure the bucket table of a dataset exists in the given connection.
+
+    It has the columns of the delta table, keyed by bucket and row number.
+    """
+    bucket_table_name = dataset.delta_config.bucket_table_name(dataset.name)
+    if TableOps(
+        dataset.delta_table_schema, bucket_table_name, connection
+    ).table_exists():
+        return bucket_table_name
+
+    if delta_table_config is None:
+        delta_table_config = TableConfigOps(connection).from_table(
+            dataset.delta_table_schema, dataset.name
+        )
+
+    bucket_table_config = TableConfig(
+        bucket_table_name,
+        dataset.delta_table_schema,
+        [
+            *delta_table_config.columns,
+            TableColumnConfig(bucket_table_name, BUCKET_COL, "INT"),
+            TableColumnConfig(bucket_table_name, BUCKET_ROW_COL, "BIGINT"),
+        ],
+        primary_keys=[BUCKET_COL, BUCKET_ROW_COL],
+    )
+    TableConfigOps(connection).create(
+        bucket_table_config,
+        is_delta_table=True,
+        is_temporary_table=dataset.delta_config.is_temporary_table,
+    )
+
+    return bucket_table_name
+
+
+def retry_delay(
+    attempt: int, seconds_between_retries: float, max_seconds_between_retries: float
+) -> float:
+    """Exponential backoff with jitter, attempt counts from 0.
+
+    The delay is drawn from the upper half of the backoff interval, so
+    concurrent scrapers retrying the same failure spread out.
+    """
+    delay = min(seconds_between_retries * 2**attempt, max_seconds_between_retries)
+    return random.uniform(delay / 2, delay)
+
+
+def _run_pipeline_transaction(
     partitions: List[Tuple[datetime, pl.DataFrame]],
     dataset: DatasetConfig,
     tables: TableConfigs,
     engine: Engine,
-    commit_fn: Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
-    num_retries: int = 3,
-    seconds_between_retries: float = 60,
-    delta_table_config: Optional[TableConfig] = None,
-):
+    commit_fn: Callable[[Connection, List[Tuple[str, str]]], bool],
+    delta_table_config: Optional[TableConfig],
+) -> bool:
     main_table_config: TableConfig = tables[dataset.pipeline.get_main_table_name()[1]]
     tbl_to_header_map = dataset.pipeline.get_header_map(main_table_config.name)
     header_keys = [tbl_to_header_map.get(k, k) for k in main_table_config.primary_keys]
 
-    while num_retries > 0:
-        with engine.connect() as connection:
-            try:
-                with connection.begin():
-                    if delta_table_config is not None:
-                        _ensure_delta_table(
-                            connection,
-                            delta_table_config,
-                            dataset.delta_config.is_temporary_table,
-                        )
-                    modified_tables: Set[Tuple[str, str]] = set()
-                    for i, (ts, partition_df) in enumerate(partitions):
-                        assert isinstance(ts, datetime), (
-                            f"timestamp is not a datetime [{type(ts)}]"
-                        )
-                        LOGGER.info(
-                            "-- (%d/%d) time_partition[%s] %d rows",
-                            i + 1,
-                            len(partitions),
-                            ts.isoformat(),
-                            len(partition_df),
-                        )
+    if dataset.delta_config.change_detection == "row_hash":
+        hash_schema = (
+            delta_table_config.dtypes() if delta_table_config is not None else {}
+        )
+        with timed_stage("row_hash"):
+            partitions = [
+                (
+                    ts,
+                    with_row_hash(
+                        partition_df, list(tbl_to_header_map.values()), hash_schema
+                    ),
+                )
+                for ts, partition_df in partitions
+            ]
 
-                        DataframeOps(connection).table_insert(
-                            partition_df,
+    with engine.connect() as connection:
+        try:
+            with connection.begin() as transaction:
+                if delta_table_config is not None:
+                    _ensure_delta_table(
+                        connection,
+                        delta_table_config,
+                        dataset.delta_config.is_temporary_table,
+                    )
+                # all partitions are inserted once, and copied into the delta
+                # table bucket by bucket on the server
+                bucket_table_name: Optional[str] = None
+                if (
+                    dataset.delta_config.partition_load == "bucketed"
+                    and len(partitions) > 1
+                ):
+                    bucket_table_name = _ensure_bucket_table(
+                        connection, dataset, delta_table_config
+                    )
+                    with timed_stage("bucket_table_insert"):
+                        DataframeOps(connection).table_insert_buckets(
+                            [partition_df for _, partition_df in partitions],
                             dataset.delta_table_schema,
-                            dataset.name,
+                            bucket_table_name,
                             uniqueness_col_set=header_keys,
                             prefill_nulls_with_default=True,
-                            clear_table_first=True,
+                            insert_method=dataset.delta_config.insert_method,
+                            insert_batch_rows=dataset.delta_config.insert_batch_rows,
+                            insert_batch_bytes=dataset.delta_config.insert_batch_bytes,
+                            insert_tmp_dir=dataset.delta_config.insert_tmp_dir,
+                            validation_action=dataset.delta_config.validation_action,
                         )
 
-                        for pipeline_id, (
-                            target_schema,
-                            target_table,
-                        ) in dataset.pipeline.get_pipeline_items().items():
-                            did_modify = _scrape_pipeline_item(
-                                pipeline_id,
-                                dataset,
-                                target_schema,
-                                target_table,
-                                tables,
-                                ts,
+                modified_tables: Set[Tuple[str, str]] = set()
+                for i, (ts, partition_df) in enumerate(partitions):
+                    assert isinstance(ts, datetime), (
+                        f"timestamp is not a datetime [{type(ts)}]"
+                    )
+                    LOGGER.info(
+                        "-- (%d/%d) time_partition[%s] %d rows",
+                        i + 1,
+                        len(partitions),
+                        ts.isoformat(),
+                        len(partition_df),
+                    )
+
+                    if bucket_table_name is not None:
+                        with timed_stage("delta_table_load_bucket"):
+                            DeltaTableOps(
+                                dataset.delta_table_schema,
+                                dataset.name,
+                                dataset.delta_config,
                                 connection,
+                            ).load_bucket(bucket_table_name, i)
+                    else:
+                        with timed_stage("delta_table_insert"):
+                            DataframeOps(connection).table_insert(
+                                partition_df,
+                                dataset.delta_table_schema,
+                                dataset.name,
+                                uniqueness_col_set=header_keys,
+                                prefill_nulls_with_default=True,
+                                clear_table_first=True,
+                                insert_method=dataset.delta_config.insert_method,
+                                insert_batch_rows=dataset.delta_config.insert_batch_rows,
+                                insert_batch_bytes=dataset.delta_config.insert_batch_bytes,
+                                insert_tmp_dir=dataset.delta_config.insert_tmp_dir,
+                                validation_action=dataset.delta_config.validation_action,
                             )
 
-                            if did_modify:
-                                modified_item = (target_schema, target_table)
-                                modified_tables.add(modified_item)
+                    for pipeline_id, (
+                        target_schema,
+                        target_table,
+                    ) in dataset.pipeline.get_pipeline_items().items():
+                        did_modify = _scrape_pipeline_item(
+                            pipeline_id,
+                            dataset,
+                            target_schema,
+                            target_table,
+                            tables,
+                            ts,
+                            connection,
+                        )
+
+                        if did_modify:
+                            modified_item = (target_schema, target_table)
+                            modified_tables.add(modified_item)
+
+                with timed_stage("commit"):
+                    committed = commit_fn(connection, sorted(modified_tables))
+
+                if not committed:
+                    transaction.rollback()
+
+                return committed
+
+        except Exception:
+            connection.rollback()
+            raise
 
-                    success = await commit_fn(connection, sorted(modified_tables))
-                    if success:
-                        return
 
-            except NonRetryableException as e:
-                LOGGER.error("non-retryable exception %s", e)
-                connection.rollback()
+async def try_run_pipeline_as_transaction(
+    partitions: List[Tuple[datetime, pl.DataFrame]],
+    dataset: DatasetConfig,
+    tables: TableConfigs,
+    engine: Engine,
+    commit_fn: Callable[
+        [Connection, List[Tuple[str, str]]], Union[bool, Awaitable[bool]]
+    ],
+    num_retries: int = 3,
+    seconds_between_retries: float = 5,
+    delta_table_config: Optional[TableConfig] = None,
+    max_seconds_between_retries: float = 60,
+    executor: Optional[Executor] = None,
+):
+    """Runs the pipeline over the partitions in one transaction, with retries.
+
+    The transaction is blocking, so it runs in the executor (the loop's
+    default executor if None) while the event loop keeps serving nats
+    heartbeats and fetches. commit_fn runs in the worker thread too, so its
+    database work stays off the event loop. An async commit_fn is awaited on
+    the event loop instead, with the worker thread waiting on it.
+
+    Raises once num_retries attempts failed or were not committed.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def await_commit(result: Awaitable[bool]) -> bool:
+        return await result
+
+    def worker_commit_fn(
+        connection: Connection, modified_tables: List[Tuple[str, str]]
+    ) -> bool:
+        result = commit_fn(connection, modified_tables)
+        if inspect.isawaitable(result):
+            return asyncio.run_coroutine_threadsafe(await_commit(result), loop).result()
+
+        return result
+
+    for attempt in range(num_retries):
+        # the context carries the dataset that metrics are attributed to
+        ctx = contextvars.copy_context()
+        try:
+            success = await loop.run_in_executor(
+                executor,
+                ctx.run,
+                _run_pipeline_transaction,
+                partitions,
+                dataset,
+                tables,
+                engine,
+                worker_commit_fn,
+                delta_table_config,
+            )
+            if success:
+                return
+
+            LOGGER.error("commit_fn declined, transaction rolled back")
+
+        except NonRetryableException as e:
+            LOGGER.error("non-retryable exception %s", e)
+            raise
+
+        except Exception as e:
+            LOGGER.error("error in scrape_pipeline_as_transaction", exc_info=e)
+
+            if attempt + 1 == num_retries:
                 raise
 
-            except Exception as e:
-                LOGGER.error("error in scrape_pipeline_as_transaction", exc_info=e)
+        if attempt + 1 == num_retries:
+            break
 
-                connection.rollback()
-                if num_retries == 0:
-                    raise
+        delay = retry_delay(
+            attempt, seconds_between_retries, max_seconds_between_retries
+        )
+        LOGGER.info(
+            "retries remaining: %d, retrying in %.1fs",
+            num_retries - attempt - 1,
+            delay,
+        )
+        await asyncio.sleep(delay)
 
-                sleep(seconds_between_retries)
-                LOGGER.info("retries remaining: %d", num_retries)
-                num_retries -= 1
+    raise RuntimeError(f"transaction not committed after {num_retries} attempts")
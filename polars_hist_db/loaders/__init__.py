@@ -1,9 +1,12 @@
-from .dsv.dsv_loader import load_typed_dsv
+from .dsv.columnar_loader import load_typed_columnar
+from .dsv.dsv_loader import load_typed_dsv, load_typed_dsv_batches
 from .dsv.file_search import find_files
 from .dsv.ziptools import convert_zipped_csvs_to_parquet
 
 __all__ = [
     "load_typed_dsv",
+    "load_typed_dsv_batches",
+    "load_typed_columnar",
     "find_files",
     "convert_zipped_csvs_to_parquet",
 ]
@@ -0,0 +1,95 @@
+import logging
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Literal, Mapping, Sequence
+
+import polars as pl
+
+from ...config.input.types import CrawlerFileFormat
+from ...config.parser_config import IngestionColumnConfig
+from ...types import PolarsType
+from .dsv_loader import _finalise_typed_dsv
+
+LOGGER = logging.getLogger(__name__)
+
+FileFormat = Literal["dsv", "parquet", "ipc", "ndjson"]
+
+_SUFFIX_FORMATS: Mapping[str, FileFormat] = MappingProxyType(
+    {
+        ".parquet": "parquet",
+        ".pq": "parquet",
+        ".arrow": "ipc",
+        ".ipc": "ipc",
+        ".feather": "ipc",
+        ".ndjson": "ndjson",
+        ".jsonl": "ndjson",
+    }
+)
+
+
+def detect_file_format(path: Path, file_format: CrawlerFileFormat) -> FileFormat:
+    if file_format != "auto":
+        return file_format
+
+    return _SUFFIX_FORMATS.get(path.suffix.lower(), "dsv")
+
+
+def _ingestion_dtypes(
+    column_configs: Sequence[IngestionColumnConfig],
+    schema_overrides: Mapping[str, pl.DataType],
+) -> Dict[str, pl.DataType]:
+    dtypes: Dict[str, pl.DataType] = {
+        c.source: PolarsType.from_sql(c.ingestion_data_type)
+        for c in column_configs
+        if c.source and c.ingestion_data_type and c.column_type in ["data", "dsv_only"]
+    }
+    dtypes.update(schema_overrides)
+    return dtypes
+
+
+def _scan(path: Path, file_format: FileFormat) -> pl.LazyFrame:
+    match file_format:
+        case "parquet":
+            return pl.scan_parquet(path)
+        case "ipc":
+            # uncompressed ipc files are memory-mapped
+            return pl.scan_ipc(path, memory_map=True)
+        case "ndjson":
+            return pl.scan_ndjson(path)
+        case _:
+            raise ValueError(f"not a columnar file format: {file_format}")
+
+
+def load_typed_columnar(
+    file: Path,
+    column_configs: Sequence[IngestionColumnConfig],
+    file_format: FileFormat,
+    schema_overrides: Mapping[str, pl.DataType] = MappingProxyType({}),
+) -> pl.DataFrame:
+    """Loads a parquet, ipc or ndjson file like load_typed_dsv.
+
+    Only the columns used by the pipeline are read, and columns with an
+    ingestion type are cast to it.
+    """
+    LOGGER.info("loading %s from path %s", file_format, str(file))
+
+    lf = _scan(file, file_format)
+    file_schema = lf.collect_schema()
+
+    valid_col_configs = set()
+    valid_col_configs |= {c.source for c in column_configs if c.source}
+    valid_col_configs |= {c.target for c in column_configs if c.target}
+    columns = [
+        c for c in file_schema.names() if c in valid_col_configs or c.startswith("__")
+    ]
+
+    ingestion_dtypes = _ingestion_dtypes(column_configs, schema_overrides)
+    casts = {
+        c: ingestion_dtypes[c]
+        for c in columns
+        if c in ingestion_dtypes and file_schema[c] != ingestion_dtypes[c]
+    }
+
+    df = lf.select(columns).cast(casts).collect()  # type: ignore[arg-type]
+
+    return _finalise_typed_dsv(df, column_configs, schema_overrides)
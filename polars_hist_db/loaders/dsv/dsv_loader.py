@@ -1,7 +1,10 @@
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
 import logging
 from pathlib import Path
 from types import MappingProxyType
-from typing import Optional, Mapping, Sequence, Tuple, Union
+from typing import Dict, Iterator, Optional, Mapping, Sequence, Tuple, Union
 
 import polars as pl
 
@@ -13,32 +16,51 @@ from ...types import PolarsType
 LOGGER = logging.getLogger(__name__)
 
 
+# candidate delimiters, in order of preference
+_DELIMITERS = (",", ";", "|", ":")
+
+# bytes read to sniff the header row, doubled until a full line is read
+_SNIFF_PREFIX_BYTES = 64 * 1024
+
+
+def _read_header_line(input: Union[Path, bytes]) -> str:
+    prefix_bytes = _SNIFF_PREFIX_BYTES
+    while True:
+        if isinstance(input, Path):
+            with open(input, "rb") as f:
+                prefix = f.read(prefix_bytes)
+        else:
+            prefix = input[:prefix_bytes]
+
+        end_of_line = prefix.find(b"\n")
+        if end_of_line >= 0 or len(prefix) < prefix_bytes:
+            break
+
+        prefix_bytes *= 2
+
+    line = prefix if end_of_line < 0 else prefix[:end_of_line]
+    return line.decode("utf-8-sig").rstrip("\r")
+
+
 def _parse_header_row(
     input: Union[Path, bytes], known_delimiter: Optional[str]
 ) -> Tuple[str, Sequence[str]]:
-    delimiters = [known_delimiter] if known_delimiter else [",", ";", "|", ":"]
+    # one small read of the file, rather than a read_csv per candidate delimiter
+    header_line = _read_header_line(input)
+    return _sniff_header(header_line, known_delimiter, str(input))
 
-    failed_guess_errors = []
-    for delimiter in delimiters:
-        try:
-            df = pl.read_csv(
-                input,
-                has_header=True,
-                infer_schema_length=0,
-                n_rows=0,
-                n_threads=1,
-                separator=delimiter,
-            )
 
-            if known_delimiter or df.shape[1] > 1:
-                return delimiter, df.columns
+def _sniff_header(
+    header_line: str, known_delimiter: Optional[str], input_name: str
+) -> Tuple[str, Sequence[str]]:
+    delimiters = [known_delimiter] if known_delimiter else _DELIMITERS
 
-        except Exception as e:
-            failed_guess_errors.append(e)
-            continue
+    for delimiter in delimiters:
+        headers = next(csv.reader([header_line], delimiter=delimiter), [])
+        if known_delimiter or len(headers) > 1:
+            return delimiter, headers
 
-    LOGGER.error(failed_guess_errors)
-    raise ValueError(f"couldn't infer delimiter of dsv {str(input)}")
+    raise ValueError(f"couldn't infer delimiter of dsv {input_name}")
 
 
 def _get_column_target_dtype(
@@ -51,65 +73,232 @@ def _get_column_target_dtype(
     raise ValueError("bad configuration. missing column definition for {column_name}")
 
 
-def load_typed_dsv(
+@dataclass(frozen=True)
+class _DsvReadOptions:
+    separator: str
+    columns: Sequence[str]
+    # a dtype for every column read, so read_csv does not infer any types
+    schema: Mapping[str, pl.DataType]
+    # dtypes of the columns that are always forced, the rest is inferred
+    fallback_schema: Mapping[str, pl.DataType]
+    null_values: Sequence[str]
+
+
+# (source, target, column_type, ingestion_data_type, target_data_type)
+_ColumnSignature = Tuple[
+    Optional[str], Optional[str], str, Optional[str], Optional[str]
+]
+
+
+def _dsv_read_options(
     file_or_bytes: Union[Path, bytes],
     column_configs: Sequence[IngestionColumnConfig],
-    schema_overrides: Mapping[str, pl.DataType] = MappingProxyType({}),
-    delimiter: Optional[str] = None,
-    null_values: Optional[Sequence[str]] = None,
-) -> pl.DataFrame:
-    if isinstance(file_or_bytes, Path):
-        LOGGER.info("loading csv from path %s", str(file_or_bytes))
-    else:
-        LOGGER.info("loading csv from string (%d bytes)", len(file_or_bytes))
+    schema_overrides: Mapping[str, pl.DataType],
+    delimiter: Optional[str],
+    null_values: Optional[Sequence[str]],
+) -> _DsvReadOptions:
+    header_line = _read_header_line(file_or_bytes)
+    column_signature = tuple(
+        (c.source, c.target, c.column_type, c.ingestion_data_type, c.target_data_type)
+        for c in column_configs
+    )
 
-    sep, headers = _parse_header_row(file_or_bytes, delimiter)
+    try:
+        return _cached_dsv_read_options(
+            header_line,
+            delimiter,
+            column_signature,
+            tuple(schema_overrides.items()),
+            None if null_values is None else tuple(null_values),
+        )
+    except ValueError as e:
+        raise ValueError(f"{e}: {file_or_bytes!s:.200}") from e
+
+
+@lru_cache(maxsize=256)
+def _cached_dsv_read_options(
+    header_line: str,
+    delimiter: Optional[str],
+    column_signature: Tuple[_ColumnSignature, ...],
+    schema_overrides: Tuple[Tuple[str, pl.DataType], ...],
+    null_values: Optional[Tuple[str, ...]],
+) -> _DsvReadOptions:
+    # files of a search path usually share a header, so the options are
+    # computed once per header row and column configuration
+    sep, headers = _sniff_header(header_line, delimiter, "header row")
 
     def _is_forced_dtype(dtype: pl.DataType) -> bool:
         return (
             dtype.is_temporal() or dtype.is_decimal() or dtype in {pl.String, pl.Utf8}
         )
 
-    headers_ingestion_schema: Mapping[str, pl.DataType] = {
-        cfg.source: PolarsType.from_sql(cfg.ingestion_data_type)
-        for cfg in header_configs(column_configs)
-        if cfg.source
+    def _read_dtype(dtype: pl.DataType) -> pl.DataType:
+        # matches what inference would give for well-formed values, the
+        # exact types are applied after the transforms
+        if dtype.is_integer():
+            return pl.Int64()
+        if dtype.is_float():
+            return pl.Float64()
+        return dtype
+
+    ingestion_dtypes: Dict[str, pl.DataType] = {
+        source: PolarsType.from_sql(ingestion_data_type)
+        for source, _, column_type, ingestion_data_type, _ in column_signature
+        if source and ingestion_data_type and column_type in ["data", "dsv_only"]
     }
+    ingestion_dtypes.update(dict(schema_overrides))
 
-    forced_schema = {
-        header: dtype
-        for header, dtype in {**headers_ingestion_schema, **schema_overrides}.items()
-        if _is_forced_dtype(dtype) and header in headers
+    configured_dtypes: Dict[str, pl.DataType] = {
+        target: PolarsType.from_sql(target_data_type)
+        for _, target, _, _, target_data_type in column_signature
+        if target and target_data_type
     }
-
-    if null_values is None:
-        null_values = ["", "None"]
+    configured_dtypes.update(ingestion_dtypes)
 
     valid_col_configs = set()
-    valid_col_configs |= {c.source for c in column_configs if c.source}
-    valid_col_configs |= {c.target for c in column_configs if c.target}
+    valid_col_configs |= {source for source, *_ in column_signature if source}
+    valid_col_configs |= {target for _, target, *_ in column_signature if target}
     source_cols: Sequence[str] = list(
         {h for h in headers if h in valid_col_configs or h.startswith("__")}
     )
 
-    dsv_df = (
-        pl.read_csv(
+    schema = {
+        h: _read_dtype(configured_dtypes[h]) if h in configured_dtypes else pl.Utf8()
+        for h in source_cols
+    }
+
+    forced_schema = {
+        h: ingestion_dtypes[h]
+        for h in source_cols
+        if h in ingestion_dtypes and _is_forced_dtype(ingestion_dtypes[h])
+    }
+
+    return _DsvReadOptions(
+        sep,
+        source_cols,
+        schema,
+        forced_schema,
+        ["", "None"] if null_values is None else list(null_values),
+    )
+
+
+def _finalise_typed_dsv(
+    dsv_df: pl.DataFrame,
+    column_configs: Sequence[IngestionColumnConfig],
+    schema_overrides: Mapping[str, pl.DataType],
+) -> pl.DataFrame:
+    dsv_df = dsv_df.drop("", strict=False).unique(maintain_order=True)
+    dsv_df.columns = [c.strip() for c in dsv_df.columns]
+    dsv_df = _validate_expected_columns(dsv_df, column_configs, schema_overrides)
+
+    return dsv_df
+
+
+def load_typed_dsv(
+    file_or_bytes: Union[Path, bytes],
+    column_configs: Sequence[IngestionColumnConfig],
+    schema_overrides: Mapping[str, pl.DataType] = MappingProxyType({}),
+    delimiter: Optional[str] = None,
+    null_values: Optional[Sequence[str]] = None,
+) -> pl.DataFrame:
+    if isinstance(file_or_bytes, Path):
+        LOGGER.info("loading csv from path %s", str(file_or_bytes))
+    else:
+        LOGGER.info("loading csv from string (%d bytes)", len(file_or_bytes))
+
+    options = _dsv_read_options(
+        file_or_bytes, column_configs, schema_overrides, delimiter, null_values
+    )
+
+    try:
+        dsv_df = pl.read_csv(
+            file_or_bytes,
+            columns=options.columns,
+            separator=options.separator,
+            has_header=True,
+            schema_overrides=options.schema,
+            infer_schema_length=0,
+            null_values=options.null_values,
+        )
+    except pl.exceptions.PolarsError as e:
+        # values that do not parse as their configured type, e.g. 1.0 in an
+        # integer column, are left to inference and cast after the transforms
+        LOGGER.warning("falling back to schema inference: %s", e)
+        dsv_df = pl.read_csv(
             file_or_bytes,
-            columns=source_cols,
-            separator=sep,
+            columns=options.columns,
+            separator=options.separator,
             has_header=True,
-            schema_overrides=forced_schema,
-            null_values=null_values,
+            schema_overrides=options.fallback_schema,
+            null_values=options.null_values,
         )
-        .drop("", strict=False)
-        .unique(maintain_order=True)
+
+    return _finalise_typed_dsv(dsv_df, column_configs, schema_overrides)
+
+
+def load_typed_dsv_batches(
+    file: Path,
+    column_configs: Sequence[IngestionColumnConfig],
+    chunk_rows: int,
+    schema_overrides: Mapping[str, pl.DataType] = MappingProxyType({}),
+    delimiter: Optional[str] = None,
+    null_values: Optional[Sequence[str]] = None,
+) -> Iterator[pl.DataFrame]:
+    """Streams a dsv file in chunks of (at most) chunk_rows rows.
+
+    Each chunk is typed and deduplicated like load_typed_dsv, duplicate rows
+    in different chunks are not removed.
+    """
+    LOGGER.info("streaming csv from path %s in chunks of %d rows", file, chunk_rows)
+
+    options = _dsv_read_options(
+        file, column_configs, schema_overrides, delimiter, null_values
     )
 
-    dsv_df.columns = [c.strip() for c in dsv_df.columns]
+    def _batches(
+        schema: Mapping[str, pl.DataType],
+        infer_schema_length: Optional[int],
+        offset: int,
+    ) -> Iterator[pl.DataFrame]:
+        return (
+            pl.scan_csv(
+                file,
+                separator=options.separator,
+                has_header=True,
+                schema_overrides=schema,
+                infer_schema_length=infer_schema_length,
+                null_values=options.null_values,
+            )
+            .select(options.columns)
+            .slice(offset)
+            .collect_batches(chunk_size=chunk_rows)
+        )
 
-    dsv_df = _validate_expected_columns(dsv_df, column_configs, schema_overrides)
+    # rows of the file already yielded, earlier chunks may be committed
+    num_rows = 0
+    try:
+        for dsv_df in _batches(options.schema, 0, 0):
+            num_rows += len(dsv_df)
+            yield _finalise_typed_dsv(dsv_df, column_configs, schema_overrides)
+    except pl.exceptions.PolarsError as e:
+        # as in load_typed_dsv, but the bad value can be anywhere in the file,
+        # so the types are inferred from all of it
+        LOGGER.warning(
+            "falling back to schema inference after %d rows: %s", num_rows, e
+        )
+        for dsv_df in _batches(options.fallback_schema, None, num_rows):
+            yield _finalise_typed_dsv(dsv_df, column_configs, schema_overrides)
 
-    return dsv_df
+
+def estimate_chunk_rows(file: Path, max_chunk_bytes: int, sample_bytes=1 << 20) -> int:
+    """Number of rows of a dsv file that fit in approximately max_chunk_bytes."""
+    with open(file, "rb") as f:
+        sample = f.read(sample_bytes)
+
+    num_lines = max(sample.count(b"\n"), 1)
+    bytes_per_row = max(len(sample) // num_lines, 1)
+
+    return max(max_chunk_bytes // bytes_per_row, 1)
 
 
 def _validate_expected_columns(
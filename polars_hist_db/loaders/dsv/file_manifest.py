@@ -0,0 +1,227 @@
+import fnmatch
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import polars as pl
+
+LOGGER = logging.getLogger(__name__)
+
+# one row per directory entry. empty directories are kept as a single row
+# with a null name, so they are not listed again while unchanged
+_MANIFEST_SCHEMA: Dict[str, pl.DataType] = {
+    "dir": pl.Utf8(),
+    "dir_mtime_ns": pl.Int64(),
+    "name": pl.Utf8(),
+    "is_dir": pl.Boolean(),
+    "mtime_ns": pl.Int64(),
+}
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translates a glob pattern into an anchored regex that polars can evaluate.
+
+    Like fnmatch, '*' also matches path separators.
+    """
+    parts: List[str] = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            parts.append(".*")
+        elif c == "?":
+            parts.append(".")
+        elif c == "[":
+            end = pattern.find("]", i + 1 if pattern[i : i + 1] in ("!", "]") else i)
+            if end == -1:
+                parts.append(r"\[")
+                continue
+
+            body = pattern[i:end].replace("\\", "\\\\").replace("[", "\\[")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            elif body.startswith("^"):
+                body = "\\" + body
+            parts.append(f"[{body}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(c))
+
+    return "^" + "".join(parts) + "$"
+
+
+def _matches_any(path: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(path, p) for p in patterns)
+
+
+def _matches_any_expr(patterns: Iterable[str], default: bool) -> pl.Expr:
+    # Scandir treats an empty list of patterns as no filter
+    exprs = [pl.col("name").str.contains(glob_to_regex(p)) for p in patterns]
+    if len(exprs) == 0:
+        return pl.lit(default)
+
+    return pl.any_horizontal(exprs)
+
+
+class _Manifest:
+    def __init__(self, df: pl.DataFrame):
+        self.df = df
+
+        dirs_df = df.group_by("dir").agg(
+            pl.col("dir_mtime_ns").first(),
+            subdirs=pl.col("name").filter(pl.col("is_dir")),
+        )
+        self.dir_mtimes: Dict[str, int] = dict(
+            zip(dirs_df["dir"].to_list(), dirs_df["dir_mtime_ns"].to_list())
+        )
+        self.subdirs: Dict[str, List[str]] = dict(
+            zip(dirs_df["dir"].to_list(), dirs_df["subdirs"].to_list())
+        )
+
+    @staticmethod
+    def read(manifest_path: str) -> "_Manifest":
+        df = pl.DataFrame(schema=_MANIFEST_SCHEMA)
+        if os.path.exists(manifest_path):
+            try:
+                df = pl.read_parquet(manifest_path).cast(_MANIFEST_SCHEMA)  # type: ignore[arg-type]
+            except (pl.exceptions.PolarsError, OSError) as e:
+                LOGGER.warning(
+                    "ignoring unreadable file manifest %s: %s", manifest_path, e
+                )
+
+        return _Manifest(df)
+
+
+def _write_manifest(manifest_path: str, df: pl.DataFrame):
+    tmp_path = f"{manifest_path}.tmp"
+    df.write_parquet(tmp_path)
+    os.replace(tmp_path, manifest_path)
+
+
+def _list_dir(
+    abs_dir: str, rel_dir: str, dir_mtime_ns: int
+) -> Tuple[pl.DataFrame, List[str]]:
+    subdirs: List[str] = []
+    names: List[Optional[str]] = []
+    is_dirs: List[bool] = []
+    mtimes: List[Optional[int]] = []
+    with os.scandir(abs_dir) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+                names.append(entry.name)
+                is_dirs.append(True)
+                mtimes.append(None)
+            elif entry.is_file():
+                names.append(entry.name)
+                is_dirs.append(False)
+                mtimes.append(entry.stat().st_mtime_ns)
+
+    if len(names) == 0:
+        names, is_dirs, mtimes = [None], [False], [None]
+
+    df = pl.DataFrame(
+        {
+            "dir": [rel_dir] * len(names),
+            "dir_mtime_ns": [dir_mtime_ns] * len(names),
+            "name": names,
+            "is_dir": is_dirs,
+            "mtime_ns": mtimes,
+        },
+        schema=_MANIFEST_SCHEMA,
+    )
+
+    return df, subdirs
+
+
+def scan_with_manifest(
+    root_path: str,
+    manifest_path: str,
+    file_include: Iterable[str],
+    max_depth: int = 4,
+    dir_include: Iterable[str] = (),
+    dir_exclude: Iterable[str] = (),
+    file_exclude: Iterable[str] = (),
+) -> pl.DataFrame:
+    """Lists the files below root_path, reusing the listings of unchanged directories.
+
+    Directory listings are persisted to a parquet manifest. A directory whose
+    mtime is unchanged since the last scan is not listed again, so files that
+    are modified in place (rather than replaced) keep their previous mtime.
+
+    Filters follow Scandir: file patterns match file names, directory patterns
+    match paths relative to root_path, and max_depth counts root_path as 1
+    (0 is unlimited).
+
+    Returns the columns path (relative to root_path) and mtime.
+    """
+    dir_include = list(dir_include)
+    dir_exclude = list(dir_exclude)
+
+    cached = _Manifest.read(manifest_path)
+    unchanged_dirs: List[str] = []
+    listings: List[pl.DataFrame] = []
+
+    pending = [("", 1)]
+    while pending:
+        rel_dir, depth = pending.pop()
+        try:
+            dir_mtime_ns = os.stat(os.path.join(root_path, rel_dir)).st_mtime_ns
+        except FileNotFoundError:
+            continue
+
+        if cached.dir_mtimes.get(rel_dir) == dir_mtime_ns:
+            unchanged_dirs.append(rel_dir)
+            subdirs = cached.subdirs[rel_dir]
+        else:
+            listing, subdirs = _list_dir(
+                os.path.join(root_path, rel_dir), rel_dir, dir_mtime_ns
+            )
+            listings.append(listing)
+
+        if max_depth != 0 and depth >= max_depth:
+            continue
+
+        for name in subdirs:
+            sub_dir = name if rel_dir == "" else f"{rel_dir}/{name}"
+            if dir_include and not _matches_any(sub_dir, dir_include):
+                continue
+            if _matches_any(sub_dir, dir_exclude):
+                continue
+            pending.append((sub_dir, depth + 1))
+
+    LOGGER.info(
+        "listed %d of %d directories in %s, others unchanged",
+        len(listings),
+        len(listings) + len(unchanged_dirs),
+        root_path,
+    )
+
+    # directories that were removed, or are no longer searched, are dropped
+    if len(listings) > 0 or len(unchanged_dirs) != len(cached.dir_mtimes):
+        entries_df = pl.concat(
+            [cached.df.filter(pl.col("dir").is_in(unchanged_dirs)), *listings]
+        )
+        _write_manifest(manifest_path, entries_df)
+    else:
+        entries_df = cached.df
+
+    is_included = _matches_any_expr(file_include, default=True)
+    is_excluded = _matches_any_expr(file_exclude, default=False)
+
+    return (
+        entries_df.lazy()
+        .filter(~pl.col("is_dir") & pl.col("name").is_not_null())
+        .filter(is_included & ~is_excluded)
+        .select(
+            path=pl.when(pl.col("dir") == "")
+            .then(pl.col("name"))
+            .otherwise(pl.concat_str(["dir", "name"], separator="/")),
+            mtime=pl.from_epoch("mtime_ns", time_unit="ns")
+            .dt.cast_time_unit("us")
+            .dt.replace_time_zone("UTC"),
+        )
+        .collect()
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Mapping, Iterable, List
+from typing import Any, Mapping, Iterable, List, Optional
 import logging
 import os
 import re
@@ -8,13 +8,17 @@ import polars as pl
 import pytz
 from scandir_rs import Scandir
 
+from .file_manifest import scan_with_manifest
+
 LOGGER = logging.getLogger(__name__)
 
 TzInfo = pytz.tzinfo.BaseTzInfo
 
 
-def _parse_time(path, pattern: str, src_tz: TzInfo, target_tz: TzInfo) -> datetime:
-    m = re.match(pattern, path)
+def _parse_time(
+    path, pattern: re.Pattern, src_tz: TzInfo, target_tz: TzInfo
+) -> datetime:
+    m = pattern.match(path)
     if m is None:
         raise ValueError(f"failed to parse timestamp from file {path}")
 
@@ -34,6 +38,67 @@ def _parse_time(path, pattern: str, src_tz: TzInfo, target_tz: TzInfo) -> dateti
     return target_dt
 
 
+def _parse_times(
+    paths: pl.Series, datetime_regex: str, src_tz: TzInfo, target_tz: TzInfo
+) -> pl.Series:
+    """Parses the timestamps of paths in one vectorised pass.
+
+    Paths that polars cannot parse, e.g. regexes using python-only syntax or
+    local times skipped by a DST change, fall back to _parse_time.
+    """
+    pattern = re.compile(datetime_regex)
+    group_names = pattern.groupindex.keys()
+    dtype = pl.Datetime("us", "UTC")
+
+    def _part(name: str, default: int) -> pl.Expr:
+        if name in group_names:
+            return pl.col(name).cast(pl.Int32)
+        return pl.lit(default, dtype=pl.Int32)
+
+    try:
+        parsed = (
+            paths.str.extract_groups(f"^(?:{datetime_regex})")
+            .struct.unnest()
+            .select(
+                pl.datetime(
+                    _part("y", 0),
+                    _part("m", 0),
+                    _part("d", 0),
+                    _part("H", 0),
+                    _part("M", 0),
+                    _part("S", 0),
+                    _part("u", 0),
+                )
+                .dt.replace_time_zone(
+                    str(src_tz), ambiguous="latest", non_existent="null"
+                )
+                .dt.convert_time_zone(str(target_tz))
+            )
+            .to_series()
+        )
+    except pl.exceptions.PolarsError as e:
+        LOGGER.debug("falling back to python regex for %s: %s", datetime_regex, e)
+        parsed = pl.Series(values=[None] * len(paths), dtype=dtype)
+
+    if parsed.null_count() == 0:
+        return parsed
+
+    return (
+        pl.DataFrame({"path": paths, "parsed": parsed})
+        .select(
+            pl.when(pl.col("parsed").is_null())
+            .then(
+                pl.col("path").map_elements(
+                    lambda x: _parse_time(x, pattern, src_tz, target_tz),
+                    return_dtype=dtype,
+                )
+            )
+            .otherwise(pl.col("parsed"))
+        )
+        .to_series()
+    )
+
+
 def find_files(search_paths: pl.DataFrame) -> pl.DataFrame:
     files: pl.DataFrame = (
         pl.concat(
@@ -61,6 +126,7 @@ def _find_files_with_timestamps(
     dir_include: Iterable[str] = (),
     dir_exclude: Iterable[str] = (),
     file_exclude: Iterable[str] = (),
+    manifest_path: Optional[str] = None,
 ) -> pl.DataFrame:
     LOGGER.info("searching files %s in %s", file_include, root_path)
 
@@ -76,56 +142,53 @@ def _find_files_with_timestamps(
     source_tz = pytz.timezone(timestamp.get("source_tz", str(target_tz)))
     tz_method = timestamp.get("method")
 
-    sd = Scandir(
-        root_path=root_path,
-        dir_include=dir_include,
-        dir_exclude=dir_exclude,
-        file_include=file_include,
-        file_exclude=file_exclude,
-        max_depth=max_depth,
-    )
+    if manifest_path is None:
+        sd = Scandir(
+            root_path=root_path,
+            dir_include=dir_include,
+            dir_exclude=dir_exclude,
+            file_include=file_include,
+            file_exclude=file_exclude,
+            max_depth=max_depth,
+        )
 
-    entries = list(sd)
+        paths: List[str] = []
+        mtimes: List[Optional[datetime]] = []
+        for entry in sd:
+            if entry.is_file:
+                paths.append(entry.path)
+                mtimes.append(entry.st_mtime)
 
-    df = pl.DataFrame({"root_path": root_path, "entry": entries}).filter(
-        pl.col("entry").map_elements(
-            lambda x: x.is_file, skip_nulls=True, return_dtype=pl.Boolean
+        entries_df = pl.DataFrame(
+            {"path": paths, "mtime": mtimes},
+            schema={"path": pl.Utf8, "mtime": pl.Datetime("us", "UTC")},
+        )
+    else:
+        entries_df = scan_with_manifest(
+            root_path,
+            manifest_path,
+            file_include,
+            max_depth=max_depth,
+            dir_include=dir_include,
+            dir_exclude=dir_exclude,
+            file_exclude=file_exclude,
         )
-    )
 
-    if df.is_empty():
+    if entries_df.is_empty():
         return pl.DataFrame(schema=return_schema)
 
-    df = df.with_columns(
-        __path=pl.concat_str(
-            [
-                pl.lit(root_path),
-                pl.col("entry").map_elements(lambda x: x.path, return_dtype=pl.Utf8),
-            ],
-            separator=os.sep,
-        ),
-        mtime=pl.col("entry").map_elements(
-            lambda x: (
-                x.st_mtime
-                if isinstance(x.st_mtime, datetime)
-                else source_tz.localize(datetime.fromtimestamp(x.st_mtime))
-            ).astimezone(target_tz),
-            skip_nulls=True,
-            return_dtype=pl.Datetime("us", "UTC"),
-        ),
-    ).with_columns(
-        __path=pl.col("__path").map_elements(
-            lambda x: os.path.normpath(str(x)), skip_nulls=True, return_dtype=pl.Utf8
-        )
+    # entry paths are relative and already normalised
+    root_prefix = os.path.normpath(root_path).rstrip(os.sep) + os.sep
+    df = entries_df.with_columns(
+        __path=pl.lit(root_prefix)
+        + pl.col("path").str.replace_all("/", os.sep, literal=True),
     )
 
     if tz_method == "regex":
         datetime_regex = timestamp["datetime_regex"]
         df = df.with_columns(
-            __created_at=pl.col("__path").map_elements(
-                lambda x: _parse_time(x, datetime_regex, source_tz, target_tz),
-                skip_nulls=True,
-                return_dtype=pl.Datetime("us", "UTC"),
+            __created_at=_parse_times(
+                df.get_column("__path"), datetime_regex, source_tz, target_tz
             )
         )
 
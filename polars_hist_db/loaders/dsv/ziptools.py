@@ -1,32 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor
 import glob
+import gzip
+import logging
+import multiprocessing
 import os
-from typing import Mapping
+from pathlib import Path
+import tempfile
+from typing import IO, Iterator, List, Mapping, Optional, Sequence, Tuple
 from zipfile import ZipFile
 
 import polars as pl
 
+LOGGER = logging.getLogger(__name__)
 
-def read_zipfile(filename: str, schema: Mapping[str, pl.DataType]) -> pl.DataFrame:
-    meta_schema = {
-        "zip_file": pl.Categorical,
-        "csv_file": pl.Categorical,
-        "in_memory_size": pl.Float64,
-    }
+ARCHIVE_SUFFIXES = (".zip", ".gz")
+
+# bytes of csv parsed per batch, and rows per parquet row group
+_CSV_BLOCK_BYTES = 16 * 1024 * 1024
+_ROW_GROUP_ROWS = 1_000_000
+
+
+def is_archive(path: Path) -> bool:
+    return path.suffix.lower() in ARCHIVE_SUFFIXES
 
+
+def read_archive_members(path: Path) -> Iterator[Tuple[str, bytes]]:
+    """Yields (name, content) of each file in a .zip or .gz archive, decompressed in memory."""
+    match path.suffix.lower():
+        case ".zip":
+            with ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir():
+                        yield info.filename, zf.read(info)
+        case ".gz":
+            with gzip.open(path, "rb") as f:
+                yield path.stem, f.read()
+        case _:
+            raise ValueError(f"unsupported archive: {path}")
+
+
+def read_zipfile(filename: str, schema: Mapping[str, pl.DataType]) -> pl.DataFrame:
     dfs = []
-    info = []
 
-    zf = ZipFile(filename)
-    for csv_file in zf.namelist():
-        df = pl.read_csv(
-            zf.open(csv_file).read(), schema_overrides=schema
-        ).with_columns(pl.col(pl.Utf8).cast(pl.Categorical))
+    with ZipFile(filename) as zf:
+        for csv_file in zf.namelist():
+            df = pl.read_csv(zf.read(csv_file), schema_overrides=schema).with_columns(
+                pl.col(pl.Utf8).cast(pl.Categorical)
+            )
 
-        info.append([filename, csv_file, df.estimated_size("mb")])
-        dfs.append(df)
+            LOGGER.debug(
+                "read %s from %s, %f mb", csv_file, filename, df.estimated_size("mb")
+            )
+            dfs.append(df)
 
-    metadata = pl.from_records(info, orient="row", schema=meta_schema)
-    print(metadata)
     if len(dfs) > 0:
         result = pl.concat(dfs, how="vertical")
     else:
@@ -35,19 +61,164 @@ def read_zipfile(filename: str, schema: Mapping[str, pl.DataType]) -> pl.DataFra
     return result
 
 
+def _record_end(block: bytes) -> int:
+    """Position after the last newline of block that is outside a quoted field, or -1.
+
+    block must start at a record boundary, escaped quotes ("") keep the parity.
+    """
+    end = len(block)
+    while True:
+        end = block.rfind(b"\n", 0, end)
+        if end < 0 or block.count(b'"', 0, end) % 2 == 0:
+            return end if end < 0 else end + 1
+
+
+def _iter_csv_blocks(stream: IO[bytes], block_bytes: int) -> Iterator[bytes]:
+    """Splits a csv stream into blocks of whole records, each prefixed by the header."""
+    header = stream.readline()
+    remainder = b""
+    while True:
+        data = stream.read(block_bytes)
+        block = remainder + data
+        if len(data) == 0:
+            if len(block) > 0:
+                yield header + block
+            return
+
+        end = _record_end(block)
+        if end <= 0:
+            remainder = block
+            continue
+
+        yield header + block[:end]
+        remainder = block[end:]
+
+
+def _stream_csv_batches(
+    stream: IO[bytes], schema: Mapping[str, pl.DataType], block_bytes: int
+) -> Iterator[pl.DataFrame]:
+    # dtypes are inferred from the first block, like read_csv would from the
+    # first rows of the file, and reused for the remaining blocks. a block that
+    # does not parse with them (e.g. floats in a column inferred as integer)
+    # falls back to inference, and the batches are unified when merged
+    block_schema: Optional[Mapping[str, pl.DataType]] = None
+    for block in _iter_csv_blocks(stream, block_bytes):
+        if block_schema is None:
+            df = pl.read_csv(block, schema_overrides=schema)
+            block_schema = df.schema
+        else:
+            try:
+                df = pl.read_csv(block, schema=block_schema)
+            except pl.exceptions.PolarsError as e:
+                LOGGER.debug("re-inferring dtypes of csv block: %s", e)
+                df = pl.read_csv(block, schema_overrides=schema)
+
+        yield df.with_columns(pl.col(pl.Utf8).cast(pl.Categorical))
+
+
+def _unify_dtypes(schemas: Sequence[Mapping[str, pl.DataType]]) -> List[pl.Expr]:
+    """Casts for batches whose dtypes were inferred differently.
+
+    A column read as text in any batch stays categorical, other columns are
+    cast to their common supertype.
+    """
+    result = []
+    for col_name in schemas[0].keys():
+        dtypes = {s[col_name] for s in schemas}
+        if len(dtypes) == 1:
+            result.append(pl.col(col_name))
+        elif any(d in (pl.Categorical, pl.Utf8) for d in dtypes):
+            result.append(pl.col(col_name).cast(pl.Utf8).cast(pl.Categorical))
+        else:
+            supertype = pl.concat(
+                [pl.DataFrame(schema={col_name: d}) for d in dtypes],
+                how="vertical_relaxed",
+            ).schema[col_name]
+            result.append(pl.col(col_name).cast(supertype))
+
+    return result
+
+
 def convert_single_zipped_csv_to_parquet(
-    filename: str, schema: Mapping[str, pl.DataType], remove_original: bool
-) -> None:
-    df = read_zipfile(filename, schema)
+    filename: str,
+    schema: Mapping[str, pl.DataType],
+    remove_original: bool,
+    block_bytes: int = _CSV_BLOCK_BYTES,
+    row_group_rows: int = _ROW_GROUP_ROWS,
+) -> bool:
+    """Streams every csv in a zip archive into one parquet file next to it.
+
+    Archives with an up-to-date parquet file are skipped. Returns True if the
+    archive was converted.
+    """
     parquet_filename = filename.removesuffix(".zip") + ".parquet"
-    df.write_parquet(parquet_filename)
+    if os.path.exists(parquet_filename) and os.path.getmtime(
+        parquet_filename
+    ) >= os.path.getmtime(filename):
+        LOGGER.info("skipping %s, already converted", filename)
+        return False
+
+    # batches are written to part files, and merged into row groups by a
+    # streaming query, so an interrupted conversion leaves no parquet file
+    num_rows = 0
+    with tempfile.TemporaryDirectory(
+        prefix="phdb_zip_", dir=os.path.dirname(parquet_filename) or None
+    ) as parts_dir:
+        part_filenames = []
+        part_schemas = []
+        with ZipFile(filename) as zf:
+            for csv_file in zf.namelist():
+                with zf.open(csv_file) as stream:
+                    for df in _stream_csv_batches(stream, schema, block_bytes):
+                        part_filename = os.path.join(
+                            parts_dir, f"{num_rows:016d}.parquet"
+                        )
+                        df.write_parquet(part_filename)
+                        part_filenames.append(part_filename)
+                        part_schemas.append(df.schema)
+                        num_rows += len(df)
+
+        tmp_filename = os.path.join(parts_dir, "result.parquet")
+        if len(part_filenames) == 0:
+            pl.DataFrame().write_parquet(tmp_filename)
+        else:
+            unified_cols = _unify_dtypes(part_schemas)
+            pl.concat(
+                [pl.scan_parquet(f).select(unified_cols) for f in part_filenames]
+            ).sink_parquet(tmp_filename, row_group_size=row_group_rows)
+
+        os.replace(tmp_filename, parquet_filename)
+
+    LOGGER.info("converted %s to %s, %d rows", filename, parquet_filename, num_rows)
 
     if remove_original:
         os.remove(filename)
 
+    return True
+
 
 def convert_zipped_csvs_to_parquet(
-    folder: str, schema: Mapping[str, pl.DataType], remove_original: bool
-) -> None:
-    for filename in glob.glob(os.path.join(folder, "*.zip")):
-        convert_single_zipped_csv_to_parquet(filename, schema, remove_original)
+    folder: str,
+    schema: Mapping[str, pl.DataType],
+    remove_original: bool,
+    max_workers: Optional[int] = None,
+) -> int:
+    """Converts the zip archives in a folder in parallel, see convert_single_zipped_csv_to_parquet.
+
+    Returns the number of archives converted.
+    """
+    filenames = sorted(glob.glob(os.path.join(folder, "*.zip")))
+    if len(filenames) == 0:
+        return 0
+
+    # polars is not fork-safe once its thread pool has started
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                convert_single_zipped_csv_to_parquet, filename, schema, remove_original
+            )
+            for filename in filenames
+        ]
+        return sum(future.result() for future in futures)
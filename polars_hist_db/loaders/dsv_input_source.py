@@ -1,8 +1,28 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+from dataclasses import dataclass, field
 from datetime import datetime
 import logging
+import os
 from pathlib import Path
+import tempfile
 import time
-from typing import AsyncGenerator, Awaitable, Callable, List, Tuple, Union
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Deque,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import polars as pl
 from sqlalchemy import Connection, Engine
@@ -14,15 +34,41 @@ from .transform import apply_transformations
 from ..config.dataset import DatasetConfig
 from ..config.input.dsv_crawler import DsvCrawlerInputConfig
 from ..config.table import TableConfigs
-from ..core.audit import AuditOps
-from .dsv.dsv_loader import load_typed_dsv
+from .dsv.dsv_loader import (
+    estimate_chunk_rows,
+    load_typed_dsv,
+    load_typed_dsv_batches,
+)
+from .dsv.columnar_loader import detect_file_format, load_typed_columnar
 from .dsv.file_search import find_files
+from .dsv.ziptools import is_archive, read_archive_members
 from .input_source import InputSource
 from ..utils.clock import Clock
+from ..utils.metrics import add_stage_rows, timed_stage
 
 LOGGER = logging.getLogger(__name__)
 
 
+@dataclass
+class _FileBatch:
+    files: List[Tuple[Path, datetime]] = field(default_factory=list)
+    partitions: List[Tuple[datetime, pl.DataFrame]] = field(default_factory=list)
+    num_rows: int = 0
+    num_bytes: int = 0
+
+    def add(
+        self,
+        path: Path,
+        file_time: datetime,
+        partitions: List[Tuple[datetime, pl.DataFrame]],
+        num_bytes: int,
+    ):
+        self.files.append((path, file_time))
+        self.partitions.extend(partitions)
+        self.num_rows += sum(len(df) for _, df in partitions)
+        self.num_bytes += num_bytes
+
+
 class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
     def __init__(
         self,
@@ -32,6 +78,37 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
     ):
         super().__init__(tables, dataset, config)
 
+        if self.config.max_chunk_bytes is not None:
+            # each chunk would drop out the rows of every other chunk
+            if self.dataset.delta_config.row_finality == "dropout":
+                raise ValueError(
+                    f"dataset {dataset.name}: max_chunk_bytes is not supported with row_finality=dropout"
+                )
+
+            if self.config.filter_past_events:
+                raise ValueError(
+                    f"dataset {dataset.name}: max_chunk_bytes is not supported with filter_past_events"
+                )
+
+            if self.dataset.delta_config.on_duplicate_key == "error":
+                LOGGER.warning(
+                    "dataset %s: duplicate keys in different chunks of a file "
+                    "are not detected, the later chunk overwrites the earlier row",
+                    dataset.name,
+                )
+
+        for name in ("batch_max_rows", "batch_max_bytes"):
+            limit = getattr(self.config, name)
+            if limit is not None and limit <= 0:
+                raise ValueError(
+                    f"dataset {dataset.name}: {name} must be > 0, got {limit}"
+                )
+
+        if self.config.prefetch_files < 0:
+            raise ValueError(
+                f"dataset {dataset.name}: prefetch_files must be >= 0, got {self.config.prefetch_files}"
+            )
+
     async def cleanup(self) -> None:
         pass
 
@@ -43,29 +120,306 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
     def _process_payload(
         self, payload: Union[Path, bytes], payload_time: datetime
     ) -> List[Tuple[datetime, pl.DataFrame]]:
-        df = load_typed_dsv(
-            payload, self.column_definitions, null_values=self.dataset.null_values
+        return self._partition(self._load_and_transform(payload), payload_time)
+
+    def _load_and_transform(self, payload: Union[Path, bytes]) -> pl.DataFrame:
+        # independent of other payloads, so safe to run in a prefetch thread
+        file_format = (
+            detect_file_format(payload, self.config.file_format)
+            if isinstance(payload, Path)
+            else "dsv"
         )
+
+        with timed_stage("load_typed_dsv"):
+            if file_format != "dsv":
+                assert isinstance(payload, Path)
+                df = load_typed_columnar(payload, self.column_definitions, file_format)
+            elif isinstance(payload, Path) and is_archive(payload):
+                df = self._load_archive(payload)
+            else:
+                df = load_typed_dsv(
+                    payload,
+                    self.column_definitions,
+                    null_values=self.dataset.null_values,
+                )
+        add_stage_rows("load_typed_dsv", len(df))
         LOGGER.debug("loaded %d rows", len(df))
 
-        df = apply_transformations(df, self.column_definitions)
-        partitions = self._apply_time_partitioning(df, payload_time)
+        return self._transform(df)
+
+    def _load_archive(self, path: Path) -> pl.DataFrame:
+        # members are decompressed in memory one at a time, the archive is
+        # deduplicated and audited as a single file
+        dfs = []
+        for name, content in read_archive_members(path):
+            LOGGER.info("loading %s from archive %s", name, path)
+            dfs.append(
+                load_typed_dsv(
+                    content,
+                    self.column_definitions,
+                    null_values=self.dataset.null_values,
+                )
+            )
+
+        if len(dfs) == 0:
+            raise ValueError(f"no files in archive {path}")
+
+        return pl.concat(dfs, how="diagonal_relaxed").unique(maintain_order=True)
+
+    def _transform(self, df: pl.DataFrame) -> pl.DataFrame:
+        with timed_stage("apply_transformations"):
+            df = apply_transformations(df, self.column_definitions)
+        add_stage_rows("apply_transformations", len(df))
+
+        return df
+
+    def _partition(
+        self, df: pl.DataFrame, payload_time: datetime
+    ) -> List[Tuple[datetime, pl.DataFrame]]:
+        # filter_past_events depends on the previous payload, so payloads
+        # must be partitioned in order
+        with timed_stage("time_partitioning"):
+            partitions = self._apply_time_partitioning(df, payload_time)
 
         return partitions
 
+    def _is_batching(self) -> bool:
+        return (
+            self.config.batch_max_rows is not None
+            or self.config.batch_max_bytes is not None
+        )
+
+    def _exceeds_batch(
+        self,
+        batch: _FileBatch,
+        partitions: List[Tuple[datetime, pl.DataFrame]],
+        num_bytes: int,
+    ) -> bool:
+        if len(batch.files) == 0:
+            return False
+
+        max_rows = self.config.batch_max_rows
+        num_rows = sum(len(df) for _, df in partitions)
+        if max_rows is not None and batch.num_rows + num_rows > max_rows:
+            return True
+
+        max_bytes = self.config.batch_max_bytes
+        return max_bytes is not None and batch.num_bytes + num_bytes > max_bytes
+
+    def _is_batch_full(self, batch: _FileBatch) -> bool:
+        if not self._is_batching():
+            return True
+
+        max_rows = self.config.batch_max_rows
+        max_bytes = self.config.batch_max_bytes
+        return (max_rows is not None and batch.num_rows >= max_rows) or (
+            max_bytes is not None and batch.num_bytes >= max_bytes
+        )
+
+    def _audit_commit_fn(
+        self,
+        files: List[Tuple[Path, datetime]],
+        chunk_modified_tables: Optional[Set[Tuple[str, str]]] = None,
+    ) -> Callable[[Connection, List[Tuple[str, str]]], bool]:
+        # a transaction only reports the tables it modified, so every file of a
+        # batch is audited against all of them
+        def commit_fn(
+            connection: Connection, modified_tables: List[Tuple[str, str]]
+        ) -> bool:
+            result = self._add_audit_entries(
+                "dsv",
+                [(path.as_posix(), file_time) for path, file_time in files],
+                sorted(set(chunk_modified_tables or ()).union(modified_tables)),
+                connection,
+            )
+
+            if not result:
+                LOGGER.error(
+                    "audit for [%s]: FAILED", ",".join(path.name for path, _ in files)
+                )
+                raise NonRetryableException("Failed to update audit log")
+
+            return result
+
+        return commit_fn
+
+    def _chunk_commit_fn(
+        self, chunk_modified_tables: Set[Tuple[str, str]]
+    ) -> Callable[[Connection, List[Tuple[str, str]]], bool]:
+        def commit_fn(
+            connection: Connection, modified_tables: List[Tuple[str, str]]
+        ) -> bool:
+            # the file is only audited once all of its chunks are committed
+            chunk_modified_tables.update(modified_tables)
+            return True
+
+        return commit_fn
+
+    def _is_chunked(self, path: Path) -> bool:
+        return (
+            self.config.max_chunk_bytes is not None
+            and detect_file_format(path, self.config.file_format) == "dsv"
+            and not is_archive(path)
+            and path.stat().st_size > self.config.max_chunk_bytes
+        )
+
+    async def _run_in_thread(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # parsing would block the event loop, and the datasets, polls and
+        # heartbeats sharing it. threads do not inherit the metrics dataset.
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, context.run, fn, *args
+        )
+
+    async def _prefetch_files(
+        self, files: List[Tuple[Path, datetime]]
+    ) -> AsyncIterator[Tuple[Path, datetime, Optional[pl.DataFrame]]]:
+        """Yields files in order, with up to prefetch_files of the following
+        files loaded and transformed in background threads.
+
+        Files that are streamed in chunks are not prefetched, and are yielded
+        without a dataframe.
+        """
+        num_prefetch = self.config.prefetch_files
+        if num_prefetch == 0:
+            for path, file_time in files:
+                yield path, file_time, None
+            return
+
+        executor = ThreadPoolExecutor(
+            max_workers=num_prefetch, thread_name_prefix="dsv_prefetch"
+        )
+        pending: Deque[Tuple[Path, datetime, Optional[Future[pl.DataFrame]]]] = deque()
+        remaining = iter(files)
+
+        def _submit_next():
+            item = next(remaining, None)
+            if item is None:
+                return
+
+            path, file_time = item
+            future = None
+            if not self._is_chunked(path):
+                # threads do not inherit the metrics dataset of the caller
+                context = contextvars.copy_context()
+                future = executor.submit(context.run, self._load_and_transform, path)
+
+            pending.append((path, file_time, future))
+
+        try:
+            for _ in range(num_prefetch + 1):
+                _submit_next()
+
+            while pending:
+                path, file_time, future = pending.popleft()
+                df: Optional[pl.DataFrame] = None
+                if future is not None:
+                    df = await asyncio.wrap_future(future)
+                _submit_next()
+                yield path, file_time, df
+        finally:
+            # a file still being loaded is left to finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _process_file_chunks(
+        self, path: Path, payload_time: datetime
+    ) -> Iterator[List[Tuple[datetime, pl.DataFrame]]]:
+        max_chunk_bytes = self.config.max_chunk_bytes
+        assert max_chunk_bytes is not None
+
+        chunk_rows = estimate_chunk_rows(path, max_chunk_bytes)
+        batches = self._timed_batches(
+            load_typed_dsv_batches(
+                path,
+                self.column_definitions,
+                chunk_rows,
+                null_values=self.dataset.null_values,
+            )
+        )
+
+        if not self.dataset.time_partition:
+            for df in batches:
+                yield self._partition(self._transform(df), payload_time)
+            return
+
+        # rows of a time partition can be spread over the whole file, so chunks
+        # are spilled to disk by partition and replayed in time order
+        with tempfile.TemporaryDirectory(
+            prefix="phdb_chunks_", dir=self.config.chunk_spill_dir
+        ) as spill_dir:
+            bucket_dirs: Dict[datetime, str] = dict()
+            for chunk_idx, df in enumerate(batches):
+                df = self._transform(df)
+                with timed_stage("time_partitioning"):
+                    self._spill_time_buckets(df, spill_dir, chunk_idx, bucket_dirs)
+
+            LOGGER.debug("spilled %d time partitions of %s", len(bucket_dirs), path)
+
+            partitions: List[Tuple[datetime, pl.DataFrame]] = []
+            partitions_bytes = 0.0
+            for bucket in sorted(bucket_dirs):
+                with timed_stage("time_partitioning"):
+                    bucket_df = self._assign_time_buckets(
+                        pl.read_parquet(
+                            os.path.join(bucket_dirs[bucket], "*.parquet")
+                        ).drop("__bucket")
+                    ).drop("__bucket")
+
+                partitions.append((bucket, bucket_df))
+                partitions_bytes += bucket_df.estimated_size()
+                if partitions_bytes >= max_chunk_bytes:
+                    yield partitions
+                    partitions = []
+                    partitions_bytes = 0.0
+
+            if partitions:
+                yield partitions
+
+    def _timed_batches(self, batches: Iterator[pl.DataFrame]) -> Iterator[pl.DataFrame]:
+        while True:
+            with timed_stage("load_typed_dsv"):
+                df = next(batches, None)
+
+            if df is None:
+                return
+
+            add_stage_rows("load_typed_dsv", len(df))
+            LOGGER.debug("loaded chunk of %d rows", len(df))
+            yield df
+
+    def _spill_time_buckets(
+        self,
+        df: pl.DataFrame,
+        spill_dir: str,
+        chunk_idx: int,
+        bucket_dirs: Dict[datetime, str],
+    ):
+        prepared_df = self._assign_time_buckets(df)
+        partitions = prepared_df.partition_by(
+            "__bucket", as_dict=True, maintain_order=True
+        )
+        for (bucket,), partition_df in partitions.items():
+            if bucket not in bucket_dirs:
+                bucket_dirs[bucket] = os.path.join(spill_dir, str(len(bucket_dirs)))
+                os.mkdir(bucket_dirs[bucket])
+
+            partition_df.write_parquet(
+                os.path.join(bucket_dirs[bucket], f"{chunk_idx:08d}.parquet")
+            )
+
     async def next_df(
         self, engine: Engine
     ) -> AsyncGenerator[
         Tuple[
             List[Tuple[datetime, pl.DataFrame]],
-            Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
+            Callable[[Connection, List[Tuple[str, str]]], bool],
         ],
         None,
     ]:
         async def _generator() -> AsyncGenerator[
             Tuple[
                 List[Tuple[datetime, pl.DataFrame]],
-                Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
+                Callable[[Connection, List[Tuple[str, str]]], bool],
             ],
             None,
         ]:
@@ -79,7 +433,7 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
                     bytes(self.config.payload, "UTF8"), self.config.payload_time
                 )
 
-                async def commit_fn(
+                def commit_fn(
                     connection: Connection, modified_tables: List[Tuple[str, str]]
                 ) -> bool:
                     # payload was send directly to the pipeline, rather than a filepath
@@ -101,7 +455,17 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
 
             timings = Clock()
 
-            for i, (csv_file, file_time) in enumerate(csv_files_df.rows()):
+            # files are already ordered by __created_at, and limited by
+            # scrape_limit, so prefetching does not change what is ingested
+            files = [
+                (Path(csv_file).absolute(), file_time)
+                for csv_file, file_time in csv_files_df.rows()
+            ]
+
+            batch = _FileBatch()
+            i = -1
+            async for path, file_time, df in self._prefetch_files(files):
+                i += 1
                 LOGGER.info(
                     "[%d/%d] processing file mtime=%s",
                     i + 1,
@@ -111,34 +475,52 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
 
                 start_time = time.perf_counter()
 
-                partitions = self._process_payload(Path(csv_file), file_time)
+                if df is None and self._is_chunked(path):
+                    if len(batch.files) > 0:
+                        yield batch.partitions, self._audit_commit_fn(batch.files)
+                        batch = _FileBatch()
 
-                async def commit_fn(
-                    connection: Connection, modified_tables: List[Tuple[str, str]]
-                ) -> bool:
-                    for modified_schema, modified_table in modified_tables:
-                        aops = AuditOps(modified_schema)
-                        path = Path(csv_file).absolute()
-                        result: bool = aops.add_entry(
-                            "dsv",
-                            path.as_posix(),
-                            modified_table,
-                            connection,
-                            file_time,
-                        )
+                    # tables modified by earlier chunks of the file
+                    chunk_modified_tables: Set[Tuple[str, str]] = set()
+                    chunk_commit_fn = self._chunk_commit_fn(chunk_modified_tables)
 
-                        if not result:
-                            LOGGER.error(
-                                "audit for [%s.%s - %s]: FAILED",
-                                modified_schema,
-                                modified_table,
-                                path.name,
-                            )
-                            raise NonRetryableException("Failed to update audit log")
+                    chunks = self._process_file_chunks(path, file_time)
+                    while True:
+                        partitions = await self._run_in_thread(next, chunks, None)
+                        if partitions is None:
+                            break
 
-                    return result
+                        yield partitions, chunk_commit_fn
 
-                yield partitions, commit_fn
+                    yield (
+                        [],
+                        self._audit_commit_fn(
+                            [(path, file_time)], chunk_modified_tables
+                        ),
+                    )
+                else:
+                    if df is None:
+                        partitions = await self._run_in_thread(
+                            self._process_payload, path, file_time
+                        )
+                    else:
+                        partitions = self._partition(df, file_time)
+
+                    num_bytes = path.stat().st_size
+                    if self._exceeds_batch(batch, partitions, num_bytes):
+                        yield batch.partitions, self._audit_commit_fn(batch.files)
+                        batch = _FileBatch()
+
+                    batch.add(path, file_time, partitions, num_bytes)
+                    if self._is_batch_full(batch):
+                        if len(batch.files) > 1:
+                            LOGGER.info(
+                                "committing batch of %d files, %d rows",
+                                len(batch.files),
+                                batch.num_rows,
+                            )
+                        yield batch.partitions, self._audit_commit_fn(batch.files)
+                        batch = _FileBatch()
 
                 pipeline_time = time.perf_counter() - start_time
                 timings.add_timing("pipeline", pipeline_time)
@@ -149,6 +531,9 @@ class DsvCrawlerInputSource(InputSource[DsvCrawlerInputConfig]):
                     "eta: %s", str(timings.eta("pipeline", len(csv_files_df) - i - 1))
                 )
 
+            if len(batch.files) > 0:
+                yield batch.partitions, self._audit_commit_fn(batch.files)
+
             LOGGER.info("stopped scrape - %s", table_name)
 
         return _generator()
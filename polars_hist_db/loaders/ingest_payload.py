@@ -1,16 +1,29 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Sequence
 from nats.aio.msg import Msg
 
 import polars as pl
 
+from ..config.input.ingest_fn_builtins import MSG_INDEX_COL
 from ..config.input.ingest_fn_registry import IngestFnRegistry
 from ..config.input.jetstream_config import JetstreamIngestConfig
+from ..utils.marshal import (
+    AUDIT_ID_HEADER,
+    CREATED_AT_HEADER,
+    INGEST_ARGS_HEADER,
+    INGEST_FN_HEADER,
+    from_ipc_msg,
+    is_ipc_msg,
+)
 
 
 def load_df_from_msg(
     msg: Msg, ts: datetime, ingest_config: JetstreamIngestConfig
 ) -> pl.DataFrame:
+    if is_ipc_msg(msg.headers):
+        return _load_df_from_ipc_msg(msg, ts, ingest_config)
+
     data = json.loads(msg.data.decode())
 
     fn_name = data.get("fn_loader_name", ingest_config.fn_name)
@@ -20,3 +33,94 @@ def load_df_from_msg(
     df = fn_reg.call_function(data, ts, fn_name, fn_args)
 
     return df
+
+
+def _load_df_from_ipc_msg(
+    msg: Msg, ts: datetime, ingest_config: JetstreamIngestConfig
+) -> pl.DataFrame:
+    headers = msg.headers or dict()
+    df = from_ipc_msg(msg.data)
+
+    # the decoded frame is passed to the ingest function named in the headers,
+    # and is otherwise ingested as is
+    fn_name = headers.get(INGEST_FN_HEADER)
+    fn_reg = IngestFnRegistry()
+    if fn_name is not None and not fn_reg.is_batch_function(fn_name):
+        if INGEST_ARGS_HEADER in headers:
+            fn_args = json.loads(headers[INGEST_ARGS_HEADER])
+        else:
+            fn_args = ingest_config.fn_args
+        df = fn_reg.call_function(df, ts, fn_name, fn_args)
+
+    if "__path" not in df.columns:
+        df = df.with_columns(__path=pl.lit(msg_audit_id(msg), dtype=pl.Utf8))
+
+    if "__created_at" not in df.columns:
+        df = df.with_columns(__created_at=pl.lit(msg_created_at(msg, ts)))
+
+    return df
+
+
+def msg_audit_id(msg: Msg) -> str:
+    if msg.headers is not None and AUDIT_ID_HEADER in msg.headers:
+        return msg.headers[AUDIT_ID_HEADER]
+
+    metadata = msg.metadata
+    return f"{metadata.stream}:{metadata.sequence.stream}"
+
+
+def msg_created_at(msg: Msg, ts: datetime) -> datetime:
+    if msg.headers is None or CREATED_AT_HEADER not in msg.headers:
+        return ts
+
+    created_at = datetime.fromisoformat(msg.headers[CREATED_AT_HEADER])
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+
+    return created_at.astimezone(ts.tzinfo)
+
+
+def load_df_from_msgs(
+    msgs: Sequence[Msg], ts: datetime, ingest_config: JetstreamIngestConfig
+) -> pl.DataFrame:
+    """Decodes a fetch of messages into one dataframe.
+
+    If the configured ingest function is a batch function, all payloads are
+    decoded in one call. Rows without a __path are audited by the
+    Phdb-Audit-Id header or the stream sequence of their message, and rows
+    without a __created_at by the Phdb-Created-At header or ts. Otherwise
+    each message is decoded with load_df_from_msg.
+    """
+    fn_reg = IngestFnRegistry()
+    if not fn_reg.is_batch_function(ingest_config.fn_name):
+        return pl.concat(
+            [load_df_from_msg(msg, ts, ingest_config) for msg in msgs],
+            how="diagonal_relaxed",
+        )
+
+    df = fn_reg.call_batch_function(
+        [msg.data for msg in msgs],
+        ts,
+        ingest_config.fn_name,
+        ingest_config.fn_args or dict(),
+    )
+
+    missing_cols = {"__path", "__created_at"} - set(df.columns)
+    if len(missing_cols) > 0 and MSG_INDEX_COL not in df.columns:
+        raise ValueError(
+            f"batch ingest function {ingest_config.fn_name} "
+            f"returned neither {', '.join(sorted(missing_cols))} nor {MSG_INDEX_COL}"
+        )
+
+    if "__path" in missing_cols:
+        audit_ids = pl.Series([msg_audit_id(msg) for msg in msgs], dtype=pl.Utf8)
+        df = df.with_columns(__path=audit_ids.gather(df[MSG_INDEX_COL]))
+
+    if "__created_at" in missing_cols:
+        created_ats = pl.Series([msg_created_at(msg, ts) for msg in msgs])
+        df = df.with_columns(__created_at=created_ats.gather(df[MSG_INDEX_COL]))
+
+    if MSG_INDEX_COL in df.columns:
+        df = df.drop(MSG_INDEX_COL)
+
+    return df
@@ -1,5 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Awaitable, Callable, List, Tuple, TypeVar, Generic
+from collections import defaultdict
+from typing import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Generic,
+    Union,
+)
 from datetime import datetime
 import logging
 
@@ -11,6 +23,7 @@ from ..core.audit import AuditOps
 from ..config.dataset import DatasetConfig
 from ..config.table import TableConfig, TableConfigs
 from ..config.input.input_source import InputConfig
+from ..config.input.types import InputDataSourceType
 
 LOGGER = logging.getLogger(__name__)
 
@@ -39,11 +52,16 @@ class InputSource(ABC, Generic[TConfig]):
     ) -> AsyncGenerator[
         Tuple[
             List[Tuple[datetime, pl.DataFrame]],
-            Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
+            Callable[[Connection, List[Tuple[str, str]]], Union[bool, Awaitable[bool]]],
         ],
         None,
     ]:
-        """Async generator that yields the next dataframe to process"""
+        """Async generator that yields the next dataframe to process.
+
+        Each batch comes with its commit function. It is called in the
+        transaction's worker thread, before the transaction commits. An async
+        commit function is awaited on the event loop instead.
+        """
         raise NotImplementedError("InputSource is an abstract class")
 
     @abstractmethod
@@ -85,9 +103,10 @@ class InputSource(ABC, Generic[TConfig]):
 
         return df
 
-    def _apply_time_partitioning(
-        self, df: pl.DataFrame, payload_time: datetime
-    ) -> List[Tuple[datetime, pl.DataFrame]]:
+    def _assign_time_buckets(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Adds the __bucket column, keeping one row per primary key and bucket."""
+        assert self.dataset.time_partition is not None
+
         pipeline = self.dataset.pipeline
         main_table_config: TableConfig = self.tables[pipeline.get_main_table_name()[1]]
         tbl_to_header_map = pipeline.get_header_map(main_table_config.name)
@@ -95,28 +114,38 @@ class InputSource(ABC, Generic[TConfig]):
             tbl_to_header_map.get(k, k) for k in main_table_config.primary_keys
         ]
 
+        tp = self.dataset.time_partition
+        time_col = tp.column
+        bucket_offset = tp.bucket_interval if tp.bucket_strategy == "round_up" else "0s"
+
+        prepared_df = (
+            df.with_columns(
+                __bucket=pl.col(time_col)
+                .dt.truncate(tp.bucket_interval)
+                .dt.offset_by(bucket_offset)
+                .cast(pl.dtype_of(time_col))
+            )
+            .sort(time_col)
+            .unique(
+                [*header_keys, "__bucket"],
+                keep=tp.unique_strategy,
+                maintain_order=True,
+            )
+        )
+
+        return prepared_df
+
+    def _apply_time_partitioning(
+        self, df: pl.DataFrame, payload_time: datetime
+    ) -> List[Tuple[datetime, pl.DataFrame]]:
         if self.dataset.time_partition:
             tp = self.dataset.time_partition
             time_col = tp.column
             interval = tp.bucket_interval
             bucket_strategy = tp.bucket_strategy
             bucket_offset = interval if bucket_strategy == "round_up" else "0s"
-            unique_strategy = tp.unique_strategy
-
-            prepared_df = (
-                df.with_columns(
-                    __bucket=pl.col(time_col)
-                    .dt.truncate(interval)
-                    .dt.offset_by(bucket_offset)
-                    .cast(pl.dtype_of(time_col))
-                )
-                .sort(time_col)
-                .unique(
-                    [*header_keys, "__bucket"],
-                    keep=unique_strategy,
-                    maintain_order=True,
-                )
-            )
+
+            prepared_df = self._assign_time_buckets(df)
 
             if self.config.filter_past_events:
                 prepared_df = self._filter_past_events(
@@ -135,6 +164,35 @@ class InputSource(ABC, Generic[TConfig]):
 
         return result  # type: ignore[return-value]
 
+    def _add_audit_entries(
+        self,
+        data_source_type: InputDataSourceType,
+        data_sources: Sequence[Tuple[str, datetime]],
+        modified_tables: List[Tuple[str, str]],
+        connection: Connection,
+    ) -> bool:
+        # one multi-row insert per audit table, rather than one per item and table
+        tables_by_schema: Dict[str, List[str]] = defaultdict(list)
+        for modified_schema, modified_table in modified_tables:
+            tables_by_schema[modified_schema].append(modified_table)
+
+        for modified_schema, schema_tables in tables_by_schema.items():
+            num_inserted = AuditOps(modified_schema).add_entries(
+                data_source_type, data_sources, schema_tables, connection
+            )
+
+            if num_inserted != len(data_sources) * len(schema_tables):
+                LOGGER.error(
+                    "audit for [%s.%s]: FAILED, %d of %d entries added",
+                    modified_schema,
+                    ",".join(schema_tables),
+                    num_inserted,
+                    len(data_sources) * len(schema_tables),
+                )
+                return False
+
+        return True
+
     def _search_and_filter_files(
         self,
         upload_candidates_df: pl.DataFrame,
@@ -148,7 +206,12 @@ class InputSource(ABC, Generic[TConfig]):
         aops = AuditOps(table_schema)
         with engine.begin() as connection:
             filtered_items_df = aops.filter_items(
-                upload_candidates_df, "__path", "__created_at", table_name, connection
+                upload_candidates_df,
+                "__path",
+                "__created_at",
+                table_name,
+                connection,
+                method=self.config.audit_filter_method,
             ).sort("__created_at")
 
             if self.dataset.scrape_limit > 0:
@@ -3,12 +3,12 @@ from datetime import datetime
 import logging
 from typing import (
     AsyncGenerator,
-    Awaitable,
     Callable,
     List,
     Tuple,
 )
 
+from nats.aio.msg import Msg
 from nats.js.api import ConsumerConfig
 from nats.js.client import JetStreamContext
 from nats.js.errors import NotFoundError
@@ -16,10 +16,10 @@ from nats.js.errors import NotFoundError
 import polars as pl
 from sqlalchemy import Connection, Engine
 
-from ..core.audit import AuditOps
 from ..utils.exceptions import NonRetryableException
+from ..utils.metrics import add_stage_rows, timed_stage
 
-from .ingest_payload import load_df_from_msg
+from .ingest_payload import load_df_from_msgs
 
 from ..config.dataset import DatasetConfig
 from ..config.input.jetstream_config import JetStreamInputConfig
@@ -46,19 +46,68 @@ class JetStreamInputSource(InputSource[JetStreamInputConfig]):
         # Caller owns the NATS client — do not close it here
         pass
 
+    def _audit_commit_fn(
+        self,
+        msgs: List[Msg],
+        msg_audits: List[Tuple[str, datetime]],
+        audit_entries: List[str],
+        loop: asyncio.AbstractEventLoop,
+    ) -> Callable[[Connection, List[Tuple[str, str]]], bool]:
+        # the messages of a fetch are bound here, as the next fetch may be
+        # prepared while this one is still being committed.
+        # commit_fn runs in the transaction's worker thread, only the acks
+        # are sent to the event loop that owns the nats client
+        def settle(ack: bool) -> None:
+            async def settle_msgs() -> None:
+                for msg in msgs:
+                    await (msg.ack() if ack else msg.nak())
+
+            asyncio.run_coroutine_threadsafe(settle_msgs(), loop).result()
+
+        def commit_fn(
+            connection: Connection, modified_tables: List[Tuple[str, str]]
+        ) -> bool:
+            audit_entry_set = set(audit_entries)
+            audited_items = [
+                (audit_log_id, created_at)
+                for audit_log_id, created_at in msg_audits
+                if audit_log_id in audit_entry_set
+            ]
+
+            result = self._add_audit_entries(
+                "nats-jetstream",
+                audited_items,
+                modified_tables,
+                connection,
+            )
+
+            if not result:
+                settle(ack=False)
+                LOGGER.error(
+                    "audit for [%s.%s]: FAILED",
+                    *self.dataset.pipeline.get_main_table_name(),
+                )
+                raise NonRetryableException("Failed to update audit log")
+
+            settle(ack=True)
+
+            return True
+
+        return commit_fn
+
     async def next_df(
         self, engine: Engine
     ) -> AsyncGenerator[
         Tuple[
             List[Tuple[datetime, pl.DataFrame]],
-            Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
+            Callable[[Connection, List[Tuple[str, str]]], bool],
         ],
         None,
     ]:
         async def _generator() -> AsyncGenerator[
             Tuple[
                 List[Tuple[datetime, pl.DataFrame]],
-                Callable[[Connection, List[Tuple[str, str]]], Awaitable[bool]],
+                Callable[[Connection, List[Tuple[str, str]]], bool],
             ],
             None,
         ]:
@@ -118,18 +167,14 @@ class JetStreamInputSource(InputSource[JetStreamInputConfig]):
                     total_msgs += len(msgs)
                     msg_ts: datetime = msgs[-1].metadata.timestamp
 
-                    all_dfs = []
-                    msg_audits = []
-                    for msg in msgs:
-                        df = load_df_from_msg(msg, msg_ts, self.config.payload_ingest)
-                        msg_audits.extend(
-                            list(
-                                df.select("__path", "__created_at").unique().iter_rows()
-                            )
-                        )
-                        all_dfs.append(df)
-
-                    df = pl.concat(all_dfs)
+                    with timed_stage("load_df_from_msg"):
+                        df = load_df_from_msgs(msgs, msg_ts, self.config.payload_ingest)
+                    add_stage_rows("load_df_from_msg", len(df))
+                    msg_audits = list(
+                        df.select("__path", "__created_at")
+                        .unique(maintain_order=True)
+                        .iter_rows()
+                    )
 
                     num_items_received = len(df)
                     received_items_ts = (
@@ -152,9 +197,12 @@ class JetStreamInputSource(InputSource[JetStreamInputConfig]):
 
                     audit_entries = df["__path"].unique().to_list()
 
-                    df = df.drop("__path", "__created_at").pipe(
-                        apply_transformations, self.column_definitions
-                    )
+                    with timed_stage("apply_transformations"):
+                        df = df.drop("__path", "__created_at").pipe(
+                            apply_transformations, self.column_definitions
+                        )
+                    add_stage_rows("apply_transformations", len(df))
+
                     LOGGER.info(
                         "got [%d/%d] %s@t=%s...",
                         len(df),
@@ -163,46 +211,16 @@ class JetStreamInputSource(InputSource[JetStreamInputConfig]):
                         received_items_ts,
                     )
 
-                    partitions = self._apply_time_partitioning(df, msg_ts)
-
-                    async def commit_fn(
-                        audit_entries: List[str],
-                        connection: Connection,
-                        modified_tables: List[Tuple[str, str]],
-                    ) -> bool:
-                        for msg, (audit_log_id, created_at) in zip(msgs, msg_audits):
-                            result = True
-                            if audit_log_id in audit_entries:
-                                for modified_schema, modified_table in modified_tables:
-                                    aops = AuditOps(modified_schema)
-                                    result = result and aops.add_entry(
-                                        "nats-jetstream",
-                                        audit_log_id,
-                                        modified_table,
-                                        connection,
-                                        created_at,
-                                    )
-
-                            if result:
-                                await msg.ack()
-                            else:
-                                await msg.nak()
-                                LOGGER.error(
-                                    "audit for [%s.%s - %s]: FAILED",
-                                    table_schema,
-                                    table_name,
-                                    audit_log_id,
-                                )
-                                raise NonRetryableException(
-                                    "Failed to update audit log"
-                                )
-
-                        return True
+                    with timed_stage("time_partitioning"):
+                        partitions = self._apply_time_partitioning(df, msg_ts)
 
                     yield (
                         partitions,
-                        lambda connection, modified_tables: commit_fn(
-                            audit_entries, connection, modified_tables
+                        self._audit_commit_fn(
+                            msgs,
+                            msg_audits,
+                            audit_entries,
+                            asyncio.get_running_loop(),
                         ),
                     )
 
@@ -1,14 +1,19 @@
 from .clock import Clock
-from .exceptions import NonRetryableException
+from .exceptions import DataValidationException, NonRetryableException
 from .compare import compare_dataframes
-from .marshal import to_ipc_b64, from_ipc_b64
+from .marshal import to_ipc_b64, from_ipc_b64, to_ipc_msg, from_ipc_msg
+from .metrics import MetricsRegistry
 from .flatten import recursive_flatten
 
 __all__ = [
     "Clock",
     "compare_dataframes",
+    "DataValidationException",
     "from_ipc_b64",
+    "from_ipc_msg",
+    "MetricsRegistry",
     "NonRetryableException",
     "to_ipc_b64",
+    "to_ipc_msg",
     "recursive_flatten",
 ]
@@ -1,38 +1,153 @@
+from array import array
 from datetime import timedelta
-from typing import Any, Dict
+import math
+import threading
+from typing import Any, Dict, List
+
 import polars as pl
 
 
+class _TimingSeries:
+    """Fixed-size ring buffer of recent timings, plus a streaming histogram.
+
+    The ring buffer serves rolling averages over the latest samples, the
+    histogram keeps count/sum/min/max and approximate quantiles over all
+    samples without storing them.
+    """
+
+    # histogram buckets grow geometrically, quantiles are accurate to ~5%
+    _bucket_growth = 1.1
+    _bucket_base = 1e-6
+
+    def __init__(self, capacity: int):
+        self._buffer = array("d", bytes(8 * capacity))
+        self._capacity = capacity
+        self._next = 0
+        self._size = 0
+
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buckets: Dict[int, int] = dict()
+
+    def add(self, value: float) -> None:
+        self._buffer[self._next] = value
+        self._next = (self._next + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        bucket = self._bucket_of(value)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+    def _bucket_of(self, value: float) -> int:
+        if value <= self._bucket_base:
+            return 0
+
+        return 1 + int(
+            math.log(value / self._bucket_base) / math.log(self._bucket_growth)
+        )
+
+    def _bucket_upper_bound(self, bucket: int) -> float:
+        return self._bucket_base * self._bucket_growth**bucket
+
+    def latest(self, n: int) -> List[float]:
+        n = min(n, self._size)
+        return [
+            self._buffer[(self._next - i) % self._capacity] for i in range(n, 0, -1)
+        ]
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return math.nan
+
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(max(self._bucket_upper_bound(bucket), self.min), self.max)
+
+        return self.max
+
+
 class Clock:
-    _borg: Dict[str, Any] = {"_df": None}
+    _borg: Dict[str, Any] = {}
 
-    def __init__(self) -> None:
-        self.__dict__ = self._borg
-        self._df: pl.DataFrame = self._getdf()
+    # number of recent samples kept per timing name, for rolling averages
+    window_capacity: int = 1024
 
-    def _getdf(self) -> pl.DataFrame:
-        if self._df is None:
-            self._df = pl.DataFrame(schema={"name": pl.Utf8, "time": pl.Float64})
+    _series: Dict[str, _TimingSeries]
+    _lock: threading.Lock
 
-        return self._df
+    def __init__(self) -> None:
+        self.__dict__ = self._borg
+        if "_series" not in self._borg:
+            self._borg["_series"] = dict()
+            self._borg["_lock"] = threading.Lock()
 
     def add_timing(self, name: str, timing: float) -> None:
-        self._df = pl.concat(
-            [self._getdf(), pl.from_dict({"name": [name], "time": [timing]})]
-        )
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = _TimingSeries(self.window_capacity)
+                self._series[name] = series
+
+            series.add(timing)
 
     def get_avg(self, name: str, window_size: int = 5) -> float:
-        avg_seconds: float = (
-            self._getdf()
-            .filter(pl.col("name") == name)
-            .get_column("time")
-            .rolling_mean(window_size=window_size, min_samples=1)
-            .tail(1)[0]
-        )
+        with self._lock:
+            series = self._series.get(name)
+            latest = [] if series is None else series.latest(window_size)
+
+        if len(latest) == 0:
+            return 0.0
 
+        avg_seconds = sum(latest) / len(latest)
         return avg_seconds
 
     def eta(self, name: str, count_remaining: int, window_size: int = 5) -> timedelta:
         avg_seconds = self.get_avg(name, window_size)
         seconds_remaining = int(avg_seconds * count_remaining)
         return timedelta(seconds=seconds_remaining)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series.keys())
+
+    def snapshot(self) -> pl.DataFrame:
+        with self._lock:
+            rows = [
+                {
+                    "name": name,
+                    "count": series.count,
+                    "sum": series.sum,
+                    "min": series.min,
+                    "max": series.max,
+                    "p50": series.quantile(0.50),
+                    "p95": series.quantile(0.95),
+                    "p99": series.quantile(0.99),
+                }
+                for name, series in sorted(self._series.items())
+            ]
+
+        schema = {
+            "name": pl.Utf8,
+            "count": pl.Int64,
+            "sum": pl.Float64,
+            "min": pl.Float64,
+            "max": pl.Float64,
+            "p50": pl.Float64,
+            "p95": pl.Float64,
+            "p99": pl.Float64,
+        }
+
+        return pl.DataFrame(rows, schema=schema)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
@@ -1,2 +1,6 @@
 class NonRetryableException(Exception):
     """Raise for non-retryable exceptions"""
+
+
+class DataValidationException(NonRetryableException):
+    """Raise when a dataframe fails validation against its target table"""
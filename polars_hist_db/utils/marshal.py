@@ -1,11 +1,21 @@
 import base64
-from typing import Union, Optional, Literal, TypeAlias
+from datetime import datetime
+import json
+from typing import Any, Dict, Mapping, Tuple, Union, Optional, Literal, TypeAlias
 import zlib
 
 import polars as pl
 
 IpcCompression: TypeAlias = Literal["uncompressed", "lz4", "zstd", "zlib"]
 
+# nats headers of a binary arrow ipc message, the body is the ipc stream
+IPC_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+CONTENT_TYPE_HEADER = "Content-Type"
+INGEST_FN_HEADER = "Phdb-Ingest-Fn"
+INGEST_ARGS_HEADER = "Phdb-Ingest-Args"
+AUDIT_ID_HEADER = "Phdb-Audit-Id"
+CREATED_AT_HEADER = "Phdb-Created-At"
+
 
 def to_ipc_b64(df: pl.DataFrame, compression: Optional[IpcCompression] = None) -> bytes:
     if compression is None:
@@ -28,3 +38,44 @@ def from_ipc_b64(payload: Union[str, bytes], use_zlib: bool = False) -> pl.DataF
         decoded = zlib.decompress(decoded)
     df = pl.read_ipc_stream(decoded)
     return df
+
+
+def to_ipc_msg(
+    df: pl.DataFrame,
+    compression: Optional[IpcCompression] = None,
+    ingest_fn: Optional[str] = None,
+    ingest_args: Optional[Dict[str, Any]] = None,
+    audit_id: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+) -> Tuple[bytes, Dict[str, str]]:
+    """Serializes a dataframe to the body and headers of a binary nats message.
+
+    The body is an arrow ipc stream, with lz4 or zstd compressed buffers, and
+    the routing metadata is carried in the headers.
+    """
+    if compression == "zlib":
+        raise ValueError("zlib is not an ipc compression, use lz4 or zstd")
+
+    body = df.write_ipc_stream(None, compression=compression or "uncompressed")
+
+    headers = {CONTENT_TYPE_HEADER: IPC_CONTENT_TYPE}
+    if ingest_fn is not None:
+        headers[INGEST_FN_HEADER] = ingest_fn
+    if ingest_args is not None:
+        headers[INGEST_ARGS_HEADER] = json.dumps(ingest_args)
+    if audit_id is not None:
+        headers[AUDIT_ID_HEADER] = audit_id
+    if created_at is not None:
+        headers[CREATED_AT_HEADER] = created_at.isoformat()
+
+    return body.getvalue(), headers
+
+
+def is_ipc_msg(headers: Optional[Mapping[str, str]]) -> bool:
+    return headers is not None and headers.get(CONTENT_TYPE_HEADER) == IPC_CONTENT_TYPE
+
+
+def from_ipc_msg(data: bytes) -> pl.DataFrame:
+    # the ipc stream is read from the message buffer as is, compressed
+    # buffers are decompressed by the reader
+    return pl.read_ipc_stream(data)
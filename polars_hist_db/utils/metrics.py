@@ -0,0 +1,388 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+LOGGER = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# prometheus client defaults, extended for long-running sql statements
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+# temporary staging tables are named per use (tmp_<uuid>), so they share
+# one table label rather than adding a series for every statement
+STAGING_TABLE_LABEL = "<staging>"
+
+_CURRENT_DATASET: ContextVar[str] = ContextVar("metrics_dataset", default="")
+
+
+def current_dataset() -> str:
+    return _CURRENT_DATASET.get()
+
+
+@contextmanager
+def dataset_scope(dataset: str) -> Iterator[None]:
+    """Attributes metrics recorded in this context to a dataset."""
+    token = _CURRENT_DATASET.set(dataset)
+    try:
+        yield
+    finally:
+        _CURRENT_DATASET.reset(token)
+
+
+def table_label(table: str) -> str:
+    """The table label of a (schema qualified) table name."""
+    if table.rsplit(".", 1)[-1].startswith("tmp_"):
+        return STAGING_TABLE_LABEL
+
+    return table
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if len(names) == 0:
+        return ""
+
+    pairs = ",".join(
+        f'{n}="{_escape_label_value(v)}"' for n, v in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind: str
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(
+                f"metric {self.name} expects labels {self.labelnames}, "
+                f"got {tuple(labels.keys())}"
+            )
+
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    @abstractmethod
+    def _render_samples(self) -> List[str]: ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = dict()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("counters can only be incremented")
+
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = self._label_values(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in items
+        ]
+
+
+class _HistogramValues:
+    def __init__(self, num_buckets: int):
+        self.bucket_counts = [0] * num_buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        if "le" in self.labelnames:
+            raise ValueError("histograms cannot use the label 'le'")
+
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, _HistogramValues] = dict()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = _HistogramValues(len(self.buckets))
+                self._values[key] = values
+
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    values.bucket_counts[i] += 1
+                    break
+
+            values.count += 1
+            values.sum += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def count(self, **labels: str) -> int:
+        key = self._label_values(labels)
+        with self._lock:
+            values = self._values.get(key)
+            return 0 if values is None else values.count
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [
+                (k, list(v.bucket_counts), v.count, v.sum)
+                for k, v in sorted(self._values.items())
+            ]
+
+        bucket_labelnames = (*self.labelnames, "le")
+        lines = []
+        for key, bucket_counts, count, total in items:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    bucket_labelnames, (*key, _format_value(upper_bound))
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(bucket_labelnames, (*key, "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide registry of labelled metrics, in Prometheus text format.
+
+    Metrics are registered once with a fixed set of label names, so label
+    values (datasets, stages, statement kinds, tables) are the only source
+    of cardinality.
+    """
+
+    _borg: Dict[str, Any] = {}
+
+    _metrics: Dict[str, _Metric]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.__dict__ = self._borg
+        if "_metrics" not in self._borg:
+            self._borg["_metrics"] = dict()
+            self._borg["_lock"] = threading.Lock()
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str]
+    ) -> Counter:
+        metric = self._get_or_register(
+            name, lambda: Counter(name, documentation, labelnames), labelnames
+        )
+        assert isinstance(metric, Counter)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = self._get_or_register(
+            name,
+            lambda: Histogram(name, documentation, labelnames, buckets),
+            labelnames,
+        )
+        assert isinstance(metric, Histogram)
+        return metric
+
+    def _get_or_register(self, name: str, factory, labelnames: Sequence[str]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            elif metric.labelnames != tuple(labelnames):
+                raise ValueError(
+                    f"metric {name} already registered with labels {metric.labelnames}"
+                )
+
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+        for _name, metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Union[str, os.PathLike]) -> None:
+        """Atomically writes the registry, e.g. for the node_exporter textfile collector."""
+        path = os.fspath(path)
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=".metrics-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def start_http_server(
+        self, port: int, addr: str = "127.0.0.1"
+    ) -> ThreadingHTTPServer:
+        """Serves the registry on http://addr:port/metrics from a daemon thread."""
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                LOGGER.debug("metrics endpoint: %s", format % args)
+
+        server = ThreadingHTTPServer((addr, port), _Handler)
+        thread = threading.Thread(
+            target=server.serve_forever, name="metrics-http", daemon=True
+        )
+        thread.start()
+        LOGGER.info(
+            "serving metrics on http://%s:%d/metrics", addr, server.server_address[1]
+        )
+
+        return server
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+def sql_statement_seconds() -> Histogram:
+    return MetricsRegistry().histogram(
+        "polars_hist_db_sql_statement_seconds",
+        "Time spent executing sql statements.",
+        ["dataset", "statement", "table"],
+    )
+
+
+def stage_seconds() -> Histogram:
+    return MetricsRegistry().histogram(
+        "polars_hist_db_stage_seconds",
+        "Time spent in each pipeline stage.",
+        ["dataset", "stage", "table"],
+    )
+
+
+def stage_rows() -> Counter:
+    return MetricsRegistry().counter(
+        "polars_hist_db_stage_rows_total",
+        "Rows output by each pipeline stage.",
+        ["dataset", "stage", "table"],
+    )
+
+
+@contextmanager
+def timed_stage(stage: str, table: str = "") -> Iterator[None]:
+    """Times a pipeline stage, attributed to the current dataset."""
+    with stage_seconds().time(
+        dataset=current_dataset(), stage=stage, table=table_label(table)
+    ):
+        yield
+
+
+def add_stage_rows(stage: str, num_rows: int, table: str = "") -> None:
+    # drivers report a rowcount of -1 when it is unknown
+    if num_rows > 0:
+        stage_rows().inc(
+            num_rows, dataset=current_dataset(), stage=stage, table=table_label(table)
+        )
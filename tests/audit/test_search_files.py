@@ -5,7 +5,8 @@ import pytest
 import polars as pl
 import pytz
 
-from polars_hist_db.core import AuditOps
+from polars_hist_db.core import AuditLogTracker, AuditOps, TableOps
+from polars_hist_db.core.audit_log_tracker import DEFAULT_COMMIT_WINDOW_SECONDS
 from polars_hist_db.loaders import find_files
 from ..utils.dsv_helper import create_temp_file_tree, setup_fixture_dataset
 
@@ -136,3 +137,208 @@ def test_latest_entry(fixture_with_table):
         )
         assert len(audit_df) == 1
         assert audit_df["data_source_ts"].first().astimezone(pytz.utc) == ts[4]
+
+
+def test_add_entries(fixture_with_table):
+    engine, config = fixture_with_table
+    table_names = ["myapp_a", "myapp_b"]
+    table_schema = config.tables.schemas()[0]
+
+    aops = AuditOps(table_schema)
+    with engine.connect() as connection:
+        ts = [
+            datetime(2022, 1, 1, 3, 4, 5, tzinfo=pytz.utc) + timedelta(days=i)
+            for i in range(3)
+        ]
+        data_sources = [(f"file_{i}.csv", t) for i, t in enumerate(ts)]
+
+        num_inserted = aops.add_entries("dsv", data_sources, table_names, connection)
+        assert num_inserted == len(data_sources) * len(table_names)
+
+        assert aops.add_entries("dsv", [], table_names, connection) == 0
+
+        audit_df = aops.get_latest_entry(connection, data_source_type="dsv").filter(
+            pl.col("table_name").cast(pl.Utf8).is_in(table_names)
+        )
+        assert len(audit_df) == len(table_names)
+        assert all(t.astimezone(pytz.utc) == ts[-1] for t in audit_df["data_source_ts"])
+
+        aops.drop(connection)
+
+
+def test_create_indexes(fixture_with_table):
+    engine, config = fixture_with_table
+    table_schema = config.tables.schemas()[0]
+
+    aops = AuditOps(table_schema)
+    with engine.begin() as connection:
+        audit_tbl = aops.create(connection)
+        assert {ix.name for ix in audit_tbl.indexes} >= {
+            "ix_audit_table_data_source",
+            "ix_audit_table_data_source_ts",
+        }
+
+        # an audit table of an earlier version, without the indexes
+        connection.exec_driver_sql(
+            f"DROP INDEX ix_audit_table_data_source_ts ON {aops.fqtn()}"
+        )
+        TableOps(table_schema, audit_tbl.name, connection).invalidate_metadata()
+
+        # reflecting an existing table runs no DDL
+        audit_tbl = aops.create(connection)
+        assert "ix_audit_table_data_source_ts" not in {
+            ix.name for ix in audit_tbl.indexes
+        }
+
+        audit_tbl = aops.create_indexes(connection)
+        assert "ix_audit_table_data_source_ts" in {ix.name for ix in audit_tbl.indexes}
+
+        aops.drop(connection)
+
+
+@pytest.mark.parametrize("method", ["polars", "sql"])
+def test_filter_items(fixture_with_table, method):
+    engine, config = fixture_with_table
+    table_name = "myapp"
+    table_schema = config.tables.schemas()[0]
+
+    ts = [
+        datetime(2022, 1, 1, 3, 4, 5, tzinfo=pytz.utc) + timedelta(days=i)
+        for i in range(4)
+    ]
+    candidates_df = pl.DataFrame(
+        {
+            "__path": [f"file_{i}.csv" for i in range(4)],
+            "__created_at": ts,
+        },
+        schema_overrides={"__created_at": pl.Datetime("us", "UTC")},
+    )
+
+    aops = AuditOps(table_schema)
+    with engine.connect() as connection:
+        # nothing audited yet
+        df = aops.filter_items(
+            candidates_df, "__path", "__created_at", table_name, connection, method
+        )
+        assert df.equals(candidates_df)
+
+        aops.add_entries(
+            "dsv",
+            [("file_0.csv", ts[0]), ("file_2.csv", ts[2])],
+            [table_name],
+            connection,
+        )
+
+        # file_1 is older than the latest audited item, so it is skipped as well
+        df = aops.filter_items(
+            candidates_df, "__path", "__created_at", table_name, connection, method
+        )
+        assert df["__path"].to_list() == ["file_3.csv"]
+
+        aops.drop(connection)
+
+
+@pytest.mark.asyncio
+async def test_check_for_updates(fixture_with_table):
+    engine, config = fixture_with_table
+    table_name = "myapp"
+    table_schema = config.tables.schemas()[0]
+
+    ts = [
+        datetime(2022, 1, 1, 3, 4, 5, tzinfo=pytz.utc) + timedelta(days=i)
+        for i in range(3)
+    ]
+
+    callbacks = []
+
+    async def on_update(schema: str, table: str, timestamp: datetime):
+        callbacks.append((schema, table, timestamp))
+
+    tracker = AuditLogTracker()
+    tracker.clear_updates()
+    tracker.set_table_update_callback(on_update)
+
+    aops = AuditOps(table_schema)
+    with engine.connect() as connection:
+        # the later item is written first, it stays pending until its time comes
+        aops.add_entry("dsv", "file_2.csv", table_name, connection, ts[2])
+        aops.add_entry("dsv", "file_1.csv", table_name, connection, ts[1])
+
+        epoch_ms = int(ts[1].timestamp() * 1000)
+        await tracker.check_for_updates(epoch_ms, [table_schema], connection)
+        assert callbacks == [(table_schema, table_name, ts[1])]
+
+        # nothing new
+        await tracker.check_for_updates(epoch_ms, [table_schema], connection)
+        assert len(callbacks) == 1
+
+        epoch_ms = int(ts[2].timestamp() * 1000)
+        await tracker.check_for_updates(epoch_ms, [table_schema], connection)
+        assert callbacks[-1] == (table_schema, table_name, ts[2])
+        assert len(callbacks) == 2
+
+        aops.drop(connection)
+
+    tracker.clear_updates()
+
+
+@pytest.mark.asyncio
+async def test_check_for_updates_out_of_order_commits(fixture_with_table):
+    engine, config = fixture_with_table
+    table_schema = config.tables.schemas()[0]
+    ts = datetime(2022, 1, 1, 3, 4, 5, tzinfo=pytz.utc)
+
+    callbacks = []
+
+    async def on_update(schema: str, table: str, timestamp: datetime):
+        callbacks.append((schema, table, timestamp))
+
+    tracker = AuditLogTracker()
+    tracker.clear_updates()
+    tracker.set_table_update_callback(on_update)
+
+    aops = AuditOps(table_schema)
+    epoch_ms = int(ts.timestamp() * 1000)
+    with engine.connect() as slow_connection, engine.connect() as connection:
+        # the slow transaction holds the lower audit_id, but commits last
+        slow_connection.begin()
+        aops.add_entry("dsv", "file_a.csv", "table_a", slow_connection, ts)
+        aops.add_entry("dsv", "file_b.csv", "table_b", connection, ts)
+        connection.commit()
+
+        await tracker.check_for_updates(epoch_ms, [table_schema], connection)
+        assert callbacks == [(table_schema, "table_b", ts)]
+        connection.commit()
+
+        slow_connection.commit()
+        await tracker.check_for_updates(epoch_ms, [table_schema], connection)
+        assert callbacks[-1] == (table_schema, "table_a", ts)
+        assert len(callbacks) == 2
+
+        aops.drop(connection)
+        connection.commit()
+
+    tracker.clear_updates()
+
+
+def test_audit_watermark_holds_back_for_commit_window():
+    tracker = AuditLogTracker()
+    tracker.clear_updates()
+    tracker.set_commit_window(10.0)
+
+    tracker._advance_watermark("test", 5, None, now=100.0)
+    assert tracker.last_audit_ids["test"] == 0
+
+    tracker._advance_watermark("test", 8, None, now=105.0)
+    assert tracker.last_audit_ids["test"] == 0
+
+    # ids read at least a commit window ago are settled
+    tracker._advance_watermark("test", 9, None, now=110.0)
+    assert tracker.last_audit_ids["test"] == 5
+
+    # rows dated in the future still hold the watermark back
+    tracker._advance_watermark("test", 12, 7, now=130.0)
+    assert tracker.last_audit_ids["test"] == 6
+
+    tracker.set_commit_window(DEFAULT_COMMIT_WINDOW_SECONDS)
+    tracker.clear_updates()
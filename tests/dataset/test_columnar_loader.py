@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+
+from polars_hist_db.config import PolarsHistDbConfig
+from polars_hist_db.config.transform_fn_registry import TransformFnRegistry
+from polars_hist_db.loaders.dsv.columnar_loader import detect_file_format
+from polars_hist_db.loaders.dsv_input_source import DsvCrawlerInputSource
+from ..utils.dsv_helper import get_dataset_data, get_test_config
+
+from .helpers import custom_try_to_usd
+
+
+@pytest.mark.parametrize(
+    "filename, file_format, expected",
+    [
+        ("a.csv", "auto", "dsv"),
+        ("a.csv.gz", "auto", "dsv"),
+        ("a.PARQUET", "auto", "parquet"),
+        ("a.arrow", "auto", "ipc"),
+        ("a.jsonl", "auto", "ndjson"),
+        ("a.data", "parquet", "parquet"),
+    ],
+)
+def test_detect_file_format(filename, file_format, expected):
+    assert detect_file_format(Path(filename), file_format) == expected
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow", ".ndjson"])
+def test_load_columnar_file(tmp_path, suffix):
+    fn_reg = TransformFnRegistry()
+    fn_reg.register_function("try_to_usd", custom_try_to_usd, allow_overwrite=True)
+
+    config = PolarsHistDbConfig.from_yaml(get_test_config("foodprices.yaml"))
+    dataset = config.datasets["turkey_food_prices_dsv"]
+    csv_path = Path(get_dataset_data("turkey_food_prices.csv"))
+
+    # an unused column, which is not read
+    raw_df = pl.read_csv(csv_path).with_columns(unused=pl.lit("x"))
+    path = tmp_path / f"turkey_food_prices{suffix}"
+    match suffix:
+        case ".parquet":
+            raw_df.write_parquet(path)
+        case ".arrow":
+            raw_df.write_ipc(path)
+        case ".ndjson":
+            raw_df.write_ndjson(path)
+
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    expected = input_source._load_and_transform(csv_path)
+    result = input_source._load_and_transform(path)
+
+    assert "unused" not in result.columns
+    assert_frame_equal(result, expected, check_row_order=False)
@@ -0,0 +1,73 @@
+import polars as pl
+import pytest
+
+from polars_hist_db.config.parser_config import IngestionColumnConfig
+from polars_hist_db.loaders import load_typed_dsv, load_typed_dsv_batches
+from polars_hist_db.loaders.dsv.dsv_loader import _parse_header_row
+
+
+def _column(source: str, data_type: str) -> IngestionColumnConfig:
+    return IngestionColumnConfig(
+        column_type="data",
+        schema="test",
+        table="test",
+        ingestion_data_type=data_type,
+        target_data_type=data_type,
+        source=source,
+        target=source,
+    )
+
+
+@pytest.mark.parametrize(
+    "payload, delimiter, headers",
+    [
+        (b"a,b,c\n1,2,3\n", ",", ["a", "b", "c"]),
+        (b"a;b\r\n1;2\r\n", ";", ["a", "b"]),
+        (b'\xef\xbb\xbf"a|1"|b\n', "|", ["a|1", "b"]),
+        (b"a:b", ":", ["a", "b"]),
+    ],
+)
+def test_parse_header_row(payload, delimiter, headers):
+    assert _parse_header_row(payload, None) == (delimiter, headers)
+
+
+def test_parse_header_row_single_column():
+    assert _parse_header_row(b"a\n1\n", ",") == (",", ["a"])
+
+    with pytest.raises(ValueError):
+        _parse_header_row(b"a\n1\n", None)
+
+
+def test_load_typed_dsv_schema():
+    columns = [_column("id", "INT"), _column("name", "VARCHAR(8)")]
+
+    df = load_typed_dsv(b"id;name;unused\n1;x;a\n2;;b\n1;x;c\n", columns)
+
+    df = df.select("id", "name").sort("id")
+    assert df.schema == pl.Schema({"id": pl.Int64, "name": pl.Utf8})
+    assert df.rows() == [(1, "x"), (2, None)]
+
+
+def test_load_typed_dsv_falls_back_to_inference():
+    columns = [_column("id", "INT"), _column("price", "DOUBLE")]
+
+    df = load_typed_dsv(b"id,price\n1.0,1.5\n2.0,2\n", columns)
+
+    assert df.select("id", "price").rows() == [(1.0, 1.5), (2.0, 2.0)]
+
+
+def test_load_typed_dsv_batches_falls_back_after_first_chunk(tmp_path):
+    columns = [_column("id", "INT"), _column("price", "DOUBLE")]
+    rows = [f"{i},{i}.5" for i in range(10_000)]
+    rows[9_990] = "9990.5,9990.5"
+    path = tmp_path / "prices.csv"
+    path.write_text("id,price\n" + "\n".join(rows) + "\n")
+
+    batches = list(load_typed_dsv_batches(path, columns, chunk_rows=1000))
+
+    # the first chunks were read with the configured types
+    assert batches[0].schema["id"] == pl.Int64
+    assert batches[-1].schema["id"] == pl.Float64
+    df = pl.concat([b.select(pl.col("id").cast(pl.Float64), "price") for b in batches])
+    assert len(df) == 10_000
+    assert df["id"].to_list() == [i + 0.5 if i == 9_990 else i for i in range(10_000)]
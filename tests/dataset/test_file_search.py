@@ -0,0 +1,113 @@
+from datetime import datetime
+import os
+
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+import pytz
+
+from polars_hist_db.loaders import find_files
+from polars_hist_db.loaders.dsv.file_manifest import glob_to_regex, scan_with_manifest
+from ..utils.dsv_helper import create_temp_file_tree
+
+
+@pytest.fixture
+def fixture_with_tmpdir():
+    tmpDir = create_temp_file_tree(4, 3, 5)
+    yield tmpDir
+    tmpDir.cleanup()
+
+
+def _search_spec(root_path: str, **kwargs) -> pl.DataFrame:
+    return pl.from_records(
+        [
+            {
+                "root_path": root_path,
+                "file_include": ["*.log", "*.bin"],
+                "timestamp": {"method": "mtime"},
+                "is_enabled": True,
+                "max_depth": 4,
+                "dir_include": [],
+                "dir_exclude": [],
+                "file_exclude": ["file1.*"],
+                **kwargs,
+            },
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern, matches, non_matches",
+    [
+        ("*.csv", ["a.csv", "b/c.csv"], ["a.csv.gz", "csv"]),
+        ("file?.[ct]sv", ["file1.csv", "file2.tsv"], ["file10.csv", "file1.psv"]),
+        ("[!a]*", ["b.csv"], ["a.csv"]),
+        ("a+b(1).csv", ["a+b(1).csv"], ["aab1.csv"]),
+    ],
+)
+def test_glob_to_regex(pattern, matches, non_matches):
+    regex = glob_to_regex(pattern)
+    s = pl.Series(matches + non_matches)
+    assert s.str.contains(regex).to_list() == [True] * len(matches) + [False] * len(
+        non_matches
+    )
+
+
+def test_find_files_with_manifest(fixture_with_tmpdir, tmp_path):
+    root_path = fixture_with_tmpdir.name
+    manifest_path = str(tmp_path / "manifest.parquet")
+
+    expected = find_files(_search_spec(root_path))
+    assert not expected.is_empty()
+
+    for _ in range(2):
+        df = find_files(_search_spec(root_path, manifest_path=manifest_path))
+        assert_frame_equal(df.sort("__path"), expected.sort("__path"))
+        assert os.path.exists(manifest_path)
+
+    # a new file changes the mtime of its directory
+    new_file = os.path.join(root_path, "dir0", "dir0", "new.log")
+    open(new_file, "wb").close()
+
+    df = find_files(_search_spec(root_path, manifest_path=manifest_path))
+    assert len(df) == len(expected) + 1
+    assert os.path.normpath(new_file) in df["__path"].to_list()
+
+
+def test_scan_with_manifest_filters(fixture_with_tmpdir, tmp_path):
+    root_path = fixture_with_tmpdir.name
+    manifest_path = str(tmp_path / "manifest.parquet")
+
+    df = scan_with_manifest(
+        root_path, manifest_path, ["*.txt"], max_depth=2, dir_exclude=["dir1"]
+    )
+
+    dirs = df["path"].str.split("/").list.first().unique().sort().to_list()
+    assert dirs == ["dir0", "dir2"]
+    assert df["path"].str.count_matches("/").max() == 1
+    assert df.schema == pl.Schema({"path": pl.Utf8, "mtime": pl.Datetime("us", "UTC")})
+
+
+def test_find_files_regex_timestamp(tmp_path):
+    source_tz = pytz.timezone("US/Pacific")
+    for name in ["a_20230101T120000.csv", "b_20231105T013000.csv"]:
+        open(tmp_path / name, "wb").close()
+
+    df = find_files(
+        _search_spec(
+            str(tmp_path),
+            file_include=["*.csv"],
+            file_exclude=[],
+            timestamp={
+                "method": "regex",
+                "source_tz": str(source_tz),
+                "datetime_regex": r".*_(?P<y>\d{4})(?P<m>\d\d)(?P<d>\d\d)T(?P<H>\d\d)(?P<M>\d\d)(?P<S>\d\d)\.csv",
+            },
+        )
+    )
+
+    # 01:30 happens twice on 2023-11-05, pytz picks standard time
+    assert df["__created_at"].to_list() == [
+        source_tz.localize(datetime(2023, 1, 1, 12)).astimezone(pytz.utc),
+        source_tz.localize(datetime(2023, 11, 5, 1, 30)).astimezone(pytz.utc),
+    ]
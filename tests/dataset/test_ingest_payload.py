@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+import io
+import json
+from typing import Dict, List, Optional
+
+from nats.aio.msg import Msg
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+import pytz
+
+from polars_hist_db.config import IngestFnRegistry
+from polars_hist_db.config.input.jetstream_config import JetstreamIngestConfig
+from polars_hist_db.loaders.ingest_payload import load_df_from_msgs
+from polars_hist_db.utils import from_ipc_msg, to_ipc_msg
+
+from .helpers import custom_load_json
+
+
+TS = datetime(2024, 1, 2, 3, 4, 5, tzinfo=pytz.utc)
+
+
+def _msgs(
+    payloads: List[bytes], headers: Optional[List[Dict[str, str]]] = None
+) -> List[Msg]:
+    return [
+        Msg(
+            _client=None,  # type: ignore[arg-type]
+            subject="turkey",
+            reply=f"$JS.ACK.turkey_stream.consumer.1.{seq}.{seq}.1700000000000000000.0",
+            data=payload,
+            headers=None if headers is None else headers[seq - 10],
+        )
+        for seq, payload in enumerate(payloads, start=10)
+    ]
+
+
+def _ipc(df: pl.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.write_ipc_stream(buf, compression="zstd")
+    return buf.getvalue()
+
+
+def test_ndjson_batch():
+    msgs = _msgs([b'{"a": 1}\n{"a": 2}\n', b"", b'{"a": 3, "b": "x"}'])
+    df = load_df_from_msgs(msgs, TS, JetstreamIngestConfig(fn_name="ndjson"))
+
+    expected = pl.DataFrame(
+        {
+            "a": [1, 2, 3],
+            "b": [None, None, "x"],
+            "__path": ["turkey_stream:10", "turkey_stream:10", "turkey_stream:12"],
+            "__created_at": [TS] * 3,
+        }
+    )
+    assert_frame_equal(df, expected)
+
+
+def test_ndjson_batch_blank_lines():
+    msgs = _msgs([b'{"a": 1}\n\n{"a": 2}', b"\n \r\n", b'\r\n{"a": 3}\r\n'])
+    df = load_df_from_msgs(msgs, TS, JetstreamIngestConfig(fn_name="ndjson"))
+
+    assert df["a"].to_list() == [1, 2, 3]
+    assert df["__path"].to_list() == [
+        "turkey_stream:10",
+        "turkey_stream:10",
+        "turkey_stream:12",
+    ]
+
+
+def test_arrow_ipc_batch():
+    frames = [pl.DataFrame({"a": [1, 2]}), pl.DataFrame({"a": [3]})]
+    msgs = _msgs([_ipc(f) for f in frames])
+    df = load_df_from_msgs(msgs, TS, JetstreamIngestConfig(fn_name="arrow_ipc"))
+
+    assert df["a"].to_list() == [1, 2, 3]
+    assert df["__path"].to_list() == [
+        "turkey_stream:10",
+        "turkey_stream:10",
+        "turkey_stream:11",
+    ]
+
+
+def test_arrow_ipc_batch_mixed_schemas():
+    frames = [
+        pl.DataFrame({"a": [1, 2]}),
+        pl.DataFrame({"a": [3.5], "b": ["x"]}),
+    ]
+    msgs = _msgs([_ipc(f) for f in frames])
+    df = load_df_from_msgs(msgs, TS, JetstreamIngestConfig(fn_name="arrow_ipc"))
+
+    assert df["a"].to_list() == [1.0, 2.0, 3.5]
+    assert df["b"].to_list() == [None, None, "x"]
+    assert df["__path"].to_list() == [
+        "turkey_stream:10",
+        "turkey_stream:10",
+        "turkey_stream:11",
+    ]
+
+
+def test_per_message_fallback():
+    fn_reg = IngestFnRegistry()
+    fn_reg.register_function("test_load_json", custom_load_json, allow_overwrite=True)
+
+    payloads = [
+        json.dumps({"fn_loader_args": {"msg_counter": i}, "value": i}).encode()
+        for i in range(3)
+    ]
+    try:
+        df = load_df_from_msgs(
+            _msgs(payloads), TS, JetstreamIngestConfig(fn_name="test_load_json")
+        )
+    finally:
+        fn_reg.delete_function("test_load_json")
+
+    assert not fn_reg.is_batch_function("test_load_json")
+    assert df["__path"].unique().len() == 3
+
+
+def test_register_batch_function():
+    fn_reg = IngestFnRegistry()
+    assert {"ndjson", "arrow_ipc"} <= set(fn_reg.list_functions())
+
+    with pytest.raises(ValueError):
+        fn_reg.register_batch_function("ndjson", lambda payloads, ts, args: None)  # type: ignore[arg-type,return-value]
+
+    fn_reg.register_batch_function(
+        "test_none",
+        lambda payloads, ts, args: None,  # type: ignore[arg-type,return-value]
+    )
+    try:
+        with pytest.raises(ValueError):
+            load_df_from_msgs(
+                _msgs([b"x"]), TS, JetstreamIngestConfig(fn_name="test_none")
+            )
+    finally:
+        fn_reg.delete_function("test_none")
+
+
+@pytest.mark.parametrize("compression", ["uncompressed", "lz4", "zstd"])
+def test_ipc_msg_roundtrip(compression):
+    df = pl.DataFrame({"a": [1, 2], "b": ["x", None]})
+    body, headers = to_ipc_msg(df, compression=compression, audit_id="file_1")
+
+    assert headers == {
+        "Content-Type": "application/vnd.apache.arrow.stream",
+        "Phdb-Audit-Id": "file_1",
+    }
+    assert_frame_equal(from_ipc_msg(body), df)
+
+
+def test_ipc_msg_envelope():
+    created_at = TS - timedelta(hours=1)
+    msgs = [
+        to_ipc_msg(pl.DataFrame({"a": [1, 2]}), "zstd", audit_id="file_1"),
+        to_ipc_msg(pl.DataFrame({"a": [3]}), created_at=created_at),
+    ]
+    bodies = [body for body, _ in msgs]
+    headers = [h for _, h in msgs]
+
+    expected = pl.DataFrame(
+        {
+            "a": [1, 2, 3],
+            "__path": ["file_1", "file_1", "turkey_stream:11"],
+            "__created_at": [TS, TS, created_at],
+        }
+    )
+
+    # decoded per message, or in bulk by the arrow_ipc batch function
+    for fn_name in ["ingest_turkey_json", "arrow_ipc"]:
+        df = load_df_from_msgs(
+            _msgs(bodies, headers), TS, JetstreamIngestConfig(fn_name=fn_name)
+        )
+        assert_frame_equal(df, expected)
+
+
+def test_ipc_msg_routed_to_ingest_fn():
+    def double(payload: pl.DataFrame, ts: datetime, args) -> pl.DataFrame:
+        return payload.with_columns(pl.col("a") * args["factor"])
+
+    fn_reg = IngestFnRegistry()
+    fn_reg.register_function("test_double", double, allow_overwrite=True)
+    body, headers = to_ipc_msg(
+        pl.DataFrame({"a": [1, 2]}), ingest_fn="test_double", ingest_args={"factor": 3}
+    )
+    try:
+        df = load_df_from_msgs(
+            _msgs([body], [headers]), TS, JetstreamIngestConfig(fn_name="unused")
+        )
+    finally:
+        fn_reg.delete_function("test_double")
+
+    assert df["a"].to_list() == [3, 6]
+    assert df["__path"].to_list() == ["turkey_stream:10"] * 2
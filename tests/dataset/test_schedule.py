@@ -0,0 +1,166 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from polars_hist_db.config import TableConfigs
+from polars_hist_db.dataset import entrypoint
+from polars_hist_db.dataset.schedule import (
+    DatasetRun,
+    dataset_dependencies,
+    dataset_sorter,
+    default_concurrency,
+)
+
+
+def _table(name: str, *parents: str):
+    return {
+        "name": name,
+        "schema": "test",
+        "columns": [{"name": "id", "data_type": "INT"}],
+        "foreign_keys": [
+            {
+                "name": f"id_{p}",
+                "references": {"schema": "test", "table": p, "column": "id"},
+            }
+            for p in parents
+        ],
+    }
+
+
+TABLES = TableConfigs(
+    items=[
+        _table("country"),
+        _table("currency"),
+        _table("price", "country", "currency"),
+        _table("weather"),
+        _table("stats"),
+    ]
+)
+
+
+def _dataset(name: str, *table_names: str):
+    return SimpleNamespace(
+        name=name,
+        pipeline=SimpleNamespace(get_table_names=lambda: list(table_names)),
+    )
+
+
+DATASETS = [
+    _dataset("prices", "price", "stats"),
+    _dataset("countries", "country"),
+    _dataset("currencies", "currency"),
+    _dataset("weather", "weather", "stats"),
+    _dataset("holidays", "country"),
+]
+
+
+def test_dataset_dependencies():
+    deps = dataset_dependencies(DATASETS, TABLES)  # type: ignore[arg-type]
+
+    assert deps == {
+        "prices": {"countries", "currencies", "holidays"},
+        "countries": set(),
+        "currencies": set(),
+        # writes stats after prices, in configuration order
+        "weather": {"prices"},
+        "holidays": {"countries"},
+    }
+
+
+def test_dataset_dependency_cycle():
+    tables = TableConfigs(items=[_table("a", "b"), _table("b", "a")])
+    datasets = [_dataset("a", "a"), _dataset("b", "b")]
+
+    with pytest.raises(ValueError):
+        dataset_sorter(dataset_dependencies(datasets, tables))  # type: ignore[arg-type]
+
+
+def test_default_concurrency():
+    engine = create_engine(
+        "sqlite://", poolclass=QueuePool, pool_size=8, max_overflow=3
+    )
+    assert default_concurrency(engine) == 4
+
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1)
+    assert default_concurrency(engine) == 1
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2, 5])
+def test_run_datasets_schedule(monkeypatch, max_concurrency):
+    started: List[str] = []
+    finished: List[str] = []
+    num_running = 0
+    max_running = 0
+
+    async def fake_run_dataset(input_config, dataset, *args, **kwargs):
+        nonlocal num_running, max_running
+        started.append(dataset.name)
+        num_running += 1
+        max_running = max(max_running, num_running)
+        await asyncio.sleep(0.01)
+        num_running -= 1
+        finished.append(dataset.name)
+        return DatasetRun(dataset.name, 0.01, 1, 10)
+
+    monkeypatch.setattr(entrypoint, "_run_dataset", fake_run_dataset)
+    monkeypatch.setattr(entrypoint, "_create_config_tables", lambda *args: None)
+
+    config = SimpleNamespace(
+        datasets=SimpleNamespace(
+            datasets=[SimpleNamespace(**vars(ds), input_config=None) for ds in DATASETS]
+        ),
+        tables=TABLES,
+    )
+    asyncio.run(
+        entrypoint.run_datasets(
+            config,  # type: ignore[arg-type]
+            None,  # type: ignore[arg-type]
+            max_concurrency=max_concurrency,
+        )
+    )
+
+    assert sorted(finished) == sorted(ds.name for ds in DATASETS)
+    # countries and currencies are the only datasets without dependencies
+    assert max_running == min(max_concurrency, 2)
+    deps = dataset_dependencies(DATASETS, TABLES)  # type: ignore[arg-type]
+    for name, parents in deps.items():
+        assert all(finished.index(p) < started.index(name) for p in parents)
+
+
+def test_run_datasets_reports_failures(monkeypatch):
+    started: List[str] = []
+
+    async def fake_run_dataset(input_config, dataset, *args, **kwargs):
+        started.append(dataset.name)
+        await asyncio.sleep(0.01)
+        if dataset.name == "countries":
+            return DatasetRun(dataset.name, error=RuntimeError("boom"))
+
+        return DatasetRun(dataset.name, 0.01, 1, 10)
+
+    monkeypatch.setattr(entrypoint, "_run_dataset", fake_run_dataset)
+    monkeypatch.setattr(entrypoint, "_create_config_tables", lambda *args: None)
+
+    config = SimpleNamespace(
+        datasets=SimpleNamespace(
+            datasets=[SimpleNamespace(**vars(ds), input_config=None) for ds in DATASETS]
+        ),
+        tables=TABLES,
+    )
+    with pytest.raises(RuntimeError, match="countries") as e:
+        asyncio.run(
+            entrypoint.run_datasets(
+                config,  # type: ignore[arg-type]
+                None,  # type: ignore[arg-type]
+                max_concurrency=2,
+            )
+        )
+
+    # the dependents of countries are skipped (weather waits on prices), the
+    # others still run
+    assert sorted(started) == ["countries", "currencies"]
+    assert "skipped: prices, weather, holidays" in str(e.value)
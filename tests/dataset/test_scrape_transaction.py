@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from polars_hist_db.dataset import scrape
+from polars_hist_db.dataset.scrape import retry_delay, try_run_pipeline_as_transaction
+from polars_hist_db.utils import NonRetryableException
+
+
+def test_retry_delay():
+    for attempt, max_delay in [(0, 2.0), (1, 4.0), (2, 8.0), (5, 10.0)]:
+        for _ in range(100):
+            delay = retry_delay(attempt, 2.0, 10.0)
+            assert max_delay / 2 <= delay <= max_delay
+
+
+@pytest.mark.parametrize("is_async_commit_fn", [False, True])
+def test_transaction_runs_off_event_loop(monkeypatch, is_async_commit_fn):
+    attempts = []
+    commit_threads = []
+
+    def fake_transaction(
+        partitions, dataset, tables, engine, commit_fn, delta_table_config
+    ):
+        attempts.append(threading.current_thread())
+        time.sleep(0.2)
+        if len(attempts) < 3:
+            raise RuntimeError("deadlock")
+
+        return commit_fn(None, [("schema", "table")])
+
+    def sync_commit_fn(connection, modified_tables):
+        commit_threads.append(threading.current_thread())
+        assert modified_tables == [("schema", "table")]
+        return True
+
+    async def async_commit_fn(connection, modified_tables):
+        return sync_commit_fn(connection, modified_tables)
+
+    commit_fn = async_commit_fn if is_async_commit_fn else sync_commit_fn
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.ensure_future(ticker())
+        await try_run_pipeline_as_transaction(
+            [],
+            None,  # type: ignore[arg-type]
+            None,  # type: ignore[arg-type]
+            None,  # type: ignore[arg-type]
+            commit_fn,
+            seconds_between_retries=0.01,
+        )
+        ticker_task.cancel()
+        return ticks
+
+    monkeypatch.setattr(scrape, "_run_pipeline_transaction", fake_transaction)
+    ticks = asyncio.run(run())
+
+    assert len(attempts) == 3
+    assert all(t is not threading.main_thread() for t in attempts)
+    # the database work of commit_fn stays in the worker thread, unless it is
+    # async and needs the event loop
+    if is_async_commit_fn:
+        assert commit_threads == [threading.main_thread()]
+    else:
+        assert commit_threads == [attempts[-1]]
+    # the event loop kept running while the transactions blocked
+    assert ticks > 30
+
+
+@pytest.mark.parametrize(
+    "error, num_attempts",
+    [(RuntimeError("deadlock"), 2), (NonRetryableException("audit"), 1)],
+)
+def test_transaction_raises_when_retries_exhausted(monkeypatch, error, num_attempts):
+    attempts = []
+
+    def fake_transaction(*args):
+        attempts.append(1)
+        raise error
+
+    async def commit_fn(connection, modified_tables):
+        return True
+
+    monkeypatch.setattr(scrape, "_run_pipeline_transaction", fake_transaction)
+    with pytest.raises(type(error)):
+        asyncio.run(
+            try_run_pipeline_as_transaction(
+                [],
+                None,  # type: ignore[arg-type]
+                None,  # type: ignore[arg-type]
+                None,  # type: ignore[arg-type]
+                commit_fn,
+                num_retries=2,
+                seconds_between_retries=0.01,
+            )
+        )
+
+    assert len(attempts) == num_attempts
+
+
+def test_transaction_raises_when_never_committed(monkeypatch):
+    attempts = []
+    delays = []
+
+    def fake_transaction(
+        partitions, dataset, tables, engine, commit_fn, delta_table_config
+    ):
+        attempts.append(1)
+        return commit_fn(None, [])
+
+    def commit_fn(connection, modified_tables):
+        return False
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(scrape, "_run_pipeline_transaction", fake_transaction)
+    monkeypatch.setattr(scrape.asyncio, "sleep", fake_sleep)
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            try_run_pipeline_as_transaction(
+                [],
+                None,  # type: ignore[arg-type]
+                None,  # type: ignore[arg-type]
+                None,  # type: ignore[arg-type]
+                commit_fn,
+                num_retries=3,
+                seconds_between_retries=1.0,
+            )
+        )
+
+    assert len(attempts) == 3
+    # backs off between attempts, not after the last one
+    assert len(delays) == 2
+    assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
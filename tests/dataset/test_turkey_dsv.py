@@ -1,15 +1,20 @@
 from datetime import datetime, timedelta
+from pathlib import Path
 import pytest
 import polars as pl
 from polars.testing import assert_frame_equal
 from decimal import Decimal
 
+from polars_hist_db.config import PolarsHistDbConfig
 from polars_hist_db.config.transform_fn_registry import TransformFnRegistry
 from polars_hist_db.dataset import run_datasets
 from polars_hist_db.core.dataframe import DataframeOps, TimeHint
+from polars_hist_db.loaders.dsv_input_source import DsvCrawlerInputSource
 from polars_hist_db.utils import compare_dataframes
 from ..utils.dsv_helper import (
     from_test_result,
+    get_dataset_data,
+    get_test_config,
     setup_fixture_dataset,
 )
 
@@ -25,8 +30,18 @@ def fixture_with_config():
 
 
 @pytest.mark.asyncio
-async def test_load_file(fixture_with_config):
+@pytest.mark.parametrize("max_chunk_bytes", [None, 32 * 1024])
+@pytest.mark.parametrize("partition_load", ["per_partition", "bucketed"])
+@pytest.mark.parametrize("change_detection", ["intersect", "row_hash"])
+async def test_load_file(
+    fixture_with_config, max_chunk_bytes, partition_load, change_detection
+):
     engine, base_config = fixture_with_config
+    dataset = base_config.datasets["turkey_food_prices_dsv"]
+    dataset.delta_config.partition_load = partition_load
+    dataset.delta_config.change_detection = change_detection
+    input_config = dataset.input_config
+    input_config.max_chunk_bytes = max_chunk_bytes
 
     uploaded_dfs = []
     await run_datasets(
@@ -407,3 +422,102 @@ async def test_load_file(fixture_with_config):
     assert food_prices_all_df["um_id"].sum() == 32177
 
     assert True
+
+
+def test_chunked_partitions_match_whole_file():
+    fn_reg = TransformFnRegistry()
+    fn_reg.register_function("try_to_usd", custom_try_to_usd, allow_overwrite=True)
+
+    config = PolarsHistDbConfig.from_yaml(get_test_config("foodprices.yaml"))
+    dataset = config.datasets["turkey_food_prices_dsv"]
+    path = Path(get_dataset_data("turkey_food_prices.csv"))
+    payload_time = datetime(2020, 1, 1)
+
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    expected = input_source._process_payload(path, payload_time)
+
+    dataset.input_config.max_chunk_bytes = 32 * 1024
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    chunks = list(input_source._process_file_chunks(path, payload_time))
+    result = [partition for chunk in chunks for partition in chunk]
+
+    assert len(chunks) > 1
+    assert [ts for ts, _ in result] == [ts for ts, _ in expected]
+    for (_, expected_df), (_, result_df) in zip(expected, result):
+        assert_frame_equal(
+            result_df, expected_df, check_row_order=False, check_column_order=False
+        )
+
+
+@pytest.mark.asyncio
+async def test_prefetch_files_preserves_order():
+    fn_reg = TransformFnRegistry()
+    fn_reg.register_function("try_to_usd", custom_try_to_usd, allow_overwrite=True)
+
+    config = PolarsHistDbConfig.from_yaml(get_test_config("foodprices.yaml"))
+    dataset = config.datasets["turkey_food_prices_dsv"]
+    path = Path(get_dataset_data("turkey_food_prices.csv"))
+    files = [(path, datetime(2020, 1, day)) for day in range(1, 6)]
+
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    expected = input_source._load_and_transform(path)
+
+    dataset.input_config.prefetch_files = 2
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    result = [item async for item in input_source._prefetch_files(files)]
+
+    assert [(p, t) for p, t, _ in result] == files
+    for _, _, df in result:
+        assert df is not None
+        assert_frame_equal(df, expected)
+
+    # files streamed in chunks are left to the consumer
+    dataset.input_config.max_chunk_bytes = 32 * 1024
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    result = [item async for item in input_source._prefetch_files(files)]
+    assert [(p, t) for p, t, _ in result] == files
+    assert all(df is None for _, _, df in result)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "batch_max_rows, expected_batches", [(None, [1, 1, 1]), (10**9, [3])]
+)
+async def test_batch_files_into_transactions(
+    monkeypatch, batch_max_rows, expected_batches
+):
+    fn_reg = TransformFnRegistry()
+    fn_reg.register_function("try_to_usd", custom_try_to_usd, allow_overwrite=True)
+
+    config = PolarsHistDbConfig.from_yaml(get_test_config("foodprices.yaml"))
+    dataset = config.datasets["turkey_food_prices_dsv"]
+    dataset.input_config.batch_max_rows = batch_max_rows
+    path = Path(get_dataset_data("turkey_food_prices.csv")).absolute()
+    files_df = pl.DataFrame(
+        {
+            "__path": [path.as_posix()] * 3,
+            "__created_at": [datetime(2020, 1, day) for day in range(1, 4)],
+        }
+    )
+
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    expected = input_source._process_payload(path, datetime(2020, 1, 1))
+
+    audited = []
+
+    def add_audit_entries(data_source_type, data_sources, modified_tables, connection):
+        audited.append(list(data_sources))
+        return True
+
+    monkeypatch.setattr(input_source, "files", lambda: files_df)
+    monkeypatch.setattr(input_source, "_search_and_filter_files", lambda df, *args: df)
+    monkeypatch.setattr(input_source, "_add_audit_entries", add_audit_entries)
+
+    num_partitions = []
+    async for partitions, commit_fn in await input_source.next_df(None):
+        num_partitions.append(len(partitions))
+        commit_fn(None, [])
+
+    assert [len(files) for files in audited] == expected_batches
+    assert [f for files in audited for f in files] == list(files_df.rows())
+    assert num_partitions == [len(expected) * n for n in expected_batches]
@@ -0,0 +1,123 @@
+import gzip
+import os
+from pathlib import Path
+import zipfile
+
+import polars as pl
+from polars.testing import assert_frame_equal
+import pytest
+
+from polars_hist_db.config import PolarsHistDbConfig
+from polars_hist_db.config.transform_fn_registry import TransformFnRegistry
+from polars_hist_db.loaders.dsv.ziptools import (
+    _iter_csv_blocks,
+    convert_single_zipped_csv_to_parquet,
+    read_zipfile,
+)
+from polars_hist_db.loaders.dsv_input_source import DsvCrawlerInputSource
+from ..utils.dsv_helper import get_dataset_data, get_test_config
+
+from .helpers import custom_try_to_usd
+
+
+def _write_zip(path: Path, members) -> str:
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, content in members:
+            zf.writestr(name, content)
+    return str(path)
+
+
+def test_iter_csv_blocks_splits_outside_quotes(tmp_path):
+    csv = b'a,b\n1,"x\ny"\n2,"say ""hi"""\n3,z\n'
+    path = tmp_path / "test.csv"
+    path.write_bytes(csv)
+
+    with open(path, "rb") as f:
+        blocks = list(_iter_csv_blocks(f, 4))
+
+    assert len(blocks) > 1
+    assert all(b.startswith(b"a,b\n") for b in blocks)
+    df = pl.concat([pl.read_csv(b) for b in blocks])
+    assert_frame_equal(df, pl.read_csv(csv))
+
+
+def test_convert_zipped_csv_to_parquet(tmp_path):
+    df = pl.DataFrame(
+        {
+            "id": range(2000),
+            "name": [
+                f'"n{i % 7}"\n' if i % 3 == 0 else f"n{i % 5}" for i in range(2000)
+            ],
+            "price": [i / 4 for i in range(2000)],
+        }
+    )
+    zip_path = _write_zip(
+        tmp_path / "prices.zip",
+        [("a.csv", df.write_csv()), ("b.csv", df.head(10).write_csv())],
+    )
+    schema = {"id": pl.Int32()}
+
+    assert convert_single_zipped_csv_to_parquet(
+        zip_path, schema, False, block_bytes=1024, row_group_rows=500
+    )
+
+    result = pl.read_parquet(tmp_path / "prices.parquet")
+    assert_frame_equal(result, read_zipfile(zip_path, schema), categorical_as_str=True)
+    assert result.schema["name"] == pl.Categorical
+
+    # up to date, so skipped
+    assert not convert_single_zipped_csv_to_parquet(zip_path, schema, True)
+    assert os.path.exists(zip_path)
+
+
+def test_convert_zipped_csv_with_widening_dtypes(tmp_path):
+    # ints in the first blocks, floats and text further down
+    df = pl.DataFrame(
+        {
+            "id": range(1000),
+            "price": [str(i) for i in range(900)] + [f"{i}.5" for i in range(100)],
+            "code": [str(i) for i in range(950)] + ["x"] * 50,
+        }
+    )
+    zip_path = _write_zip(tmp_path / "prices.zip", [("a.csv", df.write_csv())])
+
+    assert convert_single_zipped_csv_to_parquet(
+        zip_path, {}, False, block_bytes=1024, row_group_rows=500
+    )
+
+    result = pl.read_parquet(tmp_path / "prices.parquet")
+    assert len(result) == 1000
+    assert result.schema["price"] == pl.Float64
+    assert result["price"].tail(1).item() == 99.5
+    assert result["code"].cast(pl.Utf8).to_list() == df["code"].to_list()
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".gz"])
+def test_load_archive(tmp_path, suffix):
+    fn_reg = TransformFnRegistry()
+    fn_reg.register_function("try_to_usd", custom_try_to_usd, allow_overwrite=True)
+
+    config = PolarsHistDbConfig.from_yaml(get_test_config("foodprices.yaml"))
+    dataset = config.datasets["turkey_food_prices_dsv"]
+    csv_path = Path(get_dataset_data("turkey_food_prices.csv"))
+    content = csv_path.read_bytes()
+
+    archive_path = tmp_path / f"turkey_food_prices.csv{suffix}"
+    if suffix == ".zip":
+        lines = content.splitlines(keepends=True)
+        half = len(lines) // 2
+        _write_zip(
+            archive_path,
+            [
+                ("part1.csv", b"".join(lines[:half])),
+                ("part2.csv", lines[0] + b"".join(lines[half:])),
+            ],
+        )
+    else:
+        archive_path.write_bytes(gzip.compress(content))
+
+    input_source = DsvCrawlerInputSource(config.tables, dataset, dataset.input_config)
+    expected = input_source._load_and_transform(csv_path)
+    result = input_source._load_and_transform(archive_path)
+
+    assert_frame_equal(result, expected, check_row_order=False)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+import threading
+
+import pytest
+
+from polars_hist_db.utils import Clock
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    clock.reset()
+    yield clock
+    clock.reset()
+
+
+def test_get_avg_and_eta(clock):
+    assert clock.get_avg("pipeline") == 0.0
+    assert clock.eta("pipeline", 10) == timedelta(0)
+
+    for t in [10.0, 1.0, 2.0, 3.0]:
+        clock.add_timing("pipeline", t)
+
+    assert clock.get_avg("pipeline", window_size=3) == pytest.approx(2.0)
+    assert clock.get_avg("pipeline", window_size=100) == pytest.approx(4.0)
+    assert clock.eta("pipeline", 10, window_size=3) == timedelta(seconds=20)
+
+
+def test_window_is_bounded(clock):
+    for i in range(Clock.window_capacity * 3):
+        clock.add_timing("sql", float(i))
+
+    last = Clock.window_capacity * 3 - 1
+    assert clock.get_avg("sql", window_size=1) == float(last)
+    assert clock.get_avg("sql", window_size=Clock.window_capacity * 3) == (
+        pytest.approx(last - (Clock.window_capacity - 1) / 2)
+    )
+
+
+def test_snapshot(clock):
+    for i in range(1, 1001):
+        clock.add_timing("sql", i / 1000)
+    clock.add_timing("dataset", 5.0)
+
+    snapshot = clock.snapshot()
+    assert snapshot["name"].to_list() == ["dataset", "sql"]
+
+    sql_row = snapshot.row(1, named=True)
+    assert sql_row["count"] == 1000
+    assert sql_row["sum"] == pytest.approx(500.5)
+    assert sql_row["min"] == pytest.approx(0.001)
+    assert sql_row["max"] == pytest.approx(1.0)
+    assert sql_row["p50"] == pytest.approx(0.5, rel=0.1)
+    assert sql_row["p95"] == pytest.approx(0.95, rel=0.1)
+    assert sql_row["p99"] == pytest.approx(0.99, rel=0.1)
+
+
+def test_add_timing_from_threads(clock):
+    def worker():
+        for _ in range(1000):
+            clock.add_timing("sql", 0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert clock.snapshot()["count"].to_list() == [8000]
@@ -0,0 +1,144 @@
+import urllib.request
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert
+
+from polars_hist_db.core import DbOps
+from polars_hist_db.utils import MetricsRegistry
+from polars_hist_db.utils.metrics import (
+    STAGING_TABLE_LABEL,
+    add_stage_rows,
+    dataset_scope,
+    sql_statement_seconds,
+    stage_rows,
+    table_label,
+    timed_stage,
+)
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def test_histogram_render(registry):
+    histogram = registry.histogram(
+        "test_seconds", "Test timings.", ["stage"], buckets=[0.1, 1.0]
+    )
+    histogram.observe(0.05, stage="load")
+    histogram.observe(0.5, stage="load")
+    histogram.observe(5.0, stage="load")
+
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# HELP test_seconds Test timings.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="load",le="0.1"} 1',
+        'test_seconds_bucket{stage="load",le="1.0"} 2',
+        'test_seconds_bucket{stage="load",le="+Inf"} 3',
+        'test_seconds_sum{stage="load"} 5.55',
+        'test_seconds_count{stage="load"} 3',
+    ]
+
+
+def test_counter_labels(registry):
+    counter = registry.counter("test_rows_total", "Test rows.", ["stage", "table"])
+    counter.inc(10, stage="load", table='a"b')
+    counter.inc(5, stage="load", table='a"b')
+
+    assert counter.value(stage="load", table='a"b') == 15
+    assert 'test_rows_total{stage="load",table="a\\"b"} 15.0' in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.inc(1, stage="load")
+
+    with pytest.raises(ValueError):
+        counter.inc(-1, stage="load", table="t")
+
+    with pytest.raises(ValueError):
+        registry.counter("test_rows_total", "Test rows.", ["stage"])
+
+
+def test_stage_metrics_use_dataset_scope(registry):
+    with dataset_scope("prices"):
+        with timed_stage("load_typed_dsv"):
+            pass
+        add_stage_rows("load_typed_dsv", 100)
+        add_stage_rows("load_typed_dsv", -1)
+
+    assert stage_rows().value(dataset="prices", stage="load_typed_dsv", table="") == 100
+    assert 'dataset="prices",stage="load_typed_dsv"' in registry.render()
+
+
+def test_db_ops_statement_metrics(registry):
+    engine = create_engine("sqlite://")
+    tbl = Table("items", MetaData(), Column("id", Integer, primary_key=True))
+
+    with engine.begin() as connection:
+        tbl.create(connection)
+        with dataset_scope("prices"):
+            DbOps(connection).execute_sqlalchemy(
+                "sql.test.insert", insert(tbl).values(id=1)
+            )
+            DbOps(connection).execute_driver_sql(
+                "sql.test.select", "SELECT 1", table="main.items"
+            )
+
+    histogram = sql_statement_seconds()
+    assert (
+        histogram.count(dataset="prices", statement="sql.test.insert", table="items")
+        == 1
+    )
+    assert (
+        histogram.count(
+            dataset="prices", statement="sql.test.select", table="main.items"
+        )
+        == 1
+    )
+
+
+def test_textfile_and_http(registry, tmp_path):
+    registry.counter("test_total", "Test.", []).inc()
+
+    path = tmp_path / "polars_hist_db.prom"
+    registry.write_textfile(path)
+    assert path.read_text() == registry.render()
+
+    server = registry.start_http_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_staging_tables_share_a_label(registry):
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    tables = [
+        Table(f"tmp_{i}", metadata, Column("id", Integer, primary_key=True))
+        for i in range(3)
+    ]
+
+    with engine.begin() as connection:
+        with dataset_scope("prices"):
+            for tbl in tables:
+                tbl.create(connection)
+                DbOps(connection).execute_sqlalchemy(
+                    "sql.test.insert", insert(tbl).values(id=1)
+                )
+
+    histogram = sql_statement_seconds()
+    assert (
+        histogram.count(
+            dataset="prices", statement="sql.test.insert", table=STAGING_TABLE_LABEL
+        )
+        == 3
+    )
+    assert table_label("test.tmp_0f3a") == STAGING_TABLE_LABEL
+    assert table_label("test.prices") == "test.prices"
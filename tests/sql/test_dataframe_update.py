@@ -0,0 +1,192 @@
+import pytest
+import polars as pl
+
+from polars_hist_db.core.dataframe import DataframeOps
+
+from ..utils.dsv_helper import (
+    from_test_result,
+    modify_and_read,
+    read_df_from_db,
+    setup_fixture_dataset,
+)
+
+
+@pytest.fixture
+def fixture_with_simple_table():
+    yield from setup_fixture_dataset("simple_nontemporal.yaml")
+
+
+@pytest.mark.parametrize("staging_min_rows", [0, 1000])
+def test_table_update(fixture_with_simple_table, staging_min_rows):
+    engine, config = fixture_with_simple_table
+    table_schema = config.tables.schemas()[0]
+    table_configs = config.tables
+    table_config = config.tables.items[0]
+
+    df_1 = pl.from_dict(
+        {
+            "id": [1, 2, 3],
+            "double_col": [1.5, 2.5, 3.5],
+            "varchar_col": ["abc", "def", "ghi"],
+        }
+    )
+
+    modify_and_read(
+        engine, df_1, config.datasets[0], table_schema, table_config, None, "upload"
+    )
+
+    # update two existing rows and one unknown key
+    df_2 = pl.from_dict(
+        {
+            "id": [1, 3, 4],
+            "double_col": [10.5, 30.5, 40.5],
+            "varchar_col": ["xyz", "uvw", "rst"],
+        }
+    )
+
+    with engine.begin() as connection:
+        DataframeOps(connection).table_update(
+            df_2,
+            table_schema,
+            table_config.name,
+            staging_min_rows=staging_min_rows,
+        )
+
+    df_read, _ = read_df_from_db(engine, table_schema, table_config)
+    df_expected = from_test_result(
+        """
+        id, double_col, varchar_col
+        1, 10.5, xyz
+        2, 2.5, def
+        3, 30.5, uvw
+    """,
+        table_config.name,
+        table_configs,
+    )
+
+    assert df_expected.equals(df_read)
+
+
+@pytest.mark.parametrize("insert_method", ["pandas", "multirow", "load_data"])
+def test_table_update_staged(fixture_with_simple_table, insert_method):
+    engine, config = fixture_with_simple_table
+    table_schema = config.tables.schemas()[0]
+    table_config = config.tables.items[0]
+
+    # more rows than the default staging_min_rows, in several insert batches
+    num_rows = 2500
+    df_1 = pl.from_dict(
+        {
+            "id": range(num_rows),
+            "double_col": [float(i) for i in range(num_rows)],
+            "varchar_col": [f"r{i}" for i in range(num_rows)],
+        }
+    )
+
+    modify_and_read(
+        engine, df_1, config.datasets[0], table_schema, table_config, None, "upload"
+    )
+
+    df_2 = df_1.with_columns(
+        pl.col("double_col") * 2, pl.lit("updated").alias("varchar_col")
+    )
+
+    with engine.begin() as connection:
+        DataframeOps(connection).table_update(
+            df_2,
+            table_schema,
+            table_config.name,
+            insert_method=insert_method,
+            insert_batch_rows=1000,
+            insert_batch_bytes=16 * 1024,
+        )
+
+    df_read, _ = read_df_from_db(engine, table_schema, table_config)
+
+    assert len(df_read) == num_rows
+    assert df_read.sort("id")["double_col"].to_list() == df_2["double_col"].to_list()
+    assert df_read["varchar_col"].unique().to_list() == ["updated"]
+
+
+@pytest.mark.parametrize("staging_min_rows", [0, 1000])
+def test_table_delete_rows(fixture_with_simple_table, staging_min_rows):
+    engine, config = fixture_with_simple_table
+    table_schema = config.tables.schemas()[0]
+    table_configs = config.tables
+    table_config = config.tables.items[0]
+
+    df_1 = pl.from_dict(
+        {
+            "id": [1, 2, 3],
+            "double_col": [1.5, 2.5, 3.5],
+            "varchar_col": ["abc", "def", "ghi"],
+        }
+    )
+
+    modify_and_read(
+        engine, df_1, config.datasets[0], table_schema, table_config, None, "upload"
+    )
+
+    # delete one existing row and one unknown key
+    df_2 = pl.from_dict({"id": [2, 4]})
+
+    with engine.begin() as connection:
+        num_deleted = DataframeOps(connection).table_delete_rows(
+            df_2,
+            table_schema,
+            table_config.name,
+            staging_min_rows=staging_min_rows,
+        )
+
+    assert num_deleted == 1
+
+    df_read, _ = read_df_from_db(engine, table_schema, table_config)
+    df_expected = from_test_result(
+        """
+        id, double_col, varchar_col
+        1, 1.5, abc
+        3, 3.5, ghi
+    """,
+        table_config.name,
+        table_configs,
+    )
+
+    assert df_expected.equals(df_read)
+
+
+@pytest.mark.parametrize("insert_method", ["pandas", "multirow", "load_data"])
+def test_table_delete_rows_staged(fixture_with_simple_table, insert_method):
+    engine, config = fixture_with_simple_table
+    table_schema = config.tables.schemas()[0]
+    table_config = config.tables.items[0]
+
+    num_rows = 2500
+    df_1 = pl.from_dict(
+        {
+            "id": range(num_rows),
+            "double_col": [float(i) for i in range(num_rows)],
+            "varchar_col": [f"r{i}" for i in range(num_rows)],
+        }
+    )
+
+    modify_and_read(
+        engine, df_1, config.datasets[0], table_schema, table_config, None, "upload"
+    )
+
+    # more keys than the default staging_min_rows, some of them unknown
+    df_2 = pl.from_dict({"id": range(1000, num_rows + 500)})
+
+    with engine.begin() as connection:
+        num_deleted = DataframeOps(connection).table_delete_rows(
+            df_2,
+            table_schema,
+            table_config.name,
+            insert_method=insert_method,
+            insert_batch_rows=1000,
+            insert_batch_bytes=16 * 1024,
+        )
+
+    assert num_deleted == num_rows - 1000
+
+    df_read, _ = read_df_from_db(engine, table_schema, table_config)
+    assert df_read.sort("id")["id"].to_list() == list(range(1000))
@@ -0,0 +1,166 @@
+from datetime import date, datetime, time, timedelta
+import logging
+import time as perf_time
+
+from types import SimpleNamespace
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from sqlalchemy import Column, Integer, MetaData, Table
+from sqlalchemy.dialects import mysql
+
+from polars_hist_db.core import DataframeOps, TableConfigOps
+from polars_hist_db.core.bulk_insert import _load_data_statement
+
+from ..utils.dsv_helper import (
+    from_test_result,
+    modify_and_read,
+    setup_fixture_dataset,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def fixture_with_nullable():
+    yield from setup_fixture_dataset("all_col_types_nullable.yaml")
+
+
+@pytest.mark.parametrize(
+    "insert_method", ["pandas", "executemany", "multirow", "load_data"]
+)
+def test_insert_methods_roundtrip(fixture_with_nullable, insert_method):
+    engine, config = fixture_with_nullable
+    table_schema = config.tables.schemas()[0]
+    table_configs = config.tables
+    table_config = config.tables.items[0]
+    delta_config = config.datasets[0].delta_config
+    delta_config.insert_method = insert_method
+    # force several statements per upload
+    delta_config.insert_batch_rows = 2
+    delta_config.insert_batch_bytes = 1
+
+    ts_1 = datetime.fromisoformat("1985-01-01T00:00:01Z")
+    df_1 = from_test_result(
+        """
+        id,bigint_col,bit_col,bool_col,boolean_col,char_col,date_col,datetime_col,decimal_col,double_col,float_col,int_col,integer_col,mediumint_col,numeric_col,real_col,smallint_col,text_col,time_col,timestamp_col,tinyint_col,varchar_col
+        1,1000000000,1,true,false,A,1985-01-01,1985-01-01T12:00:00,123.45,123.456789,12.34,100,101,1000,987.65,45.67,10,Sample text 1,12:34:56,1985-01-01T12:34:56,1,Short text 1
+        2,2000000000,0,false,true,B,1985-01-02,1985-01-02T13:00:00,234.56,234.567890,23.45,200,201,2000,876.54,56.78,20,Sample text 2,13:45:57,1985-01-02T13:45:57,2,Short text 2
+        3,,,,,,,,,,,,,,,,,,,,,
+    """,
+        table_config.name,
+        table_configs,
+    )
+
+    df_read, df_read_history = modify_and_read(
+        engine, df_1, config.datasets[0], table_schema, table_config, ts_1, "upload"
+    )
+
+    df_expected = from_test_result(
+        """
+        id,bigint_col,bit_col,bool_col,boolean_col,char_col,date_col,datetime_col,decimal_col,double_col,float_col,int_col,integer_col,mediumint_col,numeric_col,real_col,smallint_col,text_col,time_col,timestamp_col,tinyint_col,varchar_col,__valid_from,__valid_to
+        1,1000000000,1,true,false,A,1985-01-01,1985-01-01T12:00:00,123.45,123.456789,12.34,100,101,1000,987.65,45.67,10,Sample text 1,12:34:56,1985-01-01T12:34:56,1,Short text 1,1985-01-01T00:00:01,2038-01-19T03:14:07.999999
+        2,2000000000,0,false,true,B,1985-01-02,1985-01-02T13:00:00,234.56,234.567890,23.45,200,201,2000,876.54,56.78,20,Sample text 2,13:45:57,1985-01-02T13:45:57,2,Short text 2,1985-01-01T00:00:01,2038-01-19T03:14:07.999999
+        3,,,,,,,,,,,,,,,,,,,,,,1985-01-01T00:00:01,2038-01-19T03:14:07.999999
+    """,
+        table_config.name,
+        table_configs,
+    )
+
+    assert_frame_equal(df_expected, df_read)
+    assert df_read_history.is_empty()
+
+
+def _make_benchmark_df(table_config, num_rows: int) -> pl.DataFrame:
+    idx = pl.int_range(0, num_rows, eager=True)
+    columns = {}
+    for col_name, dtype in table_config.dtypes().items():
+        if col_name == "id":
+            columns[col_name] = (idx + 1).cast(dtype)
+        elif dtype == pl.Boolean:
+            columns[col_name] = (idx % 2) == 0
+        elif dtype.is_integer():
+            columns[col_name] = (idx % 2).cast(dtype)
+        elif dtype.is_float() or dtype.is_decimal():
+            columns[col_name] = ((idx % 1000) / 7).round(2).cast(dtype)
+        elif dtype == pl.Utf8:
+            columns[col_name] = (idx % 10).cast(pl.Utf8)
+        elif dtype == pl.Date:
+            columns[col_name] = pl.date_range(
+                date(2000, 1, 1),
+                date(2000, 1, 1) + timedelta(days=num_rows - 1),
+                eager=True,
+            )
+        elif dtype == pl.Time:
+            columns[col_name] = pl.Series([time(12, 34, 56)] * num_rows)
+        else:
+            columns[col_name] = pl.datetime_range(
+                datetime(2000, 1, 1),
+                datetime(2000, 1, 1) + timedelta(seconds=num_rows - 1),
+                "1s",
+                eager=True,
+            )
+
+    return pl.DataFrame(columns)
+
+
+def test_load_data_statement_bit_columns():
+    tbl = Table(
+        "flags",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("is active-flag", mysql.BIT(1)),
+        schema="test",
+    )
+    connection = SimpleNamespace(dialect=mysql.dialect())
+
+    sql = _load_data_statement(
+        tbl,
+        ["id", "is active-flag"],
+        "/tmp/rows.tsv",
+        connection,  # type: ignore[arg-type]
+    )
+
+    assert sql.endswith("(id, @v1) SET `is active-flag` = CAST(@v1 AS UNSIGNED)")
+
+
+def test_insert_methods_benchmark(fixture_with_nullable):
+    engine, config = fixture_with_nullable
+    table_schema = config.tables.schemas()[0]
+    table_config = config.tables.items[0]
+    delta_config = config.datasets[0].delta_config
+    num_rows = 20_000
+
+    df = _make_benchmark_df(table_config, num_rows)
+
+    timings = []
+    with engine.begin() as connection:
+        tmp_table_config = TableConfigOps(connection).from_table(
+            table_schema, table_config.name
+        )
+        tmp_table_config.name = delta_config.tmp_table_name(table_config.name)
+        TableConfigOps(connection).create(
+            tmp_table_config, is_delta_table=True, is_temporary_table=True
+        )
+
+        for insert_method in ["pandas", "executemany", "multirow", "load_data"]:
+            start_time = perf_time.perf_counter()
+            num_inserted = DataframeOps(connection).table_insert(
+                df,
+                table_schema,
+                tmp_table_config.name,
+                tmp_table_config.primary_keys,
+                prefill_nulls_with_default=False,
+                clear_table_first=True,
+                insert_method=insert_method,
+            )
+            elapsed = perf_time.perf_counter() - start_time
+
+            assert num_inserted == num_rows
+            timings.append((insert_method, elapsed, num_rows / elapsed))
+
+    timings_df = pl.DataFrame(
+        timings, schema=["insert_method", "seconds", "rows_per_second"], orient="row"
+    )
+    LOGGER.info("insert benchmark (%d rows):\n%s", num_rows, timings_df)
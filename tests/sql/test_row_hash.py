@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import polars as pl
+import pytest
+from sqlalchemy import BigInteger, Column, Integer, MetaData, String, Table
+from sqlalchemy.dialects import mysql
+
+from polars_hist_db.config import DeltaConfig
+from polars_hist_db.core import DeltaTableOps, TableOps
+from polars_hist_db.core.delta_table import ROW_HASH_COL, with_row_hash
+
+
+def test_row_hash_ignores_column_order_and_dtypes():
+    df = pl.DataFrame({"id": [1, 2, 3], "price": [1.5, 2.5, 1.5], "unit": "kg"})
+    hashed = with_row_hash(df, ["unit", "price", "id", "not_loaded"])
+
+    assert hashed[ROW_HASH_COL].dtype == pl.Int64
+    assert hashed[ROW_HASH_COL].n_unique() == 3
+
+    reordered = df.select(
+        pl.col("unit").cast(pl.Categorical), pl.col("price"), pl.col("id")
+    )
+    schema = {"id": pl.Int64(), "price": pl.Float64(), "unit": pl.Utf8()}
+    assert with_row_hash(reordered, ["id", "price", "unit"], schema)[
+        ROW_HASH_COL
+    ].equals(hashed[ROW_HASH_COL])
+
+    changed = df.with_columns(pl.Series("price", [1.5, 2.5, 9.9]))
+    assert (
+        with_row_hash(changed, ["id", "price", "unit"])[ROW_HASH_COL]
+        == hashed[ROW_HASH_COL]
+    ).to_list() == [True, True, False]
+
+
+def test_row_hash_is_stable():
+    df = pl.DataFrame(
+        {
+            "id": [1, None],
+            "price": [1.5, -0.0],
+            "unit": ["kg", "g"],
+            "time": [datetime(2020, 1, 1), None],
+        }
+    )
+
+    # stored hashes must not change with the polars version
+    assert with_row_hash(df, ["id", "price", "unit", "time"])[
+        ROW_HASH_COL
+    ].to_list() == [8269190669147843928, -4174724904975039892]
+
+
+def test_row_hash_keeps_values_that_do_not_cast():
+    df = pl.DataFrame({"id": ["a", "b", None, "1"]})
+
+    hashed = with_row_hash(df, ["id"], {"id": pl.Int64()})
+
+    assert hashed[ROW_HASH_COL].n_unique() == 4
+
+
+def test_row_hash_requires_columns():
+    with pytest.raises(ValueError):
+        with_row_hash(pl.DataFrame({"id": [1]}), ["price"])
+
+
+def test_drop_unchanged_rows_by_hash_statement():
+    metadata = MetaData()
+    delta_tbl = Table(
+        "prices",
+        metadata,
+        Column("ProductId", Integer, primary_key=True),
+        Column("Price", String(16)),
+        Column(ROW_HASH_COL, BigInteger),
+        schema="test",
+    )
+    main_tbl = Table(
+        "food_prices",
+        metadata,
+        Column("product_id", Integer, primary_key=True),
+        Column("price", String(16)),
+        Column(ROW_HASH_COL, BigInteger),
+        schema="test",
+    )
+
+    delta_ops = DeltaTableOps("test", "prices", DeltaConfig(), None)  # type: ignore[arg-type]
+    stmt = delta_ops._build_drop_unchanged_rows_by_hash_statement(
+        delta_tbl,
+        main_tbl,
+        [main_tbl.c["product_id"]],
+        {"product_id": "ProductId", "price": "Price"},
+    )
+    sql = str(stmt.compile(dialect=mysql.dialect()))
+
+    # only the keys and hashes of the delta rows are compared
+    assert "EXISTS" in sql
+    assert "test.food_prices.product_id = test.prices.`ProductId`" in sql
+    assert f"test.food_prices.{ROW_HASH_COL} = test.prices.{ROW_HASH_COL}" in sql
+
+
+def test_upsert_without_row_hash_clears_stale_hash():
+    metadata = MetaData()
+    delta_tbl = Table(
+        "prices",
+        metadata,
+        Column("ProductId", Integer, primary_key=True),
+        Column("Price", String(16)),
+        schema="test",
+    )
+    main_tbl = Table(
+        "food_prices",
+        metadata,
+        Column("product_id", Integer, primary_key=True),
+        Column("price", String(16)),
+        Column(ROW_HASH_COL, BigInteger),
+        schema="test",
+    )
+
+    delta_ops = DeltaTableOps("test", "prices", DeltaConfig(), None)  # type: ignore[arg-type]
+    update_stmt, insert_stmt = delta_ops._build_upsert_statements(
+        delta_tbl,
+        main_tbl,
+        TableOps("test", "food_prices", None),  # type: ignore[arg-type]
+        ["ProductId", "Price"],
+        {"ProductId": "product_id", "Price": "price"},
+        "error",
+        null_columns=[ROW_HASH_COL],
+    )
+    assert update_stmt is not None
+    update_sql = str(update_stmt.compile(dialect=mysql.dialect()))
+    insert_sql = str(insert_stmt.compile(dialect=mysql.dialect()))
+
+    # updated rows lose their hash, inserted rows default to a null hash
+    assert f"{ROW_HASH_COL}=NULL" in update_sql.replace(" ", "")
+    assert ROW_HASH_COL not in insert_sql
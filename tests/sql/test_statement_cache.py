@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+import polars as pl
+
+from polars_hist_db.core import CompiledStatementCache, DataframeOps
+
+from ..utils.dsv_helper import setup_fixture_dataset
+
+
+@pytest.fixture
+def fixture_with_simple_table():
+    yield from setup_fixture_dataset("simple.yaml")
+
+
+def test_upsert_statements_reused_across_partitions(fixture_with_simple_table):
+    engine, config = fixture_with_simple_table
+    table_schema = config.tables.schemas()[0]
+    table_config = config.tables.items[0]
+    delta_config = config.datasets[0].delta_config
+    cache = CompiledStatementCache()
+
+    partitions = [
+        (
+            datetime.fromisoformat(f"198{i}-01-01T00:00:01Z"),
+            pl.from_dict(
+                {
+                    "id": [1, 2],
+                    "double_col": [1.5 + i, 2.5],
+                    "varchar_col": [f"abc{i}", "def"],
+                }
+            ),
+        )
+        for i in range(1, 4)
+    ]
+
+    with engine.begin() as connection:
+        stats_before = cache.stats()
+        for ts, df in partitions:
+            DataframeOps(connection).table_upsert_temporal(
+                df, table_schema, table_config.name, delta_config, ts
+            )
+        stats_after = cache.stats()
+
+    # upsert and drop_unchanged_rows are compiled once, then reused
+    assert stats_after["misses"] - stats_before["misses"] <= 2
+    assert stats_after["hits"] - stats_before["hits"] >= 2 * (len(partitions) - 1)
@@ -0,0 +1,70 @@
+import pytest
+
+from polars_hist_db.core import TableConfigOps, TableMetadataCache, TableOps
+
+from ..utils.dsv_helper import setup_fixture_dataset
+
+
+@pytest.fixture
+def fixture_with_simple_table():
+    yield from setup_fixture_dataset("simple_nontemporal.yaml")
+
+
+def test_metadata_cache_hits(fixture_with_simple_table):
+    engine, config = fixture_with_simple_table
+    table_config = config.tables.items[0]
+    cache = TableMetadataCache()
+
+    with engine.begin() as connection:
+        tbo = TableOps(table_config.schema, table_config.name, connection)
+        tbl_1 = tbo.get_table_metadata()
+        hits = cache.stats()["hits"]
+        tbl_2 = tbo.get_table_metadata()
+
+        assert tbl_1 is tbl_2
+        assert cache.stats()["hits"] == hits + 1
+        assert tbo.table_exists()
+
+
+def test_metadata_cache_invalidated_by_ddl(fixture_with_simple_table):
+    engine, config = fixture_with_simple_table
+    table_config = config.tables.items[0]
+    cache = TableMetadataCache()
+
+    with engine.begin() as connection:
+        tbo = TableOps(table_config.schema, table_config.name, connection)
+        tbo.get_table_metadata()
+        assert cache.contains(connection, table_config.schema, table_config.name)
+
+        TableConfigOps(connection).drop(table_config)
+        assert not cache.contains(connection, table_config.schema, table_config.name)
+        assert not tbo.table_exists()
+
+        TableConfigOps(connection).create(table_config)
+        assert tbo.table_exists()
+        assert "id" in tbo.get_table_metadata().columns
+
+
+def test_metadata_cache_temporary_tables(fixture_with_simple_table):
+    engine, config = fixture_with_simple_table
+    table_config = config.tables.items[0]
+    delta_config = config.datasets[0].delta_config
+
+    with engine.begin() as connection:
+        tmp_table_config = TableConfigOps(connection).from_table(
+            table_config.schema, table_config.name
+        )
+        tmp_table_config.name = delta_config.tmp_table_name(table_config.name)
+        TableConfigOps(connection).create(
+            tmp_table_config, is_delta_table=True, is_temporary_table=True
+        )
+        assert TableOps(
+            tmp_table_config.schema, tmp_table_config.name, connection
+        ).table_exists()
+
+    # temporary tables are not visible to other sessions
+    with engine.connect() as c1, engine.connect() as c2:
+        assert c1.connection.dbapi_connection is not c2.connection.dbapi_connection
+        tbo_1 = TableOps(tmp_table_config.schema, tmp_table_config.name, c1)
+        tbo_2 = TableOps(tmp_table_config.schema, tmp_table_config.name, c2)
+        assert not (tbo_1.table_exists() and tbo_2.table_exists())
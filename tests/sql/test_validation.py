@@ -0,0 +1,127 @@
+from decimal import Decimal
+
+import polars as pl
+import pytest
+from sqlalchemy import Column, MetaData, Table, text
+from sqlalchemy.dialects import mysql
+
+from polars_hist_db.core.validation import validate_dataframe
+from polars_hist_db.utils import DataValidationException
+
+
+@pytest.fixture
+def tbl():
+    return Table(
+        "validated",
+        MetaData(),
+        Column("id", mysql.INTEGER(), primary_key=True, autoincrement=False),
+        Column("code", mysql.VARCHAR(3), nullable=False),
+        Column("note", mysql.VARCHAR(5), nullable=False, server_default=text("''")),
+        Column("small", mysql.TINYINT(unsigned=True)),
+        Column("price", mysql.DECIMAL(5, 2)),
+        schema="test",
+    )
+
+
+def _df(**overrides):
+    data = {
+        "id": [1, 2, 3],
+        "code": ["abc", "de", "f"],
+        "note": ["x", None, "z"],
+        "small": [0, 255, None],
+        "price": [999.99, -1.5, None],
+    }
+    data.update(overrides)
+    return pl.DataFrame(data)
+
+
+def test_valid_dataframe(tbl):
+    df = _df()
+    assert validate_dataframe(df, tbl, "raise").equals(df)
+
+
+@pytest.mark.parametrize(
+    "overrides, bad_row",
+    [
+        ({"code": ["abc", "defg", "f"]}, 2),
+        ({"code": ["abc", None, "f"]}, 2),
+        ({"small": [0, 256, None]}, 2),
+        ({"small": [-1, 255, None]}, 1),
+        ({"price": [999.99, 1000.0, None]}, 2),
+        ({"price": [999.99, 1.005, None]}, 2),
+        ({"price": pl.Series([Decimal("1.5"), Decimal("1000.00"), None])}, 2),
+    ],
+)
+def test_reject_rows(tbl, overrides, bad_row):
+    df = _df(**overrides)
+
+    assert validate_dataframe(df, tbl, "log").equals(df)
+    assert validate_dataframe(df, tbl, "reject")["id"].to_list() == [
+        i for i in [1, 2, 3] if i != bad_row
+    ]
+
+    with pytest.raises(DataValidationException):
+        validate_dataframe(df, tbl, "raise")
+
+    assert validate_dataframe(df, tbl, "disabled").equals(df)
+
+
+@pytest.mark.parametrize(
+    "price",
+    [
+        pl.Series([1234567.89, 55555555555.5555, -0.0001]),
+        pl.Series(
+            [Decimal("1234567.89"), Decimal("55555555555.5555"), Decimal("-0.0001")],
+            dtype=pl.Decimal(20, 4),
+        ),
+        pl.Series(
+            [Decimal("1234567.89"), Decimal("55555555555.5555"), Decimal("-0.0001")],
+            dtype=pl.Decimal(38, 10),
+        ),
+    ],
+)
+def test_wide_decimal_values_are_valid(price):
+    tbl = Table(
+        "validated",
+        MetaData(),
+        Column("id", mysql.INTEGER(), primary_key=True, autoincrement=False),
+        Column("price", mysql.DECIMAL(20, 4)),
+        schema="test",
+    )
+    df = pl.DataFrame({"id": [1, 2, 3], "price": price})
+
+    assert validate_dataframe(df, tbl, "raise").equals(df)
+
+
+def test_decimal_dtype_checked_exactly():
+    tbl = Table(
+        "validated",
+        MetaData(),
+        Column("id", mysql.INTEGER(), primary_key=True, autoincrement=False),
+        Column("price", mysql.DECIMAL(20, 4)),
+        schema="test",
+    )
+    price = pl.Series(
+        [
+            Decimal("9999999999999999.9999"),
+            Decimal("10000000000000000"),
+            Decimal("1.00001"),
+        ],
+        dtype=pl.Decimal(38, 5),
+    )
+    df = pl.DataFrame({"id": [1, 2, 3], "price": price})
+
+    assert validate_dataframe(df, tbl, "reject")["id"].to_list() == [1]
+
+
+def test_non_text_column_in_text_table():
+    tbl = Table(
+        "validated",
+        MetaData(),
+        Column("id", mysql.INTEGER(), primary_key=True, autoincrement=False),
+        Column("value", mysql.VARCHAR(2)),
+        schema="test",
+    )
+    df = pl.DataFrame({"id": [1, 2], "value": [12, 123]})
+
+    assert validate_dataframe(df, tbl, "reject")["id"].to_list() == [1]
@@ -59,7 +59,7 @@ def mariadb_engine_test() -> Engine:
         pool_recycle=3600,
         pool_size=3,
         max_overflow=2,
-        connect_args={"client_flag": 0},
+        connect_args={"client_flag": 0, "local_infile": True},
     )
 
 